@@ -0,0 +1,319 @@
+"""
+记录统计模块
+对记录流做一次遍历，按日期、小时、模板编号和手机号汇总发送成功、失败和等待回执的数量；
+安装了 NumPy 时按批向量化计数
+"""
+import json
+import unicodedata
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 为可选依赖，未安装时逐条计数
+    np = None
+
+from sms_record import SMSRecord, SOURCE_UTC_OFFSET, STATUS_SUCCESS, STATUS_FAILED, STATUS_WAITING
+
+
+# 状态码 -> 计数列：0 发送成功、1 发送失败、2 等待回执、3 其他
+_STATUS_SLOTS = {STATUS_SUCCESS: 0, STATUS_FAILED: 1, STATUS_WAITING: 2}
+_OTHER_SLOT = 3
+
+# 汇总维度 -> 输出中的键名
+DIMENSIONS = {
+    'day': 'by_day',
+    'hour': 'by_hour',
+    'template': 'by_template',
+    'phone': 'by_phone',
+}
+
+# 向量化计数时每批的记录数
+CHUNK_SIZE = 65536
+
+# 发送时间无法解析时的日期和小时
+UNKNOWN = -1
+
+# --breakdown 可选的输出格式
+BREAKDOWN_FORMATS = ('table', 'json')
+
+
+def is_vectorized_available() -> bool:
+    """是否已安装 NumPy"""
+    return np is not None
+
+
+class RecordAggregator:
+    """
+    单遍汇总统计
+
+    track() 包装记录流，记录原样产出，同时计数，不保存记录本身。
+    日期和小时按北京时间计算；失败率 = 发送失败 / (发送成功 + 发送失败)，
+    等待回执的记录不计入分母。
+
+    向量化模式下每条记录只追加到紧凑数组（发送时间、状态列、模板和号码编号），
+    每 CHUNK_SIZE 条用 NumPy 一次性分组计数；内存占用与批大小和分组数有关，与记录总数无关。
+    """
+
+    def __init__(self, vectorized: Optional[bool] = None):
+        """
+        初始化
+
+        Args:
+            vectorized: 是否使用 NumPy 向量化计数，默认在安装了 NumPy 时使用
+
+        Raises:
+            RuntimeError: 指定了向量化计数但未安装 NumPy
+        """
+        if vectorized is None:
+            vectorized = is_vectorized_available()
+        if vectorized and not is_vectorized_available():
+            raise RuntimeError("向量化统计需要安装 NumPy: pip install numpy")
+        self.vectorized = vectorized
+        self.records = 0
+        self._counts = {dimension: {} for dimension in DIMENSIONS}
+        if vectorized:
+            self._templates = {}
+            self._phones = {}
+            self._last_phone = (None, 0)
+            self._reset_buffer()
+
+    def track(self, records: Iterable[SMSRecord]) -> Iterator[SMSRecord]:
+        """
+        边产出记录边计数
+
+        Args:
+            records: 记录迭代器
+
+        Yields:
+            原样产出的记录
+        """
+        add = self._buffer_record if self.vectorized else self._count_record
+        for record in records:
+            add(record)
+            yield record
+        if self.vectorized:
+            self._flush()
+
+    def consume(self, records: Iterable[SMSRecord]):
+        """
+        只计数，不产出记录
+
+        Args:
+            records: 记录迭代器
+        """
+        for _ in self.track(records):
+            pass
+
+    def result(self) -> Dict:
+        """
+        汇总结果
+
+        Returns:
+            {"total": {...}, "by_day": [...], "by_hour": [...], "by_template": [...], "by_phone": [...]}，
+            每组包含 records、success、failed、waiting、other、failure_rate；
+            日期和小时按时间排序，模板和号码按记录数从多到少排序
+        """
+        if self.vectorized:
+            self._flush()
+
+        totals = [0, 0, 0, 0]
+        for counts in self._counts['day'].values():
+            for slot, count in enumerate(counts):
+                totals[slot] += count
+
+        names = {}
+        if self.vectorized:
+            names['template'] = {index: template for template, index in self._templates.items()}
+            names['phone'] = {index: phone for phone, index in self._phones.items()}
+
+        result = {'total': _summarize(totals)}
+        for dimension, name in DIMENSIONS.items():
+            groups = [
+                (_label(dimension, key, names.get(dimension)), counts)
+                for key, counts in self._counts[dimension].items()
+            ]
+            if dimension in ('day', 'hour'):
+                groups.sort(key=lambda item: (item[0] is None, item[0] or 0))
+            else:
+                groups.sort(key=lambda item: (-sum(item[1]), item[0]))
+            result[name] = [dict({dimension: label}, **_summarize(counts)) for label, counts in groups]
+        return result
+
+    def _count_record(self, record: SMSRecord):
+        """逐条计数"""
+        self.records += 1
+        slot = _STATUS_SLOTS.get(record.status_code, _OTHER_SLOT)
+        if record.send_ts:
+            local = record.send_ts + SOURCE_UTC_OFFSET
+            day = local // 86400
+            hour = local % 86400 // 3600
+        else:
+            day = hour = UNKNOWN
+        for dimension, key in (
+            ('day', day),
+            ('hour', hour),
+            ('template', record.template_code),
+            ('phone', record.phone_number),
+        ):
+            counts = self._counts[dimension].get(key)
+            if counts is None:
+                counts = self._counts[dimension][key] = [0, 0, 0, 0]
+            counts[slot] += 1
+
+    def _buffer_record(self, record: SMSRecord):
+        """向量化模式：把记录追加到当前批"""
+        self.records += 1
+        self._send_ts.append(record.send_ts)
+        self._slots.append(_STATUS_SLOTS.get(record.status_code, _OTHER_SLOT))
+
+        template_id = self._templates.get(record.template_code)
+        if template_id is None:
+            template_id = self._templates[record.template_code] = len(self._templates)
+        self._template_ids.append(template_id)
+
+        # 记录通常按号码分组产出，连续相同的号码不必查字典
+        last_phone, phone_id = self._last_phone
+        if record.phone_number != last_phone:
+            phone_id = self._phones.get(record.phone_number)
+            if phone_id is None:
+                phone_id = self._phones[record.phone_number] = len(self._phones)
+            self._last_phone = (record.phone_number, phone_id)
+        self._phone_ids.append(phone_id)
+
+        if len(self._slots) >= CHUNK_SIZE:
+            self._flush()
+
+    def _flush(self):
+        """向量化模式：对当前批分组计数"""
+        if not self._slots:
+            return
+        send_ts = np.frombuffer(self._send_ts, dtype=np.int64)
+        slots = np.frombuffer(self._slots, dtype=np.int8).astype(np.int64)
+        local = send_ts + SOURCE_UTC_OFFSET
+        known = send_ts != 0
+        keys = {
+            'day': np.where(known, local // 86400, UNKNOWN),
+            'hour': np.where(known, local % 86400 // 3600, UNKNOWN),
+            'template': np.frombuffer(self._template_ids, dtype=np.int32),
+            'phone': np.frombuffer(self._phone_ids, dtype=np.int32),
+        }
+        for dimension, values in keys.items():
+            unique, inverse = np.unique(values, return_inverse=True)
+            counts = np.bincount(
+                inverse.reshape(-1) * 4 + slots,
+                minlength=len(unique) * 4
+            ).reshape(-1, 4)
+            target = self._counts[dimension]
+            for key, row in zip(unique.tolist(), counts.tolist()):
+                existing = target.get(key)
+                if existing is None:
+                    target[key] = row
+                else:
+                    for slot in range(4):
+                        existing[slot] += row[slot]
+        self._reset_buffer()
+
+    def _reset_buffer(self):
+        """清空当前批"""
+        self._send_ts = array('q')
+        self._slots = array('b')
+        self._template_ids = array('i')
+        self._phone_ids = array('i')
+
+
+def format_breakdown(result: Dict, output_format: str = 'table') -> str:
+    """
+    格式化汇总结果
+
+    Args:
+        result: RecordAggregator.result() 的返回值
+        output_format: table（对齐的文本表格）或 json
+
+    Returns:
+        格式化后的文本
+    """
+    if output_format == 'json':
+        return json.dumps(result, ensure_ascii=False, indent=2) + '\n'
+
+    sections = [
+        ('按日期', 'by_day', 'day'),
+        ('按小时', 'by_hour', 'hour'),
+        ('按模板', 'by_template', 'template'),
+        ('按号码', 'by_phone', 'phone'),
+    ]
+    lines = [_table_header('合计'), _table_row('全部', result['total'])]
+    for title, name, dimension in sections:
+        lines.append('')
+        lines.append(_table_header(title))
+        for group in result[name]:
+            label = group[dimension]
+            if label is None:
+                label = '未知'
+            elif dimension == 'hour':
+                label = f'{label:02d}:00'
+            elif dimension == 'template' and not label:
+                label = '（无）'
+            lines.append(_table_row(label, group))
+    return '\n'.join(lines) + '\n'
+
+
+def _label(dimension: str, key, names: Optional[Dict] = None):
+    """分组键转换为输出中的值（日期为 YYYY-MM-DD，小时为 0-23，向量化模式下的编号换回原值）"""
+    if dimension == 'day':
+        if key == UNKNOWN:
+            return None
+        return datetime.fromtimestamp(key * 86400, timezone.utc).strftime('%Y-%m-%d')
+    if dimension == 'hour':
+        return None if key == UNKNOWN else key
+    return names[key] if names is not None else key
+
+
+def _summarize(counts: List[int]) -> Dict:
+    """计数列转换为输出字典"""
+    success, failed, waiting, other = counts
+    settled = success + failed
+    return {
+        'records': success + failed + waiting + other,
+        'success': success,
+        'failed': failed,
+        'waiting': waiting,
+        'other': other,
+        'failure_rate': round(failed / settled, 4) if settled else None,
+    }
+
+
+# 表格各列的名称和显示宽度
+_TABLE_COLUMNS = (('记录数', 10), ('成功', 10), ('失败', 10), ('等待回执', 10), ('其他', 8), ('失败率', 9))
+_LABEL_WIDTH = 16
+
+
+def _table_header(title: str) -> str:
+    """表格标题行"""
+    cells = [_pad(title, _LABEL_WIDTH)] + [_pad(name, width, right=True) for name, width in _TABLE_COLUMNS]
+    header = ' '.join(cells)
+    return header + '\n' + '-' * _display_width(header)
+
+
+def _table_row(label, group: Dict) -> str:
+    """表格数据行"""
+    rate = group['failure_rate']
+    values = (
+        group['records'], group['success'], group['failed'], group['waiting'], group['other'],
+        '-' if rate is None else f'{rate * 100:.2f}%',
+    )
+    cells = [_pad(str(label), _LABEL_WIDTH)]
+    cells += [_pad(str(value), width, right=True) for value, (_, width) in zip(values, _TABLE_COLUMNS)]
+    return ' '.join(cells)
+
+
+def _display_width(text: str) -> int:
+    """终端显示宽度（中文等全角字符占两列）"""
+    return sum(2 if unicodedata.east_asian_width(char) in 'WF' else 1 for char in text)
+
+
+def _pad(text: str, width: int, right: bool = False) -> str:
+    """按显示宽度补齐空格"""
+    padding = ' ' * max(0, width - _display_width(text))
+    return padding + text if right else text + padding
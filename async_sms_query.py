@@ -0,0 +1,319 @@
+"""
+asyncio 短信查询模块
+用一个事件循环驱动所有页请求，替代线程池实现高并发查询
+"""
+import asyncio
+import time
+from typing import List, Dict, Iterator, Optional, Tuple
+
+from sms_query import SMSQueryClient, _DayScheduler, _PageCalls
+from profiling import STAGE_PARSE, STAGE_SORT
+from sms_record import SMSRecord
+from rate_limiter import CANCELLED
+
+
+class AsyncSMSQueryClient(SMSQueryClient):
+    """
+    基于 asyncio 的短信查询客户端
+
+    与 SMSQueryClient 共用日期生成、任务调度、响应解析、状态映射、
+    限流重试和缓存逻辑，只把页请求改为 SDK 的异步接口
+    （query_send_details_with_options_async），由信号量限制同时进行的请求数。
+    结果与线程池引擎完全一致。
+
+    同步接口（query_send_details / query_batch / iter_send_details）可以直接使用，
+    内部会创建私有事件循环；已在事件循环中的调用方应使用对应的 *_async 接口。
+    """
+
+    def __init__(
+        self,
+        config,
+        max_workers: int = 100,
+        max_qps: float = 50.0,
+        max_retries: int = 5,
+        cache=None,
+        journal=None,
+        metrics=None,
+        progress=None,
+        hedging=None,
+        cancel_token=None,
+        schedule='calendar',
+        page_history=None,
+        profiler=None
+    ):
+        """
+        初始化客户端
+
+        Args:
+            config: 配置对象
+            max_workers: 同时进行的页请求数上限（信号量大小），默认100
+            max_qps: 每组访问密钥每秒请求数上限，遇到限流时自动降低，默认50
+            max_retries: 限流、5xx、超时等临时错误的最大重试次数，默认5
+            cache: 单天查询结果缓存，为 None 时不使用缓存
+            journal: 断点日志，已记录的日期直接读取，新完成的日期追加写入
+            metrics: 指标收集器，记录每次接口调用和每个日期的耗时，为 None 时不记录
+            progress: 进度显示，默认逐行输出到标准输出（LineProgress）
+            hedging: 对冲策略，页请求耗时过长时再发一个相同的请求，为 None 时不对冲
+            cancel_token: 取消令牌（可带截止时间），取消后立即取消所有执行中的页请求，
+                已完成的日期照常产出；为 None 时不限时
+            schedule: 日期的开始顺序（calendar / cost / recent），同 SMSQueryClient
+            page_history: 页数历史，用于估计每天的页数和总耗时，为 None 时不估算
+            profiler: 阶段剖析器，为 None 时不记录。接口调用在事件循环中交替执行，
+                不单独计时，计入驱动事件循环的调度等待阶段
+        """
+        super().__init__(
+            config,
+            max_workers=max_workers,
+            max_qps=max_qps,
+            max_retries=max_retries,
+            cache=cache,
+            journal=journal,
+            metrics=metrics,
+            progress=progress,
+            hedging=hedging,
+            cancel_token=cancel_token,
+            schedule=schedule,
+            page_history=page_history,
+            profiler=profiler
+        )
+        self._semaphore = None
+
+    async def query_send_details_async(
+        self,
+        phone_number: str,
+        start_date: str,
+        end_date: str = None,
+        page_size: int = 50,
+        max_workers: int = None
+    ) -> List[SMSRecord]:
+        """
+        查询短信发送明细（异步版本），参数和返回值同 query_send_details
+        """
+        max_workers = self._effective_workers(max_workers)
+        tasks = self._plan_tasks([phone_number], start_date, end_date, max_workers)
+
+        all_records = []
+        async for _, _, day_records in self._aiter_days(tasks, page_size, max_workers):
+            all_records.extend(day_records)
+
+        # 按时间排序
+        with self._stage(STAGE_SORT):
+            all_records.sort(key=lambda x: x.send_ts)
+
+        self.report_finish(1, len(all_records))
+        return all_records
+
+    async def query_batch_async(
+        self,
+        phone_numbers,
+        start_date: str,
+        end_date: str = None,
+        page_size: int = 50,
+        max_workers: int = None
+    ) -> Dict[str, List[SMSRecord]]:
+        """
+        批量查询多个手机号的短信发送明细（异步版本），参数和返回值同 query_batch
+        """
+        max_workers = self._effective_workers(max_workers)
+        phone_numbers = list(dict.fromkeys(phone_numbers))
+        tasks = self._plan_tasks(phone_numbers, start_date, end_date, max_workers)
+
+        results = {phone_number: [] for phone_number in phone_numbers}
+        async for phone_number, _, day_records in self._aiter_days(tasks, page_size, max_workers):
+            results[phone_number].extend(day_records)
+
+        # 按时间排序
+        with self._stage(STAGE_SORT):
+            for records in results.values():
+                records.sort(key=lambda x: x.send_ts)
+
+        total = sum(len(records) for records in results.values())
+        self.report_finish(len(phone_numbers), total)
+        return results
+
+    def _iter_days(
+        self,
+        tasks: List[Tuple[str, str]],
+        page_size: int,
+        max_workers: int,
+        ordered: bool = False,
+        reorder_window: int = None,
+        include_failed: bool = False
+    ) -> Iterator[Tuple[str, str, List[SMSRecord]]]:
+        """
+        在私有事件循环中执行 _aiter_days，以同步迭代器的形式产出结果
+
+        参数和产出值同 SMSQueryClient._iter_days。
+        """
+        loop = asyncio.new_event_loop()
+        days = self._aiter_days(
+            tasks, page_size, max_workers, ordered, reorder_window, include_failed
+        )
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(days.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            loop.run_until_complete(days.aclose())
+            loop.close()
+
+    async def _aiter_days(
+        self,
+        tasks: List[Tuple[str, str]],
+        page_size: int,
+        max_workers: int,
+        ordered: bool = False,
+        reorder_window: int = None,
+        include_failed: bool = False
+    ):
+        """
+        在事件循环中执行 (手机号, 日期) 任务，每完成一天产出一次结果
+
+        调度规则见 _DayScheduler，参数和产出值同 SMSQueryClient._iter_days。
+        取消令牌触发后，执行中的页请求（包括正在等待响应的请求）立即被取消。
+        """
+        priorities, reorder_window = self._plan_schedule(tasks, max_workers, ordered, reorder_window)
+        scheduler = _DayScheduler(
+            self, tasks, page_size, max_workers, ordered, reorder_window, include_failed, priorities
+        )
+        self._semaphore = asyncio.Semaphore(max_workers + self.hedge_slots)
+        calls = _PageCalls(self)
+
+        # 取消令牌可能在其他线程（定时器、信号处理）中触发，通过 call_soon_threadsafe 唤醒事件循环
+        cancel_token = self.cancel_token
+        loop = asyncio.get_running_loop()
+        cancelled = loop.create_future()
+
+        def wake():
+            try:
+                loop.call_soon_threadsafe(_resolve, cancelled)
+            except RuntimeError:
+                pass  # 事件循环已关闭
+
+        def submit(request, hedge=False):
+            task = asyncio.ensure_future(self._fetch_page_async(
+                request.day.phone_number,
+                request.day.query_date,
+                request.page,
+                page_size,
+                time.perf_counter()
+            ))
+            calls.add(task, request, hedge)
+
+        cancel_token.add_callback(wake)
+        try:
+            while scheduler.has_work() and not cancel_token.cancelled:
+                # 开始新的日期，缓存命中的日期直接完成
+                for item in scheduler.start_days():
+                    yield item
+
+                # 补充页请求，保持不超过并发上限
+                for day, page in scheduler.take_requests():
+                    submit(calls.new_request(day, page))
+
+                if not calls:
+                    continue
+
+                # 启用对冲时最多等到下一个页请求需要对冲；取消时立即醒来
+                done, _ = await asyncio.wait(
+                    {*calls.futures, cancelled}, timeout=calls.timeout(), return_when=asyncio.FIRST_COMPLETED
+                )
+                if cancel_token.cancelled:
+                    break
+
+                # 处理完成的页请求
+                for task in done:
+                    completed = calls.complete(task)
+                    if completed is not None:
+                        for item in scheduler.complete(*completed):
+                            yield item
+
+                # 对执行时间过长的页请求提交对冲副本
+                for request in calls.take_hedges():
+                    submit(request, hedge=True)
+
+            if cancel_token.cancelled:
+                for item in scheduler.abandon():
+                    yield item
+        finally:
+            # 调用方提前停止迭代或查询被取消时，取消未完成的页请求
+            cancel_token.remove_callback(wake)
+            calls.cancel_all()
+            if calls.futures:
+                await asyncio.gather(*calls.futures, return_exceptions=True)
+
+        scheduler.finish()
+
+    async def _fetch_page_async(
+        self,
+        phone_number: str,
+        query_date: str,
+        current_page: int,
+        page_size: int = 50,
+        ready_at: float = None
+    ) -> Tuple[List[SMSRecord], Optional[int]]:
+        """
+        查询单天的某一页短信记录（异步版本），参数和返回值同 _fetch_page
+        """
+        request = self._build_request(phone_number, query_date, current_page, page_size)
+        response = await self._call_api_async(request, ready_at)
+        with self._stage(STAGE_PARSE):
+            return self._parse_page(response.body)
+
+    async def _call_api_async(self, request, ready_at: float = None):
+        """
+        经过密钥池的限流器和信号量调用异步 QuerySendDetails 接口
+
+        重试规则同 _call_api，等待期间不阻塞事件循环。
+
+        Args:
+            request: QuerySendDetailsRequest 请求对象
+            ready_at: 请求就绪的时间（time.perf_counter），默认为调用时刻
+
+        Returns:
+            接口响应（状态码为200且 body.code 不是限流错误码）
+        """
+        attempt = 0
+        if ready_at is None:
+            ready_at = time.perf_counter()
+
+        while True:
+            async with self._semaphore:
+                credential = await self._acquire_credential()
+                started = time.perf_counter()
+                try:
+                    response = await credential.client.query_send_details_with_options_async(
+                        request,
+                        self.runtime
+                    )
+                except asyncio.CancelledError:
+                    credential.release(CANCELLED)
+                    raise
+                except Exception as e:
+                    self._record_call(request, attempt, ready_at, started, error=e)
+                    delay = self._on_call_error(e, attempt, credential)
+                else:
+                    self._record_call(request, attempt, ready_at, started, response=response)
+                    delay = self._on_call_response(response, attempt, credential)
+                    if delay is None:
+                        return response
+
+            await asyncio.sleep(delay)
+            attempt += 1
+            ready_at = time.perf_counter()
+
+    async def _acquire_credential(self):
+        """从密钥池获取一组访问密钥的令牌和并发槽位，等待期间让出事件循环"""
+        while True:
+            credential, delay = self.credential_pool.try_acquire()
+            if credential is not None:
+                return credential
+            await asyncio.sleep(delay)
+
+
+def _resolve(future):
+    """完成事件循环中的 future（已完成时忽略）"""
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,309 @@
+"""
+本地模拟的 QuerySendDetails 服务
+用于压测，不消耗阿里云配额。可配置延迟、每天记录数、错误率和限流行为。
+
+单独启动：
+
+    python -m benchmarks.fake_dysmsapi --port 8080 --latency 0.05 --records-per-day 300
+
+然后设置 ALIYUN_SMS_ENDPOINT=http://127.0.0.1:8080 运行 main.py。
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+# 从签名头中取出 AccessKey ID，按 AccessKey 分别限流
+_CREDENTIAL = re.compile(r'Credential=([^,\s]+)')
+
+
+class _Server(ThreadingHTTPServer):
+    """多线程 HTTP 服务，加大监听队列以承受数百个并发连接"""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def generate_day_records(phone_number: str, send_date: str, records_per_day: int = 100, seed: int = 0):
+    """
+    确定性生成某个号码某一天的全部记录（按发送时间排序）
+
+    Args:
+        phone_number: 手机号码
+        send_date: 日期 YYYYMMDD
+        records_per_day: 平均记录数，实际在 0 到 2 倍之间浮动
+        seed: 随机种子
+
+    Returns:
+        记录字典列表，字段与 SmsSendDetailDTO 一致
+    """
+    rng = random.Random(f'{seed}:{phone_number}:{send_date}')
+    count = rng.randint(0, records_per_day * 2)
+    day = datetime.strptime(send_date, '%Y%m%d')
+    seconds = sorted(rng.randrange(86400) for _ in range(count))
+
+    records = []
+    for i, second in enumerate(seconds):
+        sent = day + timedelta(seconds=second)
+        template = rng.randrange(5)
+        records.append({
+            'PhoneNum': phone_number,
+            'SendStatus': rng.choice((3, 3, 3, 3, 3, 3, 3, 2, 1)),
+            'ErrCode': 'DELIVERED',
+            'TemplateCode': f'SMS_{100000 + template}',
+            'Content': f'【压测】您的验证码为{rng.randrange(1000000):06d}，模板{template}，序号{i}。',
+            'SendDate': sent.strftime('%Y-%m-%d %H:%M:%S'),
+            'ReceiveDate': sent.strftime('%Y-%m-%d %H:%M:%S'),
+            'OutId': '',
+        })
+    return records
+
+
+class FakeDysmsapiServer:
+    """
+    模拟 QuerySendDetails 接口的本地 HTTP 服务
+
+    每个 (手机号, 日期) 的记录由种子确定性生成，同样的参数总是返回同样的结果，
+    因此不同引擎、不同并发数的查询结果可以直接比较。
+    """
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        latency: float = 0.02,
+        latency_jitter: float = 0.5,
+        slow_rate: float = 0.0,
+        slow_factor: float = 10.0,
+        records_per_day: int = 100,
+        error_rate: float = 0.0,
+        throttle_qps: float = 0.0,
+        seed: int = 0
+    ):
+        """
+        初始化服务
+
+        Args:
+            host: 监听地址
+            port: 监听端口，0 表示自动分配
+            latency: 每个请求的平均延迟（秒）
+            latency_jitter: 延迟的随机浮动比例，0.5 表示在 ±50% 范围内均匀分布
+            slow_rate: 慢请求比例（模拟长尾延迟）
+            slow_factor: 慢请求的延迟倍数
+            records_per_day: 每个号码每天的平均记录数（实际在 0 到 2 倍之间浮动）
+            error_rate: 返回 HTTP 500 的请求比例
+            throttle_qps: 每个 AccessKey 每秒请求数超过该值时返回限流错误，0 表示不限流
+            seed: 随机种子
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.slow_rate = slow_rate
+        self.slow_factor = slow_factor
+        self.records_per_day = records_per_day
+        self.error_rate = error_rate
+        self.throttle_qps = throttle_qps
+        self.seed = seed
+
+        self.request_count = 0
+        self.error_count = 0
+        self.throttled_count = 0
+        self.connection_count = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        # 每个 AccessKey 一个令牌桶：AccessKey ID -> [令牌数, 上次补充时间]
+        self._buckets = {}
+
+        self._server = _Server((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def endpoint(self) -> str:
+        """服务地址，可直接用作 ALIYUN_SMS_ENDPOINT"""
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'FakeDysmsapiServer':
+        """在后台线程中启动服务"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """在当前线程中运行服务，直到 Ctrl-C"""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        """停止服务"""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_counters(self):
+        """清零请求计数"""
+        with self._lock:
+            self.request_count = 0
+            self.error_count = 0
+            self.throttled_count = 0
+            self.connection_count = 0
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def day_records(self, phone_number: str, send_date: str):
+        """生成某个号码某一天的全部记录，见 generate_day_records"""
+        return generate_day_records(phone_number, send_date, self.records_per_day, self.seed)
+
+    def _handle(self, query, access_key_id: str = ''):
+        """
+        处理一个请求
+
+        Args:
+            query: 查询参数
+            access_key_id: 请求签名中的 AccessKey ID
+
+        Returns:
+            (HTTP 状态码, 响应体字典)
+        """
+        with self._lock:
+            self.request_count += 1
+            throttled = self._take_token(access_key_id)
+            if throttled:
+                self.throttled_count += 1
+            failed = not throttled and self._random.random() < self.error_rate
+            if failed:
+                self.error_count += 1
+            slow = self._random.random() < self.slow_rate
+            jitter = self._random.uniform(-self.latency_jitter, self.latency_jitter)
+
+        delay = self.latency * (1 + jitter) * (self.slow_factor if slow else 1)
+        if delay > 0:
+            time.sleep(delay)
+
+        request_id = str(uuid.uuid4())
+        if throttled:
+            return 400, {
+                'Code': 'Throttling.User',
+                'Message': 'Request was denied due to user flow control.',
+                'RequestId': request_id,
+            }
+        if failed:
+            return 500, {
+                'Code': 'InternalError',
+                'Message': 'The request processing has failed due to some unknown error.',
+                'RequestId': request_id,
+            }
+
+        phone_number = query.get('PhoneNumber', [''])[0]
+        send_date = query.get('SendDate', [''])[0]
+        page_size = int(query.get('PageSize', ['50'])[0])
+        current_page = int(query.get('CurrentPage', ['1'])[0])
+
+        records = self.day_records(phone_number, send_date)
+        start = (current_page - 1) * page_size
+        return 200, {
+            'Code': 'OK',
+            'Message': 'OK',
+            'RequestId': request_id,
+            'TotalCount': str(len(records)),
+            'SmsSendDetailDTOs': {
+                'SmsSendDetailDTO': records[start:start + page_size]
+            },
+        }
+
+    def _take_token(self, access_key_id: str) -> bool:
+        """按该 AccessKey 的令牌桶判断是否限流（调用方需持有锁），返回 True 表示限流"""
+        if self.throttle_qps <= 0:
+            return False
+        now = time.monotonic()
+        bucket = self._buckets.setdefault(access_key_id, [self.throttle_qps, now])
+        bucket[0] = min(self.throttle_qps, bucket[0] + (now - bucket[1]) * self.throttle_qps)
+        bucket[1] = now
+        if bucket[0] < 1:
+            return True
+        bucket[0] -= 1
+        return False
+
+    def _make_handler(self):
+        """创建请求处理类"""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # 响应头和响应体分两次写入，关闭 Nagle 避免与客户端延迟 ACK 叠加出 40ms 延迟
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                # 每个 TCP 连接调用一次，用于确认客户端是否复用了长连接
+                super().setup()
+                with server._lock:
+                    server.connection_count += 1
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    self.rfile.read(length)
+                # SDK 的签名头形如 ACS3-HMAC-SHA256 Credential=<AccessKeyId>,SignedHeaders=...
+                match = _CREDENTIAL.search(self.headers.get('Authorization') or '')
+                status, body = server._handle(
+                    parse_qs(urlparse(self.path).query), match.group(1) if match else ''
+                )
+                payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json;charset=utf-8')
+                    self.send_header('Content-Length', str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    # 客户端已放弃请求（如对冲请求的另一个副本先返回后被取消）
+                    self.close_connection = True
+
+            do_GET = do_POST
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='本地模拟的 QuerySendDetails 服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.02, help='平均延迟（秒）')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='慢请求比例')
+    parser.add_argument('--records-per-day', type=int, default=100, help='每个号码每天的平均记录数')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回 HTTP 500 的比例')
+    parser.add_argument('--throttle-qps', type=float, default=0.0, help='每个 AccessKey 超过该 QPS 返回限流错误，0 表示不限流')
+    args = parser.parse_args()
+
+    server = FakeDysmsapiServer(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        slow_rate=args.slow_rate,
+        records_per_day=args.records_per_day,
+        error_rate=args.error_rate,
+        throttle_qps=args.throttle_qps
+    )
+    print(f"模拟服务已启动: {server.endpoint}（Ctrl-C 退出）")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,377 @@
+"""
+查询与导出性能压测
+启动本地模拟服务（fake_dysmsapi），让 SMSQueryClient 通过 ALIYUN_SMS_ENDPOINT 指向它，
+在不同并发数和日期跨度下测量吞吐、延迟和内存峰值。
+
+    python -m benchmarks.run_benchmark
+    python -m benchmarks.run_benchmark --workers 5,10,20 --days 7,30 --engine thread,async
+    python -m benchmarks.run_benchmark --json-out bench.json
+    python -m benchmarks.run_benchmark --baseline bench.json --tolerance 0.2
+    python -m benchmarks.run_benchmark --throttle-qps 20 --qps 20 --keys 1,2,4
+
+每个场景在独立的子进程中运行，内存峰值互不影响。
+指定 --baseline 时，记录吞吐（records/s）比基线下降超过 --tolerance 的场景视为回归，退出码为 1。
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，不统计内存峰值
+    resource = None
+
+from benchmarks.fake_dysmsapi import FakeDysmsapiServer, generate_day_records
+
+
+START_DATE = '20240101'
+PHONE_PREFIX = '1380013'
+
+
+def percentile(values, fraction):
+    """
+    计算百分位数（最近秩法）
+
+    Args:
+        values: 数值列表
+        fraction: 百分位，如 0.99
+
+    Returns:
+        百分位数，列表为空时返回 0
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+def peak_rss_mb():
+    """当前进程的内存峰值（MB），不支持时返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 的单位是 KB，macOS 是字节
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _phones(count):
+    """生成压测用的手机号"""
+    return [f'{PHONE_PREFIX}{i:04d}' for i in range(count)]
+
+
+def _end_date(days):
+    """从 START_DATE 开始 days 天的结束日期"""
+    start = datetime.strptime(START_DATE, '%Y%m%d')
+    return (start + timedelta(days=days - 1)).strftime('%Y%m%d')
+
+
+def _set_fake_credentials(endpoint, keys=1):
+    """让子进程中的 Config 指向模拟服务，keys 大于 1 时另设 ALIYUN_ACCESS_KEY_ID_2 等额外密钥"""
+    os.environ['ALIYUN_ACCESS_KEY_ID'] = 'benchmark'
+    os.environ['ALIYUN_ACCESS_KEY_SECRET'] = 'benchmark'
+    for number in range(2, keys + 1):
+        os.environ[f'ALIYUN_ACCESS_KEY_ID_{number}'] = f'benchmark{number}'
+        os.environ[f'ALIYUN_ACCESS_KEY_SECRET_{number}'] = 'benchmark'
+    os.environ['ALIYUN_SMS_ENDPOINT'] = endpoint
+
+
+def _timed(func, latencies):
+    """包装同步接口调用，记录每次调用的耗时"""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+    return wrapper
+
+
+def _timed_async(func, latencies):
+    """包装异步接口调用，记录每次调用的耗时"""
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+    return wrapper
+
+
+def run_query_scenario(endpoint, engine, workers, days, phones, qps, page_size=50, hedge=0.0, keys=1):
+    """
+    查询场景（在子进程中运行）
+
+    hedge 大于 0 时启用对冲请求（页请求耗时超过该分位数时对冲）；
+    keys 为访问密钥数，模拟服务按 AccessKey 分别限流
+
+    Returns:
+        指标字典
+    """
+    _set_fake_credentials(endpoint, keys)
+    from config import Config
+    from sms_query import SMSQueryClient
+    from async_sms_query import AsyncSMSQueryClient
+    from progress import QuietProgress
+    from hedging import HedgePolicy
+
+    client_class = AsyncSMSQueryClient if engine == 'async' else SMSQueryClient
+    hedging = HedgePolicy(percentile=hedge) if hedge else None
+    client = client_class(Config(), max_workers=workers, max_qps=qps, progress=QuietProgress(), hedging=hedging)
+
+    latencies = []
+    for member in client.credential_pool.members:
+        sdk = member.client
+        sdk.query_send_details_with_options = _timed(sdk.query_send_details_with_options, latencies)
+        sdk.query_send_details_with_options_async = _timed_async(
+            sdk.query_send_details_with_options_async, latencies
+        )
+
+    records = 0
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), client:
+        for _ in client.iter_send_details(_phones(phones), START_DATE, _end_date(days), page_size=page_size):
+            records += 1
+    elapsed = time.perf_counter() - start
+
+    return {
+        'elapsed': elapsed,
+        'requests': len(latencies),
+        'records': records,
+        'requests_per_sec': len(latencies) / elapsed if elapsed else 0.0,
+        'records_per_sec': records / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'retries': client.retry_count,
+        'throttled': client.credential_pool.throttled_count,
+        'failed_days': len(client.failed_days),
+        'hedge_rate': hedging.hedge_rate if hedging else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_parse_scenario(records_per_page, pages):
+    """
+    响应解析场景：反复解析同一页响应（在子进程中运行）
+
+    Returns:
+        指标字典
+    """
+    _set_fake_credentials('http://127.0.0.1:1')
+    from alibabacloud_dysmsapi20170525 import models as dysmsapi_20170525_models
+    from config import Config
+    from sms_query import SMSQueryClient
+
+    day_records = generate_day_records(f'{PHONE_PREFIX}0000', START_DATE, records_per_page)[:records_per_page]
+    body = dysmsapi_20170525_models.QuerySendDetailsResponseBody().from_map({
+        'Code': 'OK',
+        'Message': 'OK',
+        'TotalCount': str(len(day_records)),
+        'SmsSendDetailDTOs': {'SmsSendDetailDTO': day_records},
+    })
+
+    client = SMSQueryClient(Config())
+    records = 0
+    start = time.perf_counter()
+    for _ in range(pages):
+        page_records, _ = client._parse_page(body)
+        records += len(page_records)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'elapsed': elapsed,
+        'records': records,
+        'records_per_sec': records / elapsed if elapsed else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_export_scenario(output_format, records):
+    """
+    导出场景：把生成的记录流式导出到临时文件（在子进程中运行）
+
+    Returns:
+        指标字典
+    """
+    from sms_record import SMSRecord
+    from csv_export import export_to_csv
+    from excel_export import export_to_excel
+    import parquet_export
+
+    exporters = {
+        'csv': export_to_csv,
+        'xlsx': export_to_excel,
+        'parquet': parquet_export.export_to_parquet,
+    }
+    base_ts = int(datetime.strptime(START_DATE, '%Y%m%d').timestamp())
+
+    def generate():
+        for i in range(records):
+            yield SMSRecord(
+                f'{PHONE_PREFIX}{i % 100:04d}',
+                base_ts + i,
+                3 if i % 9 else 2,
+                f'【压测】您的验证码为{i % 1000000:06d}，请在5分钟内使用。',
+                f'SMS_{100000 + i % 5}'
+            )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_file = os.path.join(tmp_dir, f'bench.{output_format}')
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            exporters[output_format](generate(), output_file)
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(output_file)
+
+    return {
+        'elapsed': elapsed,
+        'records': records,
+        'records_per_sec': records / elapsed if elapsed else 0.0,
+        'file_mb': size / (1024 * 1024),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def _run_isolated(func, *args):
+    """在新的子进程中运行场景，保证内存峰值只反映该场景"""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(func, *args).result()
+
+
+def _parse_list(value, convert=str):
+    """解析逗号分隔的参数"""
+    return [convert(item) for item in value.split(',') if item.strip()]
+
+
+def _format_row(name, result):
+    """格式化一行结果"""
+    rss = result.get('peak_rss_mb')
+    columns = [
+        f"{name:<42}",
+        f"{result.get('requests_per_sec', 0):>10.1f}",
+        f"{result['records_per_sec']:>12.0f}",
+        f"{result.get('p50_ms', 0):>8.1f}",
+        f"{result.get('p99_ms', 0):>8.1f}",
+        f"{rss:>9.1f}" if rss is not None else f"{'-':>9}",
+        f"{result['connections']:>6}" if 'connections' in result else f"{'-':>6}",
+    ]
+    return ' '.join(columns)
+
+
+def _check_regressions(results, baseline_path, tolerance):
+    """
+    与基线比较记录吞吐
+
+    Returns:
+        回归的场景描述列表
+    """
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]['records_per_sec']
+        actual = result['records_per_sec']
+        if expected and actual < expected * (1 - tolerance):
+            regressions.append(f"{name}: {actual:.0f} records/s，基线 {expected:.0f} records/s")
+    return regressions
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='短信查询工具性能压测（使用本地模拟服务）')
+    parser.add_argument('--engine', default='thread', help='查询引擎，逗号分隔：thread,async')
+    parser.add_argument('--workers', default='1,5,10,20', help='并发数，逗号分隔')
+    parser.add_argument('--days', default='7,30', help='日期跨度（天），逗号分隔')
+    parser.add_argument('--phones', type=int, default=2, help='手机号数量')
+    parser.add_argument('--qps', type=float, default=1000.0, help='客户端每秒请求数上限')
+    parser.add_argument('--latency', type=float, default=0.02, help='模拟服务平均延迟（秒）')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='模拟服务慢请求比例')
+    parser.add_argument('--hedge', type=float, default=0.0, help='对冲分位数（如 95），大于 0 时每个查询场景再以对冲模式运行一次')
+    parser.add_argument('--records-per-day', type=int, default=100, help='每个号码每天的平均记录数')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='模拟服务返回 HTTP 500 的比例')
+    parser.add_argument('--throttle-qps', type=float, default=0.0, help='模拟服务每个 AccessKey 的限流阈值，0 表示不限流')
+    parser.add_argument('--keys', default='1', help='访问密钥数，逗号分隔（如 1,2,4），模拟服务按 AccessKey 分别限流')
+    parser.add_argument('--parse-pages', type=int, default=2000, help='解析场景的页数，0 表示跳过')
+    parser.add_argument('--export-formats', default='csv,xlsx,parquet', help='导出场景的格式，逗号分隔，留空跳过')
+    parser.add_argument('--export-records', type=int, default=100000, help='导出场景的记录数')
+    parser.add_argument('--json-out', help='把结果写入 JSON 文件，可作为后续运行的基线')
+    parser.add_argument('--baseline', help='基线 JSON 文件')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='允许的吞吐下降比例，默认 0.2')
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'scenario':<42} {'requests/s':>10} {'records/s':>12} {'p50 ms':>8} {'p99 ms':>8} {'RSS MB':>9} {'conns':>6}")
+    print('-' * 101)
+
+    with FakeDysmsapiServer(
+        latency=args.latency,
+        slow_rate=args.slow_rate,
+        records_per_day=args.records_per_day,
+        error_rate=args.error_rate,
+        throttle_qps=args.throttle_qps
+    ) as server:
+        for engine in _parse_list(args.engine):
+            for days in _parse_list(args.days, int):
+                for workers in _parse_list(args.workers, int):
+                    for keys in _parse_list(args.keys, int):
+                        for hedge in ([0.0, args.hedge] if args.hedge else [0.0]):
+                            name = f"query {engine} workers={workers} days={days}"
+                            if keys > 1:
+                                name += f" keys={keys}"
+                            if hedge:
+                                name += f" hedge{hedge:g}"
+                            server.reset_counters()
+                            result = _run_isolated(
+                                run_query_scenario, server.endpoint, engine, workers, days, args.phones, args.qps,
+                                50, hedge, keys
+                            )
+                            # 模拟服务收到的 TCP 连接数，长连接复用时远小于请求数
+                            result['connections'] = server.connection_count
+                            results[name] = result
+                            print(_format_row(name, result))
+
+    if args.parse_pages:
+        name = f"parse pages={args.parse_pages}"
+        results[name] = _run_isolated(run_parse_scenario, 50, args.parse_pages)
+        print(_format_row(name, results[name]))
+
+    for output_format in _parse_list(args.export_formats):
+        if output_format == 'parquet':
+            import parquet_export
+            if not parquet_export.is_available():
+                print(f"{'export parquet':<42} 跳过（未安装 pyarrow）")
+                continue
+        name = f"export {output_format} records={args.export_records}"
+        results[name] = _run_isolated(run_export_scenario, output_format, args.export_records)
+        print(_format_row(name, results[name]))
+
+    if args.json_out:
+        with open(args.json_out, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入: {args.json_out}")
+
+    if args.baseline:
+        regressions = _check_regressions(results, args.baseline, args.tolerance)
+        if regressions:
+            print(f"\n⚠️  {len(regressions)} 个场景吞吐下降超过 {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\n✓ 没有发现性能回归")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""
+启动时间压测
+测量 main.py（或打包后的可执行文件）在 --help、参数校验失败等短命令上的耗时，
+并检查导入 main 时没有加载阿里云 SDK、openpyxl、pyarrow 等重量级模块。
+
+    python -m benchmarks.startup_benchmark
+    python -m benchmarks.startup_benchmark --runs 20 --max-overhead-ms 150
+    python -m benchmarks.startup_benchmark --executable release/query-sms/query-sms
+    python -m benchmarks.startup_benchmark --json-out startup.json
+    python -m benchmarks.startup_benchmark --baseline startup.json --tolerance 0.3
+
+耗时按相对于空解释器（python -c pass）的额外开销比较，减少不同机器之间的差异。
+任一场景的中位数开销超过 --max-overhead-ms，或比基线慢超过 --tolerance，
+或导入 main 时加载了重量级模块，退出码为 1。
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.run_benchmark import percentile
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 导入 main 时不应加载的模块（只在真正查询或导出时才需要）
+HEAVY_MODULES = (
+    'alibabacloud_dysmsapi20170525',
+    'alibabacloud_tea_openapi',
+    'alibabacloud_tea_util',
+    'aiohttp',
+    'requests',
+    'openpyxl',
+    'pyarrow',
+    'numpy',
+    'zstandard',
+    'dotenv',
+    'asyncio',
+)
+
+# 场景名 -> main.py 的参数
+SCENARIOS = {
+    'help': ['--help'],
+    'invalid phone': ['-p', '123', '-s', '20240101'],
+    'invalid date': ['-p', '13800138000', '-s', '2024-13-45'],
+}
+
+
+def _time_command(command, runs):
+    """
+    多次运行命令并记录耗时
+
+    Args:
+        command: 命令参数列表
+        runs: 运行次数
+
+    Returns:
+        每次运行的耗时（毫秒）列表
+    """
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        durations.append((time.perf_counter() - started) * 1000)
+    return durations
+
+
+def _summarize(durations, baseline_ms):
+    """汇总耗时分布"""
+    median = percentile(durations, 0.5)
+    return {
+        'min_ms': round(min(durations), 1),
+        'median_ms': round(median, 1),
+        'p90_ms': round(percentile(durations, 0.9), 1),
+        'overhead_ms': round(max(0.0, median - baseline_ms), 1),
+    }
+
+
+def find_heavy_imports():
+    """
+    在子进程中导入 main，返回已加载的重量级模块
+
+    Returns:
+        重量级模块名列表
+    """
+    code = 'import json, sys, main; print(json.dumps(sorted(sys.modules)))'
+    output = subprocess.run(
+        [sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    loaded = set(json.loads(output))
+    return [name for name in HEAVY_MODULES if name in loaded]
+
+
+def slowest_imports(count=10):
+    """
+    用 -X importtime 找出导入 main 时累计耗时最多的模块
+
+    Returns:
+        (模块名, 累计耗时毫秒) 列表
+    """
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'],
+        cwd=ROOT, capture_output=True, text=True
+    ).stderr
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        entries.append((name.strip(), int(cumulative) / 1000))
+    entries.sort(key=lambda item: -item[1])
+    return entries[:count]
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='短信查询工具启动时间压测')
+    parser.add_argument('--runs', type=int, default=10, help='每个场景的运行次数')
+    parser.add_argument('--executable', help='测量打包后的可执行文件，默认测量 python main.py')
+    parser.add_argument('--max-overhead-ms', type=float, default=200.0,
+                        help='相对空解释器的中位数开销上限（毫秒），默认 200')
+    parser.add_argument('--json-out', help='把结果写入 JSON 文件，可作为后续运行的基线')
+    parser.add_argument('--baseline', help='基线 JSON 文件')
+    parser.add_argument('--tolerance', type=float, default=0.3, help='允许的开销增长比例，默认 0.3')
+    args = parser.parse_args()
+
+    if args.executable:
+        command = [os.path.abspath(args.executable)]
+        baseline_ms = 0.0
+    else:
+        command = [sys.executable, 'main.py']
+        baseline_ms = percentile(_time_command([sys.executable, '-c', 'pass'], args.runs), 0.5)
+        print(f"空解释器启动: {baseline_ms:.1f} ms")
+
+    results = {}
+    print(f"{'scenario':<20} {'min ms':>8} {'median ms':>10} {'p90 ms':>8} {'overhead ms':>12}")
+    print('-' * 62)
+    for name, scenario_args in SCENARIOS.items():
+        result = _summarize(_time_command(command + scenario_args, args.runs), baseline_ms)
+        results[name] = result
+        print(f"{name:<20} {result['min_ms']:>8.1f} {result['median_ms']:>10.1f} "
+              f"{result['p90_ms']:>8.1f} {result['overhead_ms']:>12.1f}")
+
+    failures = []
+    if not args.executable:
+        print("\n导入 main 最慢的模块（累计毫秒）:")
+        for name, cumulative in slowest_imports():
+            print(f"  {cumulative:>8.1f}  {name}")
+        heavy = find_heavy_imports()
+        if heavy:
+            failures.append(f"导入 main 时加载了重量级模块: {', '.join(heavy)}")
+
+    for name, result in results.items():
+        if result['overhead_ms'] > args.max_overhead_ms:
+            failures.append(f"{name}: 开销 {result['overhead_ms']:.1f} ms，上限 {args.max_overhead_ms:.0f} ms")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        for name, result in results.items():
+            expected = baseline.get(name, {}).get('overhead_ms')
+            if expected and result['overhead_ms'] > expected * (1 + args.tolerance):
+                failures.append(f"{name}: 开销 {result['overhead_ms']:.1f} ms，基线 {expected:.1f} ms")
+
+    if args.json_out:
+        with open(args.json_out, 'w', encoding='utf-8') as f:
+            json.dump({'interpreter_ms': round(baseline_ms, 1), 'results': results}, f, indent=2)
+        print(f"\n结果已写入: {args.json_out}")
+
+    if failures:
+        print("\n⚠️  启动时间回归:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
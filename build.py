@@ -6,10 +6,34 @@
 import os
 import sys
 import shutil
+import argparse
 import subprocess
 from pathlib import Path
 
 
+# 打包方式
+#   onefile: 单个可执行文件，便于分发；每次启动都要解压到临时目录，启动较慢
+#   fast:    目录形式（onedir），不需要解压，并排除运行时用不到的模块，适合频繁调用（如 cron）
+PROFILES = ('onefile', 'fast')
+
+# fast 方式排除的模块（标准库和常见开发工具中本项目运行时不需要的部分）
+EXCLUDED_MODULES = [
+    'tkinter',
+    'unittest',
+    'pydoc',
+    'pydoc_data',
+    'doctest',
+    'lib2to3',
+    'distutils',
+    'setuptools',
+    'pip',
+    'pytest',
+    'IPython',
+    'matplotlib',
+    'PIL',
+]
+
+
 def run_command(cmd, description):
     """运行命令并显示进度"""
     print(f"\n{'='*60}")
@@ -68,14 +92,19 @@ def clean_build():
     print("✓ 清理完成")
 
 
-def build_executable():
-    """使用 PyInstaller 构建可执行文件"""
+def build_executable(profile='onefile'):
+    """
+    使用 PyInstaller 构建可执行文件
+    
+    Args:
+        profile: 打包方式，onefile 或 fast
+    """
     
     # PyInstaller 命令
     cmd = [
         "pyinstaller",
         "--name=query-sms",              # 可执行文件名称
-        "--onefile",                      # 打包成单个文件
+        "--onedir" if profile == 'fast' else "--onefile",  # 目录形式启动更快
         "--console",                      # 控制台应用
         "--clean",                        # 清理临时文件
         "--noconfirm",                    # 不询问确认
@@ -84,15 +113,37 @@ def build_executable():
         "--hidden-import=openpyxl",
         "--hidden-import=dotenv",
         "--hidden-import=click",
-        # 主程序入口
-        "main.py"
+        # 延迟导入的模块，PyInstaller 无法通过静态分析发现
+        "--hidden-import=sms_query",
+        "--hidden-import=async_sms_query",
+        "--hidden-import=sms_server",
+        "--hidden-import=sync_state",
+        "--hidden-import=merge_outputs",
+        "--hidden-import=analytics",
+        "--hidden-import=compression",
+        "--hidden-import=cancellation",
+        "--hidden-import=cost_model",
+        "--hidden-import=profiling",
+        "--hidden-import=csv_export",
+        "--hidden-import=excel_export",
+        "--hidden-import=parquet_export",
     ]
+    if profile == 'fast':
+        cmd += [f"--exclude-module={module}" for module in EXCLUDED_MODULES]
+        cmd.append("--noupx")             # 不压缩动态库，省去加载时的解压
+    # 主程序入口
+    cmd.append("main.py")
     
     run_command(' '.join(cmd), "打包可执行文件")
 
 
-def create_release_package():
-    """创建发布包"""
+def create_release_package(profile='onefile'):
+    """
+    创建发布包
+    
+    Args:
+        profile: 打包方式，onefile 或 fast
+    """
     print("\n正在创建发布包...")
     
     release_dir = Path("release")
@@ -103,7 +154,11 @@ def create_release_package():
     
     # 复制可执行文件
     exe_path = Path("dist/query-sms")
-    if exe_path.exists():
+    if profile == 'fast' and exe_path.is_dir():
+        # onedir：整个目录一起发布，可执行文件为 query-sms/query-sms
+        shutil.copytree(exe_path, release_dir / "query-sms")
+        print(f"  ✓ 已复制程序目录")
+    elif exe_path.is_file():
         shutil.copy(exe_path, release_dir / "query-sms")
         # 添加执行权限
         os.chmod(release_dir / "query-sms", 0o755)
@@ -122,7 +177,10 @@ def create_release_package():
     
     print(f"\n✅ 发布包已创建在 release/ 目录")
     print(f"\n📦 发布包包含:")
-    print(f"  - query-sms          (可执行文件)")
+    if profile == 'fast':
+        print(f"  - query-sms/         (程序目录，可执行文件为 query-sms/query-sms)")
+    else:
+        print(f"  - query-sms          (可执行文件)")
     print(f"  - env.example        (配置文件示例)")
     print(f"  - 使用说明.txt       (快速上手指南)")
 
@@ -240,6 +298,15 @@ A: 检查网络连接和阿里云凭证是否有效。
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='使用 PyInstaller 打包阿里云短信查询工具')
+    parser.add_argument(
+        '--profile',
+        choices=PROFILES,
+        default='onefile',
+        help='打包方式：onefile 单个文件（默认），fast 目录形式、启动更快'
+    )
+    args = parser.parse_args()
+    
     print("""
 ╔════════════════════════════════════════════════════════════╗
 ║                                                            ║
@@ -264,10 +331,10 @@ def main():
         clean_build()
         
         # 3. 构建可执行文件
-        build_executable()
+        build_executable(args.profile)
         
         # 4. 创建发布包
-        create_release_package()
+        create_release_package(args.profile)
         
         # 5. 清理临时文件
         print("\n正在清理临时文件...")
@@ -283,7 +350,8 @@ def main():
         print("  cd release")
         print("  cp env.example .env")
         print("  # 编辑 .env 填入阿里云凭证")
-        print("  ./query-sms -p 13800138000 -s 20231103")
+        executable = "./query-sms/query-sms" if args.profile == 'fast' else "./query-sms"
+        print(f"  {executable} -p 13800138000 -s 20231103")
         print("\n" + "="*60)
         
     except KeyboardInterrupt:
@@ -0,0 +1,152 @@
+"""
+查询取消模块
+全局截止时间和协作式取消：取消后不再开始新的日期和页请求，执行中的页请求在当前调用返回后放弃
+"""
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional
+
+
+# 取消原因
+REASON_DEADLINE = 'deadline'     # 到达 --deadline 截止时间
+REASON_INTERRUPT = 'interrupt'   # 用户按下 Ctrl-C
+
+
+class QueryCancelled(Exception):
+    """查询已取消（到达截止时间或用户中断），页请求不再重试"""
+
+
+class CancelToken:
+    """
+    取消令牌，查询客户端、调度循环和工作线程共用
+
+    - cancel() 可以在任意线程中调用，只有第一次生效
+    - 指定了截止时间时，由后台定时器在到期时自动 cancel(REASON_DEADLINE)
+    - future 在取消时完成，线程池引擎的调度循环把它和页请求一起等待，取消后立即醒来；
+      asyncio 引擎用 add_callback() 唤醒事件循环
+    - sleep() 代替 time.sleep()，取消时立即抛出 QueryCancelled
+    - 信号处理函数中使用 cancel_soon()，避免在信号处理函数里等待主线程持有的锁
+    """
+
+    def __init__(self, deadline: Optional[float] = None):
+        """
+        初始化令牌
+
+        Args:
+            deadline: 从现在起多少秒后自动取消，为 None 时不限时
+
+        Raises:
+            ValueError: 截止时间不是正数
+        """
+        if deadline is not None and deadline <= 0:
+            raise ValueError("截止时间必须大于 0 秒")
+        self.deadline = deadline
+        self.expires_at = time.monotonic() + deadline if deadline is not None else None
+        self.reason = None
+        self.future = Future()
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._timer = None
+        if deadline is not None:
+            self._timer = threading.Timer(deadline, self.cancel, (REASON_DEADLINE,))
+            self._timer.daemon = True
+            self._timer.start()
+
+    @property
+    def cancelled(self) -> bool:
+        """是否已取消"""
+        return self._event.is_set()
+
+    def cancel(self, reason: str = REASON_INTERRUPT):
+        """
+        取消查询
+
+        Args:
+            reason: REASON_DEADLINE 或 REASON_INTERRUPT
+        """
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks)
+        if self._timer is not None:
+            self._timer.cancel()
+        self.future.set_result(reason)
+        for callback in callbacks:
+            callback()
+
+    def cancel_soon(self, reason: str = REASON_INTERRUPT):
+        """
+        在新线程中取消（供信号处理函数使用）
+
+        信号处理函数在主线程中执行，主线程此时可能正持有令牌或 future 的锁，
+        直接 cancel() 会死锁。
+
+        Args:
+            reason: REASON_DEADLINE 或 REASON_INTERRUPT
+        """
+        threading.Thread(target=self.cancel, args=(reason,), name='cancel', daemon=True).start()
+
+    def add_callback(self, callback):
+        """
+        登记取消时调用的函数（在调用 cancel() 的线程中执行），已取消时立即调用
+
+        Args:
+            callback: 无参数的函数
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback):
+        """注销 add_callback() 登记的函数"""
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def remaining(self) -> Optional[float]:
+        """
+        距离截止时间还有多少秒
+
+        Returns:
+            秒数（不小于 0），没有截止时间时为 None
+        """
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def check(self):
+        """
+        已取消时抛出异常；已过截止时间但定时器还没触发时先取消
+
+        Raises:
+            QueryCancelled: 已取消
+        """
+        if self.expires_at is not None and time.monotonic() >= self.expires_at:
+            self.cancel(REASON_DEADLINE)
+        if self._event.is_set():
+            raise QueryCancelled(self.reason)
+
+    def sleep(self, seconds: float):
+        """
+        等待指定秒数，取消时提前返回并抛出异常
+
+        Raises:
+            QueryCancelled: 等待期间或之前已取消
+        """
+        if self._event.wait(seconds):
+            raise QueryCancelled(self.reason)
+
+    def close(self):
+        """停止截止时间定时器（查询正常结束时）"""
+        if self._timer is not None:
+            self._timer.cancel()
+
+    def __repr__(self):
+        state = f"cancelled={self.reason}" if self.cancelled else "active"
+        return f"CancelToken(deadline={self.deadline}, {state})"
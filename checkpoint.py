@@ -0,0 +1,172 @@
+"""
+断点续查模块
+每查询完一天就把当天结果追加到日志文件，中断后只重新查询缺失或失败的日期
+"""
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from sms_record import SMSRecord
+
+
+JOURNAL_VERSION = 1
+
+
+class CheckpointJournal:
+    """
+    单次查询任务的断点日志（JSON Lines）
+
+    第一行是查询参数（手机号、日期范围、输出文件和格式），之后每行是一个已完成的日期：
+    {"phone_number": ..., "send_date": ..., "records": [[字段...], ...]}。
+    查询失败的日期不写入，续查时会重新查询。每行写入后立即 flush，
+    进程崩溃时最多丢失正在写入的那一行，加载时会忽略不完整的最后一行。
+
+    续查时只在内存中保存每个日期在文件中的偏移量，记录按需读取。
+    """
+
+    def __init__(self, path: str, params: Dict, index: Dict = None):
+        """
+        初始化日志（请使用 create / load 创建）
+
+        Args:
+            path: 日志文件路径
+            params: 查询参数
+            index: (手机号, 日期) -> 该日期所在行的文件偏移量
+        """
+        self.path = path
+        self.params = params
+        self.hits = 0
+        self._index = index or {}
+        self._lock = threading.Lock()
+        self._writer = open(path, 'ab')
+        self._reader = open(path, 'rb')
+
+    @classmethod
+    def create(cls, path: str, params: Dict) -> 'CheckpointJournal':
+        """
+        创建新的日志文件（已存在时覆盖）
+
+        Args:
+            path: 日志文件路径
+            params: 查询参数，续查时原样取回
+
+        Returns:
+            断点日志
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            header = dict(params, version=JOURNAL_VERSION)
+            f.write(json.dumps(header, ensure_ascii=False) + '\n')
+        return cls(path, params)
+
+    @classmethod
+    def load(cls, path: str) -> 'CheckpointJournal':
+        """
+        打开已有的日志文件继续查询
+
+        Args:
+            path: 日志文件路径
+
+        Returns:
+            断点日志，params 为创建时的查询参数
+
+        Raises:
+            ValueError: 文件不是有效的断点日志
+        """
+        index = {}
+        valid_size = 0
+        with open(path, 'rb') as f:
+            try:
+                header = json.loads(f.readline())
+            except ValueError:
+                raise ValueError(f"{path} 不是有效的断点日志")
+            if not isinstance(header, dict) or header.get('version') != JOURNAL_VERSION:
+                raise ValueError(f"{path} 不是有效的断点日志")
+            valid_size = f.tell()
+
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line.endswith(b'\n'):
+                    # 中断时未写完的最后一行
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                index[(entry['phone_number'], entry['send_date'])] = offset
+                valid_size = f.tell()
+
+        # 截掉不完整的尾部，之后追加的行才能正常读取
+        if valid_size != os.path.getsize(path):
+            with open(path, 'r+b') as f:
+                f.truncate(valid_size)
+
+        params = {key: value for key, value in header.items() if key != 'version'}
+        return cls(path, params, index)
+
+    @property
+    def completed_count(self) -> int:
+        """日志中已完成的日期数"""
+        return len(self._index)
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        """(手机号, 日期) 是否已在日志中"""
+        return key in self._index
+
+    def get(self, phone_number: str, query_date: str) -> Optional[List[SMSRecord]]:
+        """
+        读取日志中某一天的记录
+
+        Args:
+            phone_number: 手机号码
+            query_date: 日期 YYYYMMDD
+
+        Returns:
+            当天的记录列表，日志中没有该日期时返回 None
+        """
+        offset = self._index.get((phone_number, query_date))
+        if offset is None:
+            return None
+
+        with self._lock:
+            self._reader.seek(offset)
+            line = self._reader.readline()
+            self.hits += 1
+        return [SMSRecord(*item) for item in json.loads(line)['records']]
+
+    def put(self, phone_number: str, query_date: str, records: List[SMSRecord]):
+        """
+        追加一个已完成的日期
+
+        Args:
+            phone_number: 手机号码
+            query_date: 日期 YYYYMMDD
+            records: 当天完整的记录列表
+        """
+        line = json.dumps(
+            {'phone_number': phone_number, 'send_date': query_date, 'records': records},
+            ensure_ascii=False,
+            separators=(',', ':')
+        )
+        with self._lock:
+            if (phone_number, query_date) in self._index:
+                return
+            self._writer.seek(0, os.SEEK_END)
+            self._index[(phone_number, query_date)] = self._writer.tell()
+            self._writer.write(line.encode('utf-8') + b'\n')
+            self._writer.flush()
+
+    def close(self):
+        """关闭日志文件"""
+        with self._lock:
+            self._writer.close()
+            self._reader.close()
+
+    def remove(self):
+        """关闭并删除日志文件（任务全部完成后调用）"""
+        self.close()
+        os.remove(self.path)
+
+    def __repr__(self):
+        return f"CheckpointJournal(path={self.path}, completed={self.completed_count})"
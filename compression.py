@@ -0,0 +1,263 @@
+"""
+压缩输出模块
+按文件扩展名（.gz / .zst）流式压缩导出文件，压缩和写盘在后台线程中进行，
+与查询并行，不增加总耗时
+"""
+import gzip
+import io
+import queue
+import threading
+import zlib
+from typing import Optional, Tuple
+
+_zstandard_module = None
+
+
+# 压缩方式 -> 文件扩展名
+COMPRESSIONS = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+# 默认压缩级别
+DEFAULT_LEVELS = {
+    'gzip': 6,
+    'zstd': 3,
+}
+
+# 允许的压缩级别范围
+LEVEL_RANGES = {
+    'gzip': (1, 9),
+    'zstd': (1, 22),
+}
+
+# 写入缓冲区大小，攒够一块再交给后台线程压缩
+BUFFER_SIZE = 256 * 1024
+
+# 后台线程最多积压的块数，压缩跟不上写入时阻塞写入方，限制内存占用
+QUEUE_SIZE = 16
+
+
+def _zstandard():
+    """
+    导入 zstandard（可选依赖，仅 zstd 压缩时需要，在第一次使用时才导入）
+
+    Returns:
+        zstandard 模块，未安装时为 None
+    """
+    global _zstandard_module
+    if _zstandard_module is None:
+        try:
+            import zstandard
+        except ImportError:
+            return None
+        _zstandard_module = zstandard
+    return _zstandard_module
+
+
+def is_available(method: str) -> bool:
+    """
+    压缩方式所需的模块是否已安装
+
+    Args:
+        method: gzip 或 zstd
+
+    Returns:
+        gzip 总是可用，zstd 需要安装 zstandard
+    """
+    return method != 'zstd' or _zstandard() is not None
+
+
+def detect_compression(path: str) -> Optional[str]:
+    """
+    根据文件扩展名判断压缩方式
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        gzip、zstd，未压缩时为 None
+    """
+    lower = path.lower()
+    for method, suffix in COMPRESSIONS.items():
+        if lower.endswith(suffix):
+            return method
+    return None
+
+
+def split_compression(path: str) -> Tuple[str, Optional[str]]:
+    """
+    去掉文件路径末尾的压缩扩展名
+
+    Args:
+        path: 文件路径，如 report.csv.gz
+
+    Returns:
+        (去掉压缩扩展名的路径, 压缩方式)，如 ('report.csv', 'gzip')
+    """
+    method = detect_compression(path)
+    if method is None:
+        return path, None
+    return path[:-len(COMPRESSIONS[method])], method
+
+
+def validate(method: str, level: Optional[int] = None):
+    """
+    检查压缩方式和压缩级别
+
+    Args:
+        method: gzip 或 zstd
+        level: 压缩级别，None 表示默认级别
+
+    Raises:
+        ValueError: 不支持的压缩方式或级别超出范围
+        RuntimeError: zstd 压缩需要安装 zstandard
+    """
+    if method not in COMPRESSIONS:
+        raise ValueError(f"不支持的压缩方式: {method}（支持 {'、'.join(COMPRESSIONS)}）")
+    low, high = LEVEL_RANGES[method]
+    if level is not None and not low <= level <= high:
+        raise ValueError(f"{method} 的压缩级别必须在 {low}-{high} 之间")
+    if not is_available(method):
+        raise RuntimeError("zstd 压缩需要安装 zstandard: pip install zstandard")
+
+
+def open_compressed(
+    path: str,
+    method: str,
+    level: Optional[int] = None,
+    append: bool = False,
+    encoding: str = 'utf-8'
+) -> io.TextIOWrapper:
+    """
+    打开压缩的文本文件用于写入
+
+    写入的文本先在缓冲区中攒成 BUFFER_SIZE 大小的块，由后台线程压缩并写盘。
+    zlib 和 zstd 压缩时释放 GIL，压缩与查询线程真正并行。
+    追加模式下在文件末尾写入新的 gzip 成员 / zstd 帧，解压时与一次写入的文件相同。
+
+    Args:
+        path: 输出文件路径
+        method: gzip 或 zstd
+        level: 压缩级别，None 表示默认级别
+        append: 追加到已有文件末尾
+        encoding: 文本编码
+
+    Returns:
+        文本文件对象（newline=''，可直接交给 csv.writer），关闭时等待后台线程写完
+    """
+    validate(method, level)
+    raw = BackgroundCompressor(path, method, level, append=append)
+    return io.TextIOWrapper(io.BufferedWriter(raw, BUFFER_SIZE), encoding=encoding, newline='')
+
+
+def open_text(path: str, encoding: str = 'utf-8') -> io.TextIOBase:
+    """
+    打开文本文件用于读取，按扩展名透明解压
+
+    Args:
+        path: 文件路径（.gz / .zst 为压缩文件）
+        encoding: 文本编码
+
+    Returns:
+        文本文件对象（newline=''）
+    """
+    method = detect_compression(path)
+    if method == 'gzip':
+        return gzip.open(path, 'rt', encoding=encoding, newline='')
+    if method == 'zstd':
+        validate(method)
+        reader = _zstandard().ZstdDecompressor().stream_reader(
+            open(path, 'rb'), read_across_frames=True, closefd=True
+        )
+        return io.TextIOWrapper(io.BufferedReader(reader), encoding=encoding, newline='')
+    return open(path, 'r', newline='', encoding=encoding)
+
+
+class BackgroundCompressor(io.RawIOBase):
+    """
+    在后台线程中压缩并写盘的二进制文件
+
+    write() 只把数据块放入有界队列；后台线程取出数据块压缩后写入文件。
+    后台线程出错时，错误在下一次 write() 或 close() 时抛出。
+    """
+
+    def __init__(self, path: str, method: str, level: Optional[int] = None, append: bool = False):
+        """
+        打开文件并启动后台线程
+
+        Args:
+            path: 输出文件路径
+            method: gzip 或 zstd
+            level: 压缩级别，None 表示默认级别
+            append: 追加到已有文件末尾
+        """
+        super().__init__()
+        if level is None:
+            level = DEFAULT_LEVELS[method]
+        if method == 'gzip':
+            # wbits=31 输出带 gzip 头和尾的流
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        else:
+            self._compressor = _zstandard().ZstdCompressor(level=level).compressobj()
+        self._file = open(path, 'ab' if append else 'wb')
+        self._queue = queue.Queue(QUEUE_SIZE)
+        self._error = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._thread = threading.Thread(target=self._run, name='compress-writer', daemon=True)
+        self._thread.start()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        """把数据块交给后台线程"""
+        self._raise_error()
+        chunk = bytes(data)
+        self._queue.put(chunk)
+        return len(chunk)
+
+    def close(self):
+        """等待后台线程写完剩余数据并关闭文件"""
+        if self.closed:
+            return
+        try:
+            self._queue.put(None)
+            self._thread.join()
+        finally:
+            self._file.close()
+            super().close()
+        self._raise_error()
+
+    def _run(self):
+        """后台线程：逐块压缩并写盘，直到收到结束标记"""
+        while True:
+            chunk = self._queue.get()
+            if self._error is not None:
+                # 已出错，只取出数据块使写入方不被阻塞
+                if chunk is None:
+                    return
+                continue
+            try:
+                if chunk is None:
+                    self._output(self._compressor.flush())
+                    self._file.flush()
+                    return
+                self.bytes_in += len(chunk)
+                self._output(self._compressor.compress(chunk))
+            except Exception as e:
+                self._error = e
+                if chunk is None:
+                    return
+
+    def _output(self, data: bytes):
+        """写入压缩后的数据"""
+        if data:
+            self._file.write(data)
+            self.bytes_out += len(data)
+
+    def _raise_error(self):
+        """抛出后台线程中的错误"""
+        if self._error is not None:
+            raise OSError(f"写入压缩文件失败: {self._error}") from self._error
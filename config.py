@@ -3,39 +3,192 @@
 从环境变量中加载阿里云访问密钥等配置信息
 """
 import os
-from dotenv import load_dotenv
+import re
+from typing import List, NamedTuple
 
-# 加载 .env 文件
-load_dotenv()
+
+_env_loaded = False
+
+# 默认连接超时和读取超时（毫秒）
+DEFAULT_CONNECT_TIMEOUT = 5000
+DEFAULT_READ_TIMEOUT = 10000
+
+
+# 额外访问密钥的环境变量：ALIYUN_ACCESS_KEY_ID_2 / ALIYUN_ACCESS_KEY_SECRET_2，依此类推
+_NUMBERED_KEY_ID = re.compile(r'^ALIYUN_ACCESS_KEY_ID_(\d+)$')
+
+
+class Credential(NamedTuple):
+    """一组 AccessKey（每个 RAM 子账号有自己的接口调用配额）"""
+    access_key_id: str
+    access_key_secret: str
+    source: str     # 配置来源，用于错误信息
+
+    @property
+    def label(self) -> str:
+        """用于显示的名称（只显示 AccessKey ID 的首尾几位）"""
+        key_id = self.access_key_id
+        return key_id if len(key_id) <= 8 else f"{key_id[:4]}…{key_id[-4:]}"
+
+    def __repr__(self):
+        # 不输出 AccessKey Secret
+        return f"Credential({self.label}, source={self.source})"
+
+
+def load_env_file():
+    """加载 .env 文件（只加载一次，首次读取配置时调用）"""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
 
 
 class Config:
     """配置类"""
     
     def __init__(self):
+        load_env_file()
         self.access_key_id = os.getenv('ALIYUN_ACCESS_KEY_ID')
         self.access_key_secret = os.getenv('ALIYUN_ACCESS_KEY_SECRET')
         self.region = os.getenv('ALIYUN_REGION', 'cn-hangzhou')
+        # 短信服务地址，可带协议前缀（如 http://127.0.0.1:8080，用于本地压测）；
+        # 未设置时由 SDK 按地域选择（如 ap-southeast-1 → dysmsapi.ap-southeast-1.aliyuncs.com）
+        self.endpoint = os.getenv('ALIYUN_SMS_ENDPOINT') or None
+        # 多组访问密钥：每组一个客户端，页请求分散到各组，每组单独限流
+        self.credentials_file = os.getenv('ALIYUN_CREDENTIALS_FILE') or None
+        self.credentials = self._load_credentials()
+        # 连接超时和读取超时（毫秒）
+        self.connect_timeout = _get_int('ALIYUN_SMS_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT)
+        self.read_timeout = _get_int('ALIYUN_SMS_READ_TIMEOUT', DEFAULT_READ_TIMEOUT)
+        # 保持的空闲连接数，0 表示与并发数相同
+        self.pool_size = _get_int('ALIYUN_SMS_POOL_SIZE', 0)
         
         # 验证必要配置
         self._validate()
     
+    def _load_credentials(self) -> List[Credential]:
+        """
+        收集所有访问密钥：ALIYUN_ACCESS_KEY_ID / SECRET、带编号的 ALIYUN_ACCESS_KEY_ID_<n> / SECRET_<n>
+        和 ALIYUN_CREDENTIALS_FILE 文件中的密钥，按此顺序排列
+        
+        Returns:
+            访问密钥列表
+            
+        Raises:
+            ValueError: 密钥不成对、重复，或密钥文件无法读取
+        """
+        credentials = []
+        if self.access_key_id and self.access_key_secret:
+            credentials.append(Credential(self.access_key_id, self.access_key_secret, 'ALIYUN_ACCESS_KEY_ID'))
+        
+        numbers = sorted(
+            int(match.group(1)) for match in map(_NUMBERED_KEY_ID.match, os.environ) if match
+        )
+        for number in numbers:
+            key_id = os.getenv(f'ALIYUN_ACCESS_KEY_ID_{number}')
+            secret = os.getenv(f'ALIYUN_ACCESS_KEY_SECRET_{number}')
+            if not key_id:
+                continue
+            if not secret:
+                raise ValueError(f"设置了 ALIYUN_ACCESS_KEY_ID_{number}，但未找到 ALIYUN_ACCESS_KEY_SECRET_{number}")
+            credentials.append(Credential(key_id, secret, f'ALIYUN_ACCESS_KEY_ID_{number}'))
+        
+        if self.credentials_file:
+            credentials.extend(load_credentials_file(self.credentials_file))
+        
+        seen = {}
+        for credential in credentials:
+            if credential.access_key_id in seen:
+                raise ValueError(
+                    f"访问密钥 {credential.label} 重复（{seen[credential.access_key_id]} 和 {credential.source}），"
+                    "同一密钥的调用配额不会叠加"
+                )
+            seen[credential.access_key_id] = credential.source
+        return credentials
+    
     def _validate(self):
         """验证配置是否完整"""
-        if not self.access_key_id:
+        if self.access_key_id and not self.access_key_secret:
             raise ValueError(
-                "未找到 ALIYUN_ACCESS_KEY_ID 配置。"
+                "未找到 ALIYUN_ACCESS_KEY_SECRET 配置。"
                 "请创建 .env 文件并设置该变量。"
             )
         
-        if not self.access_key_secret:
+        if not self.credentials:
             raise ValueError(
-                "未找到 ALIYUN_ACCESS_KEY_SECRET 配置。"
-                "请创建 .env 文件并设置该变量。"
+                "未找到 ALIYUN_ACCESS_KEY_ID 配置。"
+                "请创建 .env 文件并设置该变量（或用 ALIYUN_CREDENTIALS_FILE 指定访问密钥文件）。"
             )
+        
+        # 兼容只使用一组密钥的代码：access_key_id / access_key_secret 为第一组密钥
+        self.access_key_id, self.access_key_secret = self.credentials[0][:2]
+        
+        if self.connect_timeout <= 0 or self.read_timeout <= 0:
+            raise ValueError("ALIYUN_SMS_CONNECT_TIMEOUT 和 ALIYUN_SMS_READ_TIMEOUT 必须大于 0")
+        
+        if self.pool_size < 0:
+            raise ValueError("ALIYUN_SMS_POOL_SIZE 不能为负数")
     
     def __repr__(self):
-        return f"Config(region={self.region})"
+        return (
+            f"Config(region={self.region}, endpoint={self.endpoint or '按地域'}, "
+            f"credentials={len(self.credentials)})"
+        )
+
+
+def load_credentials_file(path: str) -> List[Credential]:
+    """
+    读取访问密钥文件
+    
+    每行一组密钥：AccessKey ID 和 AccessKey Secret，用空白或逗号分隔；
+    空行和 # 开头的行忽略。
+    
+    Args:
+        path: 文件路径
+        
+    Returns:
+        访问密钥列表
+        
+    Raises:
+        ValueError: 文件无法读取或格式错误
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+    except OSError as e:
+        raise ValueError(f"无法读取访问密钥文件 {path}: {e}")
+    
+    credentials = []
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        fields = line.replace(',', ' ').split()
+        if len(fields) != 2:
+            raise ValueError(f"{path} 第 {line_number} 行格式错误，应为: AccessKeyId AccessKeySecret")
+        credentials.append(Credential(fields[0], fields[1], f'{path}:{line_number}'))
+    return credentials
+
+
+def _get_int(name, default):
+    """
+    读取整数环境变量
+    
+    Args:
+        name: 环境变量名
+        default: 未设置时的默认值
+        
+    Returns:
+        整数值
+    """
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} 必须是整数，当前为 {value!r}")
 
 
 def get_config():
@@ -0,0 +1,262 @@
+"""
+调度代价模块
+按号码和星期保存单天页数的历史（JSON 文件），估计每个 (手机号, 日期) 任务的页数，
+决定日期的开始顺序，并估算查询的总耗时
+"""
+import heapq
+import json
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+
+HISTORY_VERSION = 1
+
+# 调度策略
+SCHEDULE_CALENDAR = 'calendar'   # 按号码、日期的顺序开始
+SCHEDULE_COST = 'cost'           # 预计页数多的日期先开始，避免最忙的日期最后才开始拖长总耗时
+SCHEDULE_RECENT = 'recent'       # 最近的日期先开始，交互使用时最新的结果最先显示
+SCHEDULE_POLICIES = (SCHEDULE_CALENDAR, SCHEDULE_COST, SCHEDULE_RECENT)
+
+# 新观测值的权重（指数滑动平均），接口数据量随时间变化时逐步跟上
+SMOOTHING = 0.3
+
+# 单页耗时的观测次数远多于单天页数，且单次波动大，使用更小的权重
+LATENCY_SMOOTHING = 0.05
+
+# 没有耗时历史时假设的单页耗时（秒）
+DEFAULT_PAGE_LATENCY = 0.2
+
+
+class PageHistory:
+    """
+    单天页数和单页耗时的历史
+
+    每个号码按星期（0 为周一）保存单天页数的指数滑动平均，另保存全局的单页耗时。
+    估计某个 (手机号, 日期) 的页数时依次使用：
+    该号码同一星期的历史 → 该号码其他星期的平均 → 所有号码同一星期的平均 → 全部历史的平均 → 1 页。
+
+    多个查询可以共用同一个历史，所有方法都是线程安全的。
+    """
+
+    def __init__(self, path: Optional[str] = None, phones: Dict = None, page_latency: float = None):
+        """
+        初始化历史（从文件读取请使用 load）
+
+        Args:
+            path: 历史文件路径，为 None 时不保存
+            phones: 手机号 -> {星期: 平均页数}
+            page_latency: 单页耗时的平均值（秒）
+        """
+        self.path = path
+        self.phones = phones or {}
+        self._page_latency = page_latency
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str) -> 'PageHistory':
+        """
+        读取历史文件，不存在时返回空历史
+
+        Args:
+            path: 历史文件路径
+
+        Returns:
+            页数历史
+
+        Raises:
+            ValueError: 文件不是有效的页数历史文件
+        """
+        if not os.path.exists(path):
+            return cls(path)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except ValueError:
+            raise ValueError(f"{path} 不是有效的页数历史文件")
+        if not isinstance(data, dict) or data.get('version') != HISTORY_VERSION:
+            raise ValueError(f"{path} 不是有效的页数历史文件")
+        return cls(path, data.get('phones', {}), data.get('page_latency'))
+
+    def save(self):
+        """写入历史文件（先写临时文件再替换，中断时不会留下不完整的文件）"""
+        if self.path is None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            data = {'version': HISTORY_VERSION, 'page_latency': self._page_latency, 'phones': self.phones}
+            temp_path = f'{self.path}.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+        os.replace(temp_path, self.path)
+
+    @property
+    def page_latency(self) -> float:
+        """单页耗时（秒），没有历史时为 DEFAULT_PAGE_LATENCY"""
+        return DEFAULT_PAGE_LATENCY if self._page_latency is None else self._page_latency
+
+    def observe(self, phone_number: str, query_date: str, pages: int):
+        """
+        记录某天从接口获取的页数
+
+        Args:
+            phone_number: 手机号码
+            query_date: 日期 YYYYMMDD
+            pages: 当天的页请求数
+        """
+        weekday = str(_weekday(query_date))
+        with self._lock:
+            weekdays = self.phones.setdefault(phone_number, {})
+            previous = weekdays.get(weekday)
+            weekdays[weekday] = pages if previous is None else round(
+                previous + SMOOTHING * (pages - previous), 3
+            )
+
+    def observe_latency(self, seconds: float):
+        """
+        记录一次页请求的耗时
+
+        Args:
+            seconds: 从提交到返回的秒数
+        """
+        with self._lock:
+            if self._page_latency is None:
+                self._page_latency = seconds
+            else:
+                self._page_latency += LATENCY_SMOOTHING * (seconds - self._page_latency)
+
+    def estimate(self, tasks: List[Tuple[str, str]]) -> List[float]:
+        """
+        估计每个任务的页数
+
+        Args:
+            tasks: (手机号, 日期) 任务列表
+
+        Returns:
+            与 tasks 一一对应的预计页数
+        """
+        with self._lock:
+            weekday_totals = [[0.0, 0] for _ in range(7)]
+            phone_means = {}
+            for phone_number, weekdays in self.phones.items():
+                for weekday, pages in weekdays.items():
+                    total = weekday_totals[int(weekday)]
+                    total[0] += pages
+                    total[1] += 1
+                if weekdays:
+                    phone_means[phone_number] = sum(weekdays.values()) / len(weekdays)
+
+            weekday_means = [total / count if count else None for total, count in weekday_totals]
+            count = sum(count for _, count in weekday_totals)
+            overall = sum(total for total, _ in weekday_totals) / count if count else 1.0
+
+            estimates = []
+            weekdays_by_date = {}
+            for phone_number, query_date in tasks:
+                weekday = weekdays_by_date.get(query_date)
+                if weekday is None:
+                    weekday = weekdays_by_date[query_date] = _weekday(query_date)
+                pages = self.phones.get(phone_number, {}).get(str(weekday))
+                if pages is None:
+                    pages = phone_means.get(phone_number)
+                if pages is None:
+                    pages = weekday_means[weekday]
+                estimates.append(overall if pages is None else pages)
+            return estimates
+
+    def __len__(self) -> int:
+        """有历史的号码数"""
+        return len(self.phones)
+
+    def __repr__(self):
+        return f"PageHistory(phones={len(self.phones)}, page_latency={self.page_latency:.3f}s)"
+
+
+def task_priorities(
+    tasks: List[Tuple[str, str]],
+    policy: str,
+    costs: Optional[List[float]] = None
+) -> Optional[List[Tuple]]:
+    """
+    计算每个任务的开始优先级（越小越先开始）
+
+    Args:
+        tasks: (手机号, 日期) 任务列表
+        policy: SCHEDULE_CALENDAR / SCHEDULE_COST / SCHEDULE_RECENT
+        costs: 与 tasks 一一对应的预计页数（SCHEDULE_COST 需要）
+
+    Returns:
+        与 tasks 一一对应的优先级；SCHEDULE_CALENDAR 返回 None，表示按任务顺序
+
+    Raises:
+        ValueError: 不支持的调度策略
+    """
+    if policy == SCHEDULE_CALENDAR:
+        return None
+    if policy == SCHEDULE_COST:
+        # 页数相同时按任务顺序，有序输出时重排缓冲区中积压的日期最少
+        return [(-cost, index) for index, cost in enumerate(costs)]
+    if policy == SCHEDULE_RECENT:
+        return [(-int(query_date), index) for index, (_, query_date) in enumerate(tasks)]
+    raise ValueError(f"不支持的调度策略: {policy}（支持 {'、'.join(SCHEDULE_POLICIES)}）")
+
+
+def estimate_makespan(
+    costs: List[float],
+    workers: int,
+    page_latency: float,
+    max_qps: Optional[float] = None
+) -> float:
+    """
+    按开始顺序模拟页级调度，估算全部任务的总耗时
+
+    模拟规则与查询客户端的调度相同：每天先请求第1页，返回后其余页一起排到队首（已开始的日期优先）；
+    页请求和待提交的页数不足 workers 时开始新的日期，每个页请求耗时 page_latency。
+    结果不小于总页数 / max_qps。
+
+    Args:
+        costs: 按开始顺序排列的每天预计页数（0 表示不需要调用接口）
+        workers: 并发数
+        page_latency: 单页耗时（秒）
+        max_qps: 每秒请求数上限，为 None 时不限
+
+    Returns:
+        预计总耗时（秒）
+    """
+    workers = max(1, workers)
+    # 页数为 0 的日期（已在断点日志中）不调用接口
+    pages_by_day = [max(1, round(cost)) for cost in costs if cost > 0]
+    days = iter(pages_by_day)
+    remaining = len(pages_by_day)
+    pending = deque()       # 待提交的页：第1页为当天的预计页数，其余页为 0
+    in_flight = []          # (完成时间, 序号, 第1页返回后还需请求的页数)
+    now = 0.0
+    total_pages = 0
+    sequence = 0
+    while True:
+        while remaining and len(pending) + len(in_flight) < workers:
+            pending.append(next(days))
+            remaining -= 1
+        while pending and len(in_flight) < workers:
+            rest = pending.popleft()
+            sequence += 1
+            total_pages += 1
+            # 第1页返回后才知道剩余页数；其余页返回后不再产生新的页请求
+            heapq.heappush(in_flight, (now + page_latency, sequence, rest - 1 if rest else 0))
+        if not in_flight:
+            break
+        now, _, rest = heapq.heappop(in_flight)
+        for _ in range(rest):
+            pending.appendleft(0)
+    if max_qps:
+        now = max(now, total_pages / max_qps)
+    return now
+
+
+def _weekday(query_date: str) -> int:
+    """日期 YYYYMMDD 是星期几（0 为周一）"""
+    return datetime.strptime(query_date, '%Y%m%d').weekday()
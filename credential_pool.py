@@ -0,0 +1,162 @@
+"""
+访问密钥池模块
+每组 AccessKey 一个 SDK 客户端和一个自适应限流器，页请求轮流分配给有空闲令牌的密钥，
+总吞吐随密钥数增加（每个 RAM 子账号有自己的调用配额）
+"""
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from config import Credential
+from rate_limiter import AdaptiveRateLimiter, SLOT_POLL_INTERVAL, CANCELLED, ERROR, SUCCESS
+
+
+class PooledCredential:
+    """
+    池中的一组访问密钥：SDK 客户端、独立的限流器和调用统计
+
+    限流器只根据这组密钥自己的调用结果调整速率，某个子账号被限流时不影响其他密钥。
+    """
+
+    def __init__(self, credential: Credential, client, rate_limiter: AdaptiveRateLimiter):
+        """
+        初始化
+
+        Args:
+            credential: 访问密钥
+            client: 使用该密钥的 SDK 客户端
+            rate_limiter: 该密钥的限流器
+        """
+        self.credential = credential
+        self.client = client
+        self.rate_limiter = rate_limiter
+        self.calls = 0          # 接口调用次数（含重试和对冲请求）
+        self.failures = 0       # 限流以外的失败次数
+        self._lock = threading.Lock()
+
+    @property
+    def label(self) -> str:
+        """用于显示的名称"""
+        return self.credential.label
+
+    def release(self, outcome: str = SUCCESS):
+        """
+        归还限流器槽位并记录调用结果
+
+        Args:
+            outcome: SUCCESS / THROTTLED / ERROR / CANCELLED（查询已取消，不计入调用次数）
+        """
+        with self._lock:
+            if outcome != CANCELLED:
+                self.calls += 1
+            if outcome == ERROR:
+                self.failures += 1
+        self.rate_limiter.release(outcome)
+
+    def __repr__(self):
+        return f"PooledCredential({self.label}, calls={self.calls}, {self.rate_limiter!r})"
+
+
+class CredentialPool:
+    """
+    访问密钥池
+
+    调用接口前 acquire() 得到一组密钥（已占用它的令牌和并发槽位），调用结束后
+    对这组密钥 release(结果)。分配时从上次之后的下一组密钥开始依次尝试，
+    取第一组有空闲令牌的密钥；全部没有令牌时等待最先补充令牌的那一组。
+    只有一组密钥时直接使用它的限流器，与不使用密钥池完全相同。
+    """
+
+    def __init__(
+        self,
+        credentials: List[Credential],
+        create_client: Callable[[Credential], object],
+        max_concurrency: int = 10,
+        max_rate: float = 50.0
+    ):
+        """
+        初始化密钥池
+
+        Args:
+            credentials: 访问密钥列表（至少一组）
+            create_client: 为一组密钥创建 SDK 客户端的函数
+            max_concurrency: 每组密钥的并发数上限（总并发仍受线程池或信号量限制）
+            max_rate: 每组密钥每秒请求数上限
+
+        Raises:
+            ValueError: 没有访问密钥
+        """
+        if not credentials:
+            raise ValueError("至少需要一组访问密钥")
+        self.members = [
+            PooledCredential(
+                credential,
+                create_client(credential),
+                AdaptiveRateLimiter(max_concurrency=max_concurrency, max_rate=max_rate)
+            )
+            for credential in credentials
+        ]
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> PooledCredential:
+        """
+        获取一组密钥的令牌和并发槽位，必要时阻塞等待
+
+        Returns:
+            分配到的密钥
+        """
+        if len(self.members) == 1:
+            member = self.members[0]
+            member.rate_limiter.acquire()
+            return member
+        while True:
+            member, delay = self.try_acquire()
+            if member is not None:
+                return member
+            time.sleep(delay)
+
+    def try_acquire(self) -> Tuple[Optional[PooledCredential], float]:
+        """
+        尝试获取一组密钥的令牌和并发槽位，不阻塞（供 asyncio 引擎使用）
+
+        Returns:
+            (密钥, 0)；所有密钥都没有令牌或槽位时为 (None, 建议等待的秒数)
+        """
+        with self._lock:
+            start = self._next
+            self._next = (start + 1) % len(self.members)
+        wait = None
+        for offset in range(len(self.members)):
+            member = self.members[(start + offset) % len(self.members)]
+            delay = member.rate_limiter.try_acquire()
+            if delay == 0:
+                return member, 0
+            wait = delay if wait is None else min(wait, delay)
+        return None, wait or SLOT_POLL_INTERVAL
+
+    @property
+    def max_rate(self) -> float:
+        """所有密钥的每秒请求数上限之和"""
+        return sum(member.rate_limiter.max_rate for member in self.members)
+
+    @property
+    def rate(self) -> float:
+        """所有密钥当前的每秒请求数之和"""
+        return sum(member.rate_limiter.rate for member in self.members)
+
+    @property
+    def concurrency(self) -> int:
+        """所有密钥当前允许的并发数之和"""
+        return sum(member.rate_limiter.concurrency for member in self.members)
+
+    @property
+    def throttled_count(self) -> int:
+        """所有密钥触发限流的次数之和"""
+        return sum(member.rate_limiter.throttled_count for member in self.members)
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def __repr__(self):
+        return f"CredentialPool(keys={len(self.members)}, rate={self.rate:.1f}/s)"
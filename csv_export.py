@@ -3,31 +3,60 @@ CSV导出模块
 将短信查询结果导出为CSV文件
 """
 import csv
-from typing import List, Dict
+import os
+from typing import Iterable, Dict, Optional
 
 
-def export_to_csv(data: List[Dict], output_file: str):
+def export_to_csv(
+    data: Iterable[Dict],
+    output_file: str,
+    append: bool = False,
+    compression: Optional[str] = None,
+    compression_level: Optional[int] = None
+) -> int:
     """
     导出数据到CSV文件
 
+    data 可以是列表，也可以是逐条产出记录的迭代器（如
+    SMSQueryClient.iter_send_details），记录会边读取边写入文件。
+    记录可以是 SMSRecord 或字典，发送时间和状态在写入时才格式化。
+    没有任何记录时不创建文件。
+
+    输出文件以 .gz 或 .zst 结尾时流式压缩，压缩在后台线程中进行（见 compression 模块）。
+
     Args:
-        data: 短信记录列表
+        data: 短信记录列表或迭代器
         output_file: 输出文件路径
-    """
-    if not data:
-        print("没有数据可导出")
-        return
+        append: 追加到已有文件末尾（不再写表头）；文件不存在或为空时与新建相同
+        compression: 压缩方式 gzip 或 zstd，默认根据输出文件扩展名判断
+        compression_level: 压缩级别，默认为各压缩方式的默认级别
 
-    # 使用 UTF-8-BOM 编码确保 Excel 正确识别中文
-    with open(output_file, 'w', newline='', encoding='utf-8-sig') as f:
-        writer = csv.writer(f)
+    Returns:
+        导出的记录数
+    """
+    if compression is None:
+        from compression import detect_compression
+        compression = detect_compression(output_file)
 
-        # 写入表头
-        headers = ['手机号', '发送时间', '发送状态', '短信内容']
-        writer.writerow(headers)
+    f = None
+    count = 0
 
-        # 写入数据行
+    try:
         for record in data:
+            if f is None and append and os.path.exists(output_file) and os.path.getsize(output_file):
+                # 已有文件开头已有 BOM 和表头
+                f = _open(output_file, 'utf-8', append, compression, compression_level)
+                writer = csv.writer(f)
+            elif f is None:
+                # 使用 UTF-8-BOM 编码确保 Excel 正确识别中文
+                f = _open(output_file, 'utf-8-sig', False, compression, compression_level)
+                writer = csv.writer(f)
+
+                # 写入表头
+                headers = ['手机号', '发送时间', '发送状态', '短信内容']
+                writer.writerow(headers)
+
+            # 写入数据行
             row = [
                 record.get('phone_number', ''),
                 record.get('send_time', ''),
@@ -35,5 +64,25 @@ def export_to_csv(data: List[Dict], output_file: str):
                 record.get('content', '')
             ]
             writer.writerow(row)
+            count += 1
+    finally:
+        if f is not None:
+            f.close()
+
+    if count == 0:
+        print("没有数据可导出")
+        return 0
+
+    if append:
+        print(f"成功追加 {count} 条记录到文件: {output_file}")
+    else:
+        print(f"成功导出 {count} 条记录到文件: {output_file}")
+    return count
+
 
-    print(f"成功导出 {len(data)} 条记录到文件: {output_file}")
+def _open(output_file: str, encoding: str, append: bool, compression: Optional[str], level: Optional[int]):
+    """打开输出文件，需要压缩时返回后台压缩的文本文件"""
+    if compression is None:
+        return open(output_file, 'a' if append else 'w', newline='', encoding=encoding)
+    from compression import open_compressed
+    return open_compressed(output_file, compression, level, append=append, encoding=encoding)
@@ -2,125 +2,193 @@
 Excel导出模块
 将短信查询结果导出为Excel文件
 """
-from typing import List, Dict
-from datetime import datetime
+from itertools import chain
+from typing import Iterable, Dict
 from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill, NamedStyle
 from openpyxl.utils import get_column_letter
 
 
+# 表头
+HEADERS = ['手机号', '发送时间', '发送状态', '短信内容']
+
+# 列宽
+COLUMN_WIDTHS = {
+    1: 15,  # 手机号
+    2: 20,  # 发送时间
+    3: 12,  # 发送状态
+    4: 50   # 短信内容
+}
+
+# 命名样式（整个工作簿共用，每个单元格只引用样式名）
+STYLE_HEADER = 'sms_header'
+STYLE_TEXT = 'sms_text'
+STYLE_STATUS = 'sms_status'
+STYLE_STATUS_SUCCESS = 'sms_status_success'
+STYLE_STATUS_FAILED = 'sms_status_failed'
+
+
 class ExcelExporter:
-    """Excel导出器"""
-    
-    def __init__(self):
-        self.workbook = Workbook()
-        self.worksheet = self.workbook.active
-        self.worksheet.title = "短信发送明细"
-    
-    def export(self, data: List[Dict], output_file: str):
+    """
+    Excel导出器
+
+    默认使用 openpyxl 的只写（write_only）模式：记录逐行写入临时文件，
+    不在内存中保留整张工作表，适合几十万行以上的大批量导出。
+    write_only=False 时使用普通工作簿，导出后仍可通过 worksheet 修改内容。
+    """
+
+    def __init__(self, write_only: bool = True):
+        """
+        初始化导出器
+
+        Args:
+            write_only: 是否使用只写流式模式，默认为 True
+        """
+        self.write_only = write_only
+        self.workbook = Workbook(write_only=write_only)
+        if write_only:
+            self.worksheet = self.workbook.create_sheet("短信发送明细")
+        else:
+            self.worksheet = self.workbook.active
+            self.worksheet.title = "短信发送明细"
+        self._register_styles()
+
+    def export(self, data: Iterable[Dict], output_file: str) -> int:
         """
         导出数据到Excel文件
-        
+
+        data 可以是列表，也可以是逐条产出记录的迭代器（如
+        SMSQueryClient.iter_send_details）。没有任何记录时不创建文件。
+
         Args:
-            data: 短信记录列表
+            data: 短信记录列表或迭代器（SMSRecord 或字典）
             output_file: 输出文件路径
+
+        Returns:
+            导出的记录数
         """
-        if not data:
+        records = iter(data)
+        first = next(records, None)
+        if first is None:
             print("没有数据可导出")
-            return
-        
+            return 0
+
+        # 调整列宽（只写模式下必须在写入数据之前设置）
+        self._adjust_column_widths()
+
         # 设置表头
         self._setup_headers()
-        
+
         # 写入数据
-        self._write_data(data)
-        
-        # 调整列宽
-        self._adjust_column_widths()
-        
+        count = self._write_data(first, records)
+
         # 保存文件
         self.workbook.save(output_file)
-        print(f"成功导出 {len(data)} 条记录到文件: {output_file}")
-    
+        print(f"成功导出 {count} 条记录到文件: {output_file}")
+        return count
+
+    def _register_styles(self):
+        """注册命名样式"""
+        text_alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
+        status_alignment = Alignment(horizontal='center', vertical='center')
+
+        styles = [
+            NamedStyle(
+                name=STYLE_HEADER,
+                font=Font(bold=True, size=12, color='FFFFFF'),
+                fill=PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid'),
+                alignment=Alignment(horizontal='center', vertical='center')
+            ),
+            NamedStyle(name=STYLE_TEXT, alignment=text_alignment),
+            NamedStyle(name=STYLE_STATUS, alignment=status_alignment),
+            NamedStyle(
+                name=STYLE_STATUS_SUCCESS,
+                alignment=status_alignment,
+                fill=PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')
+            ),
+            NamedStyle(
+                name=STYLE_STATUS_FAILED,
+                alignment=status_alignment,
+                fill=PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid')
+            ),
+        ]
+        for style in styles:
+            self.workbook.add_named_style(style)
+
     def _setup_headers(self):
         """设置表头"""
-        headers = ['手机号', '发送时间', '发送状态', '短信内容']
-        
-        # 表头样式
-        header_font = Font(bold=True, size=12, color='FFFFFF')
-        header_fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
-        header_alignment = Alignment(horizontal='center', vertical='center')
-        
-        for col_num, header in enumerate(headers, 1):
-            cell = self.worksheet.cell(row=1, column=col_num)
-            cell.value = header
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-    
-    def _write_data(self, data: List[Dict]):
+        self.worksheet.row_dimensions[1].height = 25  # 表头行高
+        self._append_row(HEADERS, [STYLE_HEADER] * len(HEADERS))
+
+    def _write_data(self, first: Dict, records: Iterable[Dict]) -> int:
         """
-        写入数据行
-        
+        逐行写入数据
+
         Args:
-            data: 短信记录列表
+            first: 第一条记录
+            records: 其余记录的迭代器
+
+        Returns:
+            写入的记录数
         """
-        # 数据对齐
-        alignment = Alignment(horizontal='left', vertical='center', wrap_text=True)
-        
-        for row_num, record in enumerate(data, 2):
-            # 手机号
-            cell = self.worksheet.cell(row=row_num, column=1)
-            cell.value = record.get('phone_number', '')
-            cell.alignment = alignment
-            
-            # 发送时间
-            cell = self.worksheet.cell(row=row_num, column=2)
-            cell.value = record.get('send_time', '')
-            cell.alignment = alignment
-            
-            # 发送状态
-            cell = self.worksheet.cell(row=row_num, column=3)
+        count = 0
+        for record in chain([first], records):
             status = record.get('status', '')
-            cell.value = status
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            
+
             # 根据状态设置颜色
             if '成功' in status:
-                cell.fill = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')
+                status_style = STYLE_STATUS_SUCCESS
             elif '失败' in status:
-                cell.fill = PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid')
-            
-            # 短信内容
-            cell = self.worksheet.cell(row=row_num, column=4)
-            cell.value = record.get('content', '')
-            cell.alignment = alignment
-    
+                status_style = STYLE_STATUS_FAILED
+            else:
+                status_style = STYLE_STATUS
+
+            self._append_row(
+                [
+                    record.get('phone_number', ''),
+                    record.get('send_time', ''),
+                    status,
+                    record.get('content', '')
+                ],
+                [STYLE_TEXT, STYLE_TEXT, status_style, STYLE_TEXT]
+            )
+            count += 1
+        return count
+
+    def _append_row(self, values, styles):
+        """
+        追加一行带样式的单元格
+
+        Args:
+            values: 单元格的值
+            styles: 每个单元格的命名样式
+        """
+        row = []
+        for value, style in zip(values, styles):
+            cell = WriteOnlyCell(self.worksheet, value=value)
+            cell.style = style
+            row.append(cell)
+        self.worksheet.append(row)
+
     def _adjust_column_widths(self):
-        """自动调整列宽"""
-        column_widths = {
-            1: 15,  # 手机号
-            2: 20,  # 发送时间
-            3: 12,  # 发送状态
-            4: 50   # 短信内容
-        }
-        
-        for col_num, width in column_widths.items():
+        """设置列宽"""
+        for col_num, width in COLUMN_WIDTHS.items():
             column_letter = get_column_letter(col_num)
             self.worksheet.column_dimensions[column_letter].width = width
-        
-        # 设置行高
-        self.worksheet.row_dimensions[1].height = 25  # 表头行高
 
 
-def export_to_excel(data: List[Dict], output_file: str):
+def export_to_excel(data: Iterable[Dict], output_file: str, write_only: bool = True) -> int:
     """
     便捷函数：导出数据到Excel
-    
+
     Args:
-        data: 短信记录列表
+        data: 短信记录列表或迭代器
         output_file: 输出文件路径
-    """
-    exporter = ExcelExporter()
-    exporter.export(data, output_file)
+        write_only: 是否使用只写流式模式，默认为 True
 
+    Returns:
+        导出的记录数
+    """
+    exporter = ExcelExporter(write_only=write_only)
+    return exporter.export(data, output_file)
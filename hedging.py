@@ -0,0 +1,148 @@
+"""
+对冲请求模块
+页请求的耗时超过已观测耗时的某个分位数时，再发一个相同的请求，取先返回的结果；
+对冲请求数受预算限制，不会大量消耗接口配额
+"""
+import math
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+
+# 默认在耗时超过 p95 时对冲
+DEFAULT_PERCENTILE = 95.0
+
+# 默认对冲请求最多占页请求的 5%
+DEFAULT_BUDGET = 0.05
+
+# 观测到这么多次耗时之后才开始对冲，样本太少时分位数不可靠
+MIN_SAMPLES = 20
+
+# 计算分位数时只使用最近的这么多次耗时，适应接口延迟的变化
+SAMPLE_WINDOW = 500
+
+# 每新增这么多次耗时重新计算一次分位数
+RECOMPUTE_EVERY = 10
+
+
+class HedgePolicy:
+    """
+    对冲策略：何时对冲、还能对冲多少次，以及对冲效果的统计
+
+    - 每次页请求（含对冲请求）成功返回后 observe(耗时)，维护最近 SAMPLE_WINDOW 次耗时
+    - delay() 返回对冲等待时间，即最近耗时的 percentile 分位数
+    - 每次提交原始页请求时 on_request()，try_hedge() 在对冲数不超过 budget × 原始请求数时
+      占用一次预算
+
+    多个查询可以共用同一个策略，所有方法都是线程安全的。
+    """
+
+    def __init__(self, percentile: float = DEFAULT_PERCENTILE, budget: float = DEFAULT_BUDGET):
+        """
+        初始化策略
+
+        Args:
+            percentile: 页请求耗时超过该分位数（0-100）时对冲
+            budget: 对冲请求数占原始页请求数的上限比例
+
+        Raises:
+            ValueError: 参数超出范围
+        """
+        if not 0 < percentile < 100:
+            raise ValueError("对冲分位数必须在 0-100 之间（不含 0 和 100）")
+        if not 0 < budget <= 1:
+            raise ValueError("对冲预算必须在 0-1 之间（不含 0）")
+        self.percentile = percentile
+        self.budget = budget
+
+        self.requests = 0       # 原始页请求数
+        self.hedges = 0         # 对冲请求数
+        self.hedge_wins = 0     # 对冲请求先于原始请求返回的次数
+
+        self._samples = deque(maxlen=SAMPLE_WINDOW)
+        self._pending_samples = 0
+        self._delay = None
+        self._lock = threading.Lock()
+
+    def slots(self, max_workers: int) -> int:
+        """
+        对冲请求额外占用的并发数（线程池和限流器需要多留出的槽位）
+
+        Args:
+            max_workers: 原始页请求的并发数
+
+        Returns:
+            额外并发数，至少为 1
+        """
+        return max(1, math.ceil(max_workers * self.budget))
+
+    def observe(self, latency: float):
+        """
+        记录一次成功页请求的耗时
+
+        Args:
+            latency: 从提交到返回的秒数
+        """
+        with self._lock:
+            self._samples.append(latency)
+            self._pending_samples += 1
+            if len(self._samples) >= MIN_SAMPLES and (
+                    self._delay is None or self._pending_samples >= RECOMPUTE_EVERY):
+                ordered = sorted(self._samples)
+                self._delay = ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))]
+                self._pending_samples = 0
+
+    def delay(self) -> Optional[float]:
+        """
+        页请求执行多久之后对冲
+
+        Returns:
+            秒数，样本不足 MIN_SAMPLES 时为 None（不对冲）
+        """
+        return self._delay
+
+    def on_request(self):
+        """记录一次原始页请求（增加对冲预算）"""
+        with self._lock:
+            self.requests += 1
+
+    def try_hedge(self) -> bool:
+        """
+        占用一次对冲预算
+
+        Returns:
+            预算是否足够，足够时对冲次数加一
+        """
+        with self._lock:
+            if self.hedges + 1 > self.budget * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+    def on_hedge_win(self):
+        """记录一次对冲请求先于原始请求返回"""
+        with self._lock:
+            self.hedge_wins += 1
+
+    @property
+    def hedge_rate(self) -> float:
+        """对冲请求数占原始页请求数的比例"""
+        return self.hedges / self.requests if self.requests else 0.0
+
+    def to_dict(self) -> Dict:
+        """统计结果"""
+        return {
+            'percentile': self.percentile,
+            'budget': self.budget,
+            'delay_seconds': self._delay,
+            'requests': self.requests,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'hedge_rate': round(self.hedge_rate, 4),
+        }
+
+    def __repr__(self):
+        return (
+            f"HedgePolicy(p{self.percentile:g}, budget={self.budget:.0%}, "
+            f"hedges={self.hedges}/{self.requests})"
+        )
@@ -5,20 +5,99 @@
 """
 import sys
 import os
+import re
+import signal
+import importlib
 from datetime import datetime, timedelta
 import click
 
 from config import get_config
-from sms_query import SMSQueryClient
-from csv_export import export_to_csv
+from result_cache import ResultCache
+from checkpoint import CheckpointJournal
+from metrics import QueryMetrics, RESERVOIR_SIZE
+from progress import create_progress, PROGRESS_MODES, CANCEL_LABELS
+from hedging import HedgePolicy, DEFAULT_PERCENTILE, DEFAULT_BUDGET
+from sms_record import STATUS_SUCCESS, STATUS_FAILED
 
 
-@click.command()
+# 导出格式 -> (文件扩展名, 导出模块, 导出函数)
+# 导出模块在参数校验通过后才导入（openpyxl、pyarrow 导入较慢）
+EXPORT_FORMATS = {
+    'csv': ('.csv', 'csv_export', 'export_to_csv'),
+    'xlsx': ('.xlsx', 'excel_export', 'export_to_excel'),
+    'parquet': ('.parquet', 'parquet_export', 'export_to_parquet'),
+}
+
+# 查询引擎 -> (模块, 客户端类)，创建客户端时才导入
+ENGINES = {
+    'thread': ('sms_query', 'SMSQueryClient'),
+    'async': ('async_sms_query', 'AsyncSMSQueryClient'),
+}
+
+# 各查询引擎允许的最大并发数
+MAX_WORKERS = {
+    'thread': 50,
+    'async': 500,
+}
+
+# --compress 可选的压缩方式（与 compression.COMPRESSIONS 一致，compression 在需要时才导入）
+COMPRESS_METHODS = ('gzip', 'zstd')
+
+# --breakdown 可选的格式（与 analytics.BREAKDOWN_FORMATS 一致，analytics 在需要时才导入）
+BREAKDOWN_FORMATS = ('table', 'json')
+
+# --schedule 可选的调度策略（与 cost_model.SCHEDULE_POLICIES 一致，cost_model 在需要时才导入）
+SCHEDULE_POLICIES = ('calendar', 'cost', 'recent')
+
+# 调度策略的说明
+SCHEDULE_LABELS = {
+    'calendar': '按号码、日期顺序',
+    'cost': '预计页数多的日期先开始',
+    'recent': '最近的日期先开始',
+}
+
+# 页数历史在缓存目录中的文件名
+PAGE_HISTORY_FILE = 'page_history.json'
+
+# 到达 --deadline 或被中断、结果不完整时的退出码
+EXIT_PARTIAL = 3
+
+# 未完成日期最多列出的号码数
+MAX_LISTED_PHONES = 20
+
+
+class _DefaultGroup(click.Group):
+    """未指定子命令时默认执行 query，兼容 python main.py -p ... 的用法"""
+
+    def parse_args(self, ctx, args):
+        if args and args[0] not in self.commands and args[0] != '--help':
+            args = ['query'] + list(args)
+        elif not args:
+            args = ['query']
+        return super().parse_args(ctx, args)
+
+
+@click.group(cls=_DefaultGroup)
+def main():
+    """
+    阿里云短信查询导出工具
+    
+    不指定子命令时执行 query（查询并导出），serve 启动常驻的本地查询服务。
+    各子命令的参数见 python main.py query --help 和 python main.py serve --help。
+    """
+
+
+@main.command('query', short_help='查询短信记录并导出（默认子命令）')
 @click.option(
     '--phone',
     '-p',
-    required=True,
-    help='要查询的手机号码'
+    help='要查询的手机号码（与 --phones-file 二选一）'
+)
+@click.option(
+    '--phones-file',
+    '-f',
+    type=click.Path(exists=True, dir_okay=False),
+    help='批量查询的手机号文件，每行一个号码，# 开头为注释（与 --phone 二选一）'
 )
 @click.option(
     '--start-date',
@@ -34,20 +113,178 @@ from csv_export import export_to_csv
     '--output',
     '-o',
     default='',
-    help='输出的CSV文件名，默认为 sms_details_YYYYMMDD_HHMMSS.csv'
+    help='输出文件名，默认为 sms_details_YYYYMMDD_HHMMSS.<格式扩展名>'
+)
+@click.option(
+    '--format',
+    'output_format',
+    type=click.Choice(list(EXPORT_FORMATS)),
+    default='csv',
+    help='导出格式：csv、xlsx（流式写入，带状态颜色）或 parquet（列式存储，需要 pyarrow），默认为 csv'
+)
+@click.option(
+    '--compress',
+    type=click.Choice(COMPRESS_METHODS),
+    help='流式压缩输出：gzip 或 zstd（需要 zstandard）。CSV 在后台线程中整体压缩，文件名加 .gz / .zst；Parquet 压缩列块；输出文件名以 .gz / .zst 结尾时自动启用'
+)
+@click.option(
+    '--compress-level',
+    type=int,
+    help='压缩级别，gzip 为 1-9（默认 6），zstd 为 1-22（默认 3）'
 )
 @click.option(
     '--workers',
     '-w',
     default=10,
     type=int,
-    help='并发查询线程数（1-20），默认为 10。数字越大查询越快，但可能触发API限流'
+    help='最大并发请求数，默认为 10。thread 引擎为 1-50，async 引擎为 1-500。遇到API限流时会自动降低并发'
+)
+@click.option(
+    '--engine',
+    type=click.Choice(list(ENGINES)),
+    default='thread',
+    help='查询引擎：thread 使用线程池，async 使用单个 asyncio 事件循环（适合数百个并发请求），默认为 thread'
+)
+@click.option(
+    '--qps',
+    default=50.0,
+    type=float,
+    help='每组访问密钥每秒最多请求数，默认为 50。遇到API限流时会自动降低，恢复后逐步提高（配置多组访问密钥时总速率随之增加）'
+)
+@click.option(
+    '--retries',
+    default=5,
+    type=int,
+    help='限流、服务端错误和超时的最大重试次数，默认为 5'
+)
+@click.option(
+    '--hedge',
+    is_flag=True,
+    help='对冲请求：页请求耗时超过已观测耗时的分位数时再发一个相同的请求，取先返回的结果，减少长尾延迟'
+)
+@click.option(
+    '--hedge-percentile',
+    default=DEFAULT_PERCENTILE,
+    type=float,
+    show_default=True,
+    help='页请求耗时超过该分位数时对冲（需同时指定 --hedge）'
+)
+@click.option(
+    '--hedge-budget',
+    default=DEFAULT_BUDGET,
+    type=float,
+    show_default=True,
+    help='对冲请求数占页请求数的上限比例（需同时指定 --hedge）'
+)
+@click.option(
+    '--schedule',
+    type=click.Choice(SCHEDULE_POLICIES),
+    default='cost',
+    show_default=True,
+    help='日期的开始顺序：cost 按页数历史估计，预计页数多的日期先开始；recent 最近的日期先开始（交互查询时最新的结果最先显示）；calendar 按号码、日期顺序'
+)
+@click.option(
+    '--cache-dir',
+    default='.sms_cache',
+    help='查询结果缓存目录，默认为 .sms_cache（页数历史 page_history.json 也保存在这里）'
+)
+@click.option(
+    '--cache-min-age',
+    default=3,
+    type=int,
+    help='日期距今超过多少天且没有"等待回执"记录时才使用缓存，默认为 3'
+)
+@click.option(
+    '--no-cache',
+    is_flag=True,
+    help='不使用查询结果缓存和页数历史文件，所有日期都从API查询'
+)
+@click.option(
+    '--resume',
+    type=click.Path(exists=True, dir_okay=False),
+    help='从断点日志继续中断的查询，只重新查询缺失或失败的日期（号码、日期范围和输出文件取自日志）'
+)
+@click.option(
+    '--no-journal',
+    is_flag=True,
+    help='不写断点日志（默认在输出文件旁写入 <输出文件>.journal，任务全部成功后自动删除）'
+)
+@click.option(
+    '--shard',
+    callback=lambda ctx, param, value: _parse_shard(value),
+    help='只查询第 i 个分片（i/N，如 2/4），按 (手机号, 日期) 哈希划分，供多台机器分担大任务，结果用 merge 子命令合并'
 )
-def main(phone, start_date, end_date, output, workers):
+@click.option(
+    '--deadline',
+    callback=lambda ctx, param, value: _parse_duration(value),
+    help='整个命令的时间上限，如 90s、30m、1h30m（纯数字为秒）。到时停止查询：未开始的日期直接放弃，执行中的页请求在当前调用返回后放弃，已完成的日期照常写出并列出未完成的日期，退出码为 3'
+)
+@click.option(
+    '--stats-only',
+    is_flag=True,
+    help='只统计不导出：单遍汇总按日期、小时、模板和号码的发送成功、失败、等待回执数量和失败率，不写输出文件'
+)
+@click.option(
+    '--breakdown',
+    type=click.Choice(BREAKDOWN_FORMATS),
+    help='查询结束后显示汇总统计的格式：table 文本表格，json；--stats-only 时默认为 table'
+)
+@click.option(
+    '--breakdown-out',
+    type=click.Path(dir_okay=False),
+    help='把汇总统计（按日期、小时、模板和号码）写入 JSON 文件'
+)
+@click.option(
+    '--stats-out',
+    type=click.Path(dir_okay=False),
+    help='把接口调用统计（耗时分布、排队时间、错误码、最慢日期等）写入 JSON 文件'
+)
+@click.option(
+    '--metrics-out',
+    type=click.Path(dir_okay=False),
+    help='把接口调用指标以 Prometheus 文本格式写入文件'
+)
+@click.option(
+    '--profile',
+    is_flag=True,
+    help='性能剖析：查询结束后显示各阶段（日期规划、接口调用、响应解析、排序、调度等待、统计、导出）的墙钟时间和 CPU 时间'
+)
+@click.option(
+    '--profile-functions',
+    is_flag=True,
+    help='性能剖析时用 cProfile 记录每个阶段自身耗时最多的函数（隐含 --profile，开销较大）'
+)
+@click.option(
+    '--profile-memory',
+    is_flag=True,
+    help='性能剖析时用 tracemalloc 记录各阶段的内存最高值和分配最多的代码行（隐含 --profile，开销较大）'
+)
+@click.option(
+    '--profile-out',
+    type=click.Path(dir_okay=False),
+    help='把性能剖析结果写入 JSON 文件（隐含 --profile）'
+)
+@click.option(
+    '--progress', 'progress_mode',
+    type=click.Choice(['auto'] + list(PROGRESS_MODES)),
+    default='auto',
+    show_default=True,
+    help='进度显示方式：lines 逐行输出，bar 单行进度条，json 在标准输出上输出 JSON Lines 事件流（其他信息改写到标准错误），none 不显示；auto 在终端中使用 bar，否则使用 lines'
+)
+@click.option(
+    '--quiet', '-q',
+    is_flag=True,
+    help='安静模式，只输出错误信息'
+)
+def query(phone, phones_file, start_date, end_date, output, output_format, compress, compress_level, workers,
+          engine, qps, retries, hedge, hedge_percentile, hedge_budget, schedule, cache_dir, cache_min_age, no_cache, resume,
+          no_journal, shard,
+          deadline, stats_only, breakdown, breakdown_out,
+          stats_out, metrics_out, profile, profile_functions, profile_memory, profile_out, progress_mode, quiet):
     """
     阿里云短信查询导出工具
     
-    查询指定手机号在某个时间段内的短信发送明细，并导出为Excel文件。
+    查询指定手机号在某个时间段内的短信发送明细，并导出为CSV或Excel文件。
     
     示例：
     
@@ -55,54 +292,176 @@ def main(phone, start_date, end_date, output, workers):
         
         python main.py -p 13800138000 -s 20231103 -o my_sms
         
+        python main.py -p 13800138000 -s 20231101 -e 20231130 --format xlsx
+        
+        python main.py -f phones.txt -s 20231101 -e 20231130 -o report.csv.zst
+        
         python main.py -p 13800138000 -s 20231101 -e 20231130 -w 15
+        
+        python main.py -f phones.txt -s 20231101 -e 20231107 -w 20
+        
+        python main.py -f phones.txt -s 20231101 -e 20231130 --engine async -w 200
+        
+        python main.py -f phones.txt -s 20231101 -e 20231130 --hedge --hedge-budget 0.03
+        
+        python main.py --resume sms_details_20231130_143022.csv.journal
+        
+        python main.py -f phones.txt -s 20231101 -e 20231130 --stats-out stats.json --metrics-out sms.prom
+        
+        python main.py -f phones.txt -s 20231101 -e 20231130 --progress json > events.jsonl
+        
+        python main.py -f phones.txt -s 20230101 -e 20231231 --shard 1/4 -o part1
+        
+        python main.py -f phones.txt -s 20231101 -e 20231130 --stats-only --breakdown json
+        
+        python main.py -f phones.txt -s 20230101 -e 20231231 --deadline 50m
+        
+        python main.py -p 13800138000 -s 20230101 -e 20231231 --schedule recent
+        
+        python main.py -f phones.txt -s 20231101 -e 20231130 --profile-functions --profile-out profile.json
     """
+    stdout = _redirect_console(progress_mode, quiet)
+    progress = create_progress('none' if quiet else progress_mode, stdout)
+    # 截止时间从命令开始时计算
+    cancel_token = _load('cancellation', 'CancelToken')(deadline)
+    journal = None
     try:
-        # 验证和格式化日期
-        start_date = _validate_and_format_date(start_date, 'start_date')
+        if resume and stats_only:
+            click.echo("错误: --resume 不能与 --stats-only 同时使用", err=True)
+            sys.exit(1)
+        if stats_only and breakdown is None:
+            breakdown = 'table'
         
-        if end_date:
-            end_date = _validate_and_format_date(end_date, 'end_date')
+        if resume:
+            # 从断点日志恢复查询参数
+            if phone or phones_file or start_date or end_date or output or shard:
+                click.echo("错误: --resume 不能与 --phone / --phones-file / --start-date / --end-date / --output / --shard 同时使用", err=True)
+                sys.exit(1)
+            try:
+                journal = CheckpointJournal.load(resume)
+            except (ValueError, KeyError) as e:
+                click.echo(f"错误: {e}", err=True)
+                sys.exit(1)
+            params = journal.params
+            phones = params['phones']
+            start_date = params['start_date']
+            end_date = params['end_date']
+            output = params['output']
+            output_format = params['format']
+            compress = params.get('compress')
+            compress_level = params.get('compress_level')
+            shard = tuple(params['shard']) if params.get('shard') else None
         else:
-            end_date = start_date
+            phones, start_date, end_date = _resolve_query(phone, phones_file, start_date, end_date)
         
-        # 验证日期范围
-        if start_date > end_date:
-            click.echo("错误: 开始日期不能晚于结束日期", err=True)
+        # 验证并发数
+        max_allowed_workers = MAX_WORKERS[engine]
+        if workers < 1 or workers > max_allowed_workers:
+            click.echo(f"错误: {engine} 引擎的并发数必须在 1-{max_allowed_workers} 之间", err=True)
             sys.exit(1)
         
-        # 验证手机号格式
-        if not _validate_phone_number(phone):
-            click.echo("错误: 手机号格式不正确", err=True)
+        if qps <= 0:
+            click.echo("错误: 每秒请求数必须大于 0", err=True)
             sys.exit(1)
         
-        # 验证并发数
-        if workers < 1 or workers > 20:
-            click.echo("错误: 并发线程数必须在 1-20 之间", err=True)
+        if retries < 0:
+            click.echo("错误: 重试次数不能为负数", err=True)
+            sys.exit(1)
+        
+        if cache_min_age < 1:
+            click.echo("错误: 缓存最小天数必须至少为 1", err=True)
+            sys.exit(1)
+        
+        hedging = None
+        if hedge:
+            try:
+                hedging = HedgePolicy(hedge_percentile, hedge_budget)
+            except ValueError as e:
+                click.echo(f"错误: {e}", err=True)
+                sys.exit(1)
+        
+        # 页数历史：记录每个号码每个星期的单天页数，用于安排日期的开始顺序和估算总耗时；
+        # --no-cache 时只在内存中使用，不读写缓存目录
+        page_history_class = _load('cost_model', 'PageHistory')
+        try:
+            if no_cache:
+                page_history = page_history_class()
+            else:
+                page_history = page_history_class.load(os.path.join(cache_dir, PAGE_HISTORY_FILE))
+        except (OSError, ValueError) as e:
+            click.echo(f"错误: {e}（可删除该文件后重新查询）", err=True)
+            sys.exit(1)
+        
+        if output_format == 'parquet' and not stats_only and not _load('parquet_export', 'is_available')():
+            click.echo("错误: 导出 Parquet 格式需要安装 pyarrow（pip install pyarrow）", err=True)
+            sys.exit(1)
+        
+        # 压缩方式：--compress 或输出文件名的 .gz / .zst 扩展名
+        compression = importlib.import_module('compression')
+        if output and not resume:
+            output, suffix_method = compression.split_compression(output)
+            if suffix_method and compress and suffix_method != compress:
+                click.echo(f"错误: 输出文件扩展名表示 {suffix_method} 压缩，与 --compress {compress} 不一致", err=True)
+                sys.exit(1)
+            compress = compress or suffix_method
+        if compress:
+            if output_format == 'xlsx':
+                click.echo("错误: xlsx 文件本身就是 zip 压缩格式，不支持 --compress", err=True)
+                sys.exit(1)
+            try:
+                compression.validate(compress, compress_level)
+            except (ValueError, RuntimeError) as e:
+                click.echo(f"错误: {e}", err=True)
+                sys.exit(1)
+        elif compress_level is not None:
+            click.echo("错误: --compress-level 需要同时指定 --compress", err=True)
             sys.exit(1)
+        export_options = {'compression': compress, 'compression_level': compress_level} if compress else {}
         
-        # 输出文件路径处理（添加时间戳）
+        # 输出文件路径处理（添加时间戳），续查时沿用原输出文件
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        extension, export_module, export_function = EXPORT_FORMATS[output_format]
+        # CSV 整体压缩，文件名加压缩扩展名；Parquet 压缩列块，文件名不变
+        suffix = compression.COMPRESSIONS[compress] if compress and output_format == 'csv' else ''
         if not output:
             # 默认文件名
-            output = f"sms_details_{timestamp}.csv"
-        else:
+            output = f"sms_details_{timestamp}{extension}{suffix}"
+        elif not resume:
             # 用户指定文件名，插入时间戳
-            if output.endswith('.csv'):
-                base = output[:-4]
-                output = f"{base}_{timestamp}.csv"
+            if output.endswith(extension):
+                base = output[:-len(extension)]
+                output = f"{base}_{timestamp}{extension}{suffix}"
             else:
-                output = f"{output}_{timestamp}.csv"
+                output = f"{output}_{timestamp}{extension}{suffix}"
         
         # 显示查询信息
         click.echo("=" * 60)
         click.echo("阿里云短信查询导出工具")
         click.echo("=" * 60)
-        click.echo(f"手机号码: {phone}")
+        if resume:
+            click.echo(f"断点续查: {resume}（已完成 {journal.completed_count} 天）")
+        if phones_file:
+            click.echo(f"号码文件: {phones_file}（共 {len(phones)} 个号码）")
+        elif len(phones) > 1:
+            click.echo(f"手机号码: 共 {len(phones)} 个号码")
+        else:
+            click.echo(f"手机号码: {phones[0]}")
         click.echo(f"开始日期: {_format_date_display(start_date)}")
         click.echo(f"结束日期: {_format_date_display(end_date)}")
-        click.echo(f"并发线程: {workers}")
-        click.echo(f"输出文件: {output}")
+        if shard:
+            click.echo(f"查询分片: {shard[0]}/{shard[1]}")
+        if deadline:
+            click.echo(f"截止时间: {_format_deadline(deadline)}")
+        click.echo(f"查询引擎: {engine}")
+        click.echo(f"并发数量: {workers}")
+        if hedging:
+            click.echo(f"对冲请求: 超过 p{hedge_percentile:g} 耗时时对冲，最多 {hedge_budget:.0%} 的页请求")
+        click.echo(f"调度策略: {schedule}（{SCHEDULE_LABELS[schedule]}）")
+        click.echo(f"结果缓存: {'关闭' if no_cache else cache_dir}")
+        click.echo(f"输出文件: {'不导出（只统计）' if stats_only else output}")
+        if compress and not stats_only:
+            level = compress_level or compression.DEFAULT_LEVELS[compress]
+            click.echo(f"输出压缩: {compress}（级别 {level}）")
         click.echo("=" * 60)
         click.echo()
         
@@ -111,6 +470,8 @@ def main(phone, start_date, end_date, output, workers):
         try:
             config = get_config()
             click.echo("✓ 配置加载成功")
+            if len(config.credentials) > 1:
+                click.echo(f"  访问密钥: {len(config.credentials)} 组，页请求分散到各组，每组单独限流")
         except ValueError as e:
             click.echo(f"✗ 配置错误: {e}", err=True)
             click.echo("\n提示: 请参考 env.example 文件创建 .env 配置文件", err=True)
@@ -118,44 +479,804 @@ def main(phone, start_date, end_date, output, workers):
         
         # 创建查询客户端
         click.echo("\n正在初始化阿里云客户端...")
-        client = SMSQueryClient(config)
-        click.echo("✓ 客户端初始化成功")
-        
-        # 查询短信记录
-        click.echo("\n开始查询短信记录...")
-        click.echo("-" * 60)
-        records = client.query_send_details(
-            phone_number=phone,
-            start_date=start_date,
-            end_date=end_date,
-            max_workers=workers
-        )
-        click.echo("-" * 60)
+        cache = None if no_cache else ResultCache(cache_dir, min_age_days=cache_min_age)
+        
+        # 只统计时没有输出文件，也就不需要断点日志
+        if journal is None and not no_journal and not stats_only:
+            journal = CheckpointJournal.create(f"{output}.journal", {
+                'phones': phones,
+                'start_date': start_date,
+                'end_date': end_date,
+                'output': output,
+                'format': output_format,
+                'shard': list(shard) if shard else None,
+                'compress': compress,
+                'compress_level': compress_level,
+            })
+        
+        metrics = QueryMetrics() if stats_out or metrics_out else None
         
-        if not records:
+        aggregator = _load('analytics', 'RecordAggregator')() if breakdown or breakdown_out else None
+        
+        profiling = None
+        profiler = None
+        if profile or profile_functions or profile_memory or profile_out:
+            profiling = importlib.import_module('profiling')
+            profiler = profiling.StageProfiler(functions=profile_functions, memory=profile_memory)
+        
+        client_class = _load(*ENGINES[engine])
+        exporter = None if stats_only else _load(export_module, export_function)
+        
+        with client_class(
+            config,
+            max_workers=workers,
+            max_qps=qps,
+            max_retries=retries,
+            cache=cache,
+            journal=journal,
+            metrics=metrics,
+            progress=progress,
+            hedging=hedging,
+            cancel_token=cancel_token,
+            schedule=schedule,
+            page_history=page_history,
+            profiler=profiler
+        ) as client:
+            click.echo("✓ 客户端初始化成功")
+            
+            # 查询短信记录，每查询完一天就写入输出文件
+            click.echo("\n开始查询短信记录...")
+            if stats_only:
+                click.echo("只统计不导出，查询结果边查询边汇总")
+            else:
+                click.echo(f"查询结果将边查询边导出到{output_format.upper()}文件: {output}")
+            click.echo("-" * 60)
+            statistics = {'total': 0, 'success': 0, 'failed': 0}
+            _install_interrupt_handler(cancel_token)
+            if profiler is not None:
+                profiler.start()
+            records = client.iter_send_details(
+                phone_numbers=phones,
+                start_date=start_date,
+                end_date=end_date,
+                shard=shard
+            )
+            records = _tally_statistics(records, statistics)
+            if aggregator is not None:
+                records = aggregator.track(records)
+            if profiler is not None:
+                records = profiler.iterate(profiling.STAGE_STATISTICS, records)
+            if stats_only:
+                # 不构造导出行，记录计数后即丢弃
+                for _ in records:
+                    pass
+            elif profiler is not None:
+                with profiler.stage(profiling.STAGE_EXPORT):
+                    exporter(records, output, **export_options)
+            else:
+                exporter(records, output, **export_options)
+            if profiler is not None:
+                profiler.stop()
+            click.echo("-" * 60)
+            _display_rate_limit_summary(client)
+            _display_hedge_summary(hedging)
+            _display_schedule_summary(client)
+            _display_cache_summary(cache)
+            _display_metrics_summary(metrics)
+            _display_profile(profiler)
+        
+        try:
+            page_history.save()
+        except OSError as e:
+            click.echo(f"⚠️  页数历史保存失败: {e}", err=True)
+        
+        if stats_out:
+            metrics.write_json(stats_out)
+            click.echo(f"调用统计已写入: {stats_out}")
+        if metrics_out:
+            metrics.write_prometheus(metrics_out)
+            click.echo(f"Prometheus 指标已写入: {metrics_out}")
+        if profile_out:
+            profiler.write_json(profile_out)
+            click.echo(f"性能剖析结果已写入: {profile_out}")
+        if breakdown_out:
+            with open(breakdown_out, 'w', encoding='utf-8') as f:
+                f.write(_load('analytics', 'format_breakdown')(aggregator.result(), 'json'))
+            click.echo(f"汇总统计已写入: {breakdown_out}")
+        
+        progress.close()
+        cancel_token.close()
+        if cache is not None:
+            cache.close()
+        
+        partial = _display_incomplete_days(client)
+        
+        if journal is not None:
+            if client.failed_days or client.incomplete_days:
+                journal.close()
+                click.echo(f"\n提示: 部分日期查询失败或未完成，可使用 --resume {journal.path} 继续查询这些日期")
+            else:
+                journal.remove()
+            journal = None
+        
+        if not statistics['total']:
             click.echo("\n未查询到任何记录")
-            sys.exit(0)
+            sys.exit(EXIT_PARTIAL if partial else 0)
         
         # 显示统计信息
-        _display_statistics(records)
-        
-        # 导出到CSV
-        click.echo(f"\n正在导出到CSV文件: {output}")
-        export_to_csv(records, output)
+        _display_statistics(statistics)
+        if breakdown:
+            _display_breakdown(aggregator, breakdown, stdout if quiet else None)
         
+        if partial:
+            click.echo("\n⚠️  任务部分完成，输出文件只包含已完成的日期")
+            click.echo("=" * 60)
+            sys.exit(EXIT_PARTIAL)
         click.echo("\n✓ 任务完成!")
         click.echo("=" * 60)
         
     except KeyboardInterrupt:
+        progress.close()
         click.echo("\n\n用户中断操作", err=True)
+        _display_resume_hint(journal)
+        sys.exit(1)
+    except Exception as e:
+        progress.close()
+        click.echo(f"\n错误: {str(e)}", err=True)
+        import traceback
+        traceback.print_exc()
+        _display_resume_hint(journal)
+        sys.exit(1)
+
+
+@main.command('serve', short_help='启动常驻的本地查询服务（HTTP/JSON）')
+@click.option(
+    '--host',
+    default='127.0.0.1',
+    show_default=True,
+    help='监听地址'
+)
+@click.option(
+    '--port',
+    default=8765,
+    type=int,
+    show_default=True,
+    help='监听端口'
+)
+@click.option(
+    '--workers',
+    '-w',
+    default=20,
+    type=int,
+    help='所有请求共享的最大并发请求数，默认为 20（1-50）'
+)
+@click.option(
+    '--qps',
+    default=50.0,
+    type=float,
+    help='每组访问密钥每秒最多请求数，默认为 50。遇到API限流时会自动降低，恢复后逐步提高（配置多组访问密钥时总速率随之增加）'
+)
+@click.option(
+    '--retries',
+    default=5,
+    type=int,
+    help='限流、服务端错误和超时的最大重试次数，默认为 5'
+)
+@click.option(
+    '--cache-dir',
+    default='.sms_cache',
+    help='查询结果缓存目录，默认为 .sms_cache'
+)
+@click.option(
+    '--cache-min-age',
+    default=3,
+    type=int,
+    help='日期距今超过多少天且没有"等待回执"记录时才使用缓存，默认为 3'
+)
+@click.option(
+    '--no-cache',
+    is_flag=True,
+    help='不使用查询结果缓存，所有日期都从API查询'
+)
+@click.option(
+    '--max-days',
+    default=366,
+    type=int,
+    show_default=True,
+    help='单个请求最多查询的天数'
+)
+def serve(host, port, workers, qps, retries, cache_dir, cache_min_age, no_cache, max_days):
+    """
+    启动本地查询服务
+    
+    常驻进程保持一个已初始化的客户端、共享线程池和限流器，避免每次查询重新启动进程。
+    多个请求中相同的 (手机号, 日期) 在查询期间只调用一次接口。
+    
+    示例：
+    
+        python main.py serve --port 8765 -w 30
+        
+        curl 'http://127.0.0.1:8765/query?phone=13800138000&start_date=20231101&end_date=20231107'
+    """
+    if workers < 1 or workers > MAX_WORKERS['thread']:
+        click.echo(f"错误: 并发数必须在 1-{MAX_WORKERS['thread']} 之间", err=True)
+        sys.exit(1)
+    
+    if qps <= 0:
+        click.echo("错误: 每秒请求数必须大于 0", err=True)
+        sys.exit(1)
+    
+    if retries < 0:
+        click.echo("错误: 重试次数不能为负数", err=True)
+        sys.exit(1)
+    
+    if cache_min_age < 1:
+        click.echo("错误: 缓存最小天数必须至少为 1", err=True)
+        sys.exit(1)
+    
+    if max_days < 1:
+        click.echo("错误: 最大查询天数必须至少为 1", err=True)
+        sys.exit(1)
+    
+    try:
+        config = get_config()
+    except ValueError as e:
+        click.echo(f"✗ 配置错误: {e}", err=True)
+        click.echo("\n提示: 请参考 env.example 文件创建 .env 配置文件", err=True)
+        sys.exit(1)
+    
+    cache = None if no_cache else ResultCache(cache_dir, min_age_days=cache_min_age)
+    server_class = _load('sms_server', 'SMSQueryServer')
+    client_class = _load(*ENGINES['thread'])
+    
+    with client_class(
+        config,
+        max_workers=workers,
+        max_qps=qps,
+        max_retries=retries,
+        cache=cache,
+        metrics=QueryMetrics(max_samples=RESERVOIR_SIZE),
+        progress=create_progress('none')
+    ) as client:
+        try:
+            server = server_class(client, host=host, port=port, max_days=max_days)
+        except OSError as e:
+            click.echo(f"错误: 无法监听 {host}:{port}: {e}", err=True)
+            sys.exit(1)
+        click.echo(f"查询服务已启动: {server.endpoint}（并发 {workers}，结果缓存: {'关闭' if no_cache else cache_dir}）")
+        click.echo("接口: GET/POST /query，GET /health，GET /metrics；按 Ctrl-C 停止")
+        server.serve_forever()
+    
+    if cache is not None:
+        cache.close()
+    click.echo("\n查询服务已停止")
+
+
+@main.command('sync', short_help='增量同步：只查询水位之后的日期，把新记录追加到输出文件')
+@click.option(
+    '--phone',
+    '-p',
+    help='要同步的手机号码（与 --phones-file 二选一）'
+)
+@click.option(
+    '--phones-file',
+    '-f',
+    type=click.Path(exists=True, dir_okay=False),
+    help='手机号文件，每行一个号码，# 开头为注释（与 --phone 二选一）'
+)
+@click.option(
+    '--output',
+    '-o',
+    required=True,
+    help='CSV 输出文件，新记录追加到文件末尾（不添加时间戳）'
+)
+@click.option(
+    '--start-date',
+    '-s',
+    help='首次同步（没有水位）的号码从这一天开始查询，格式：YYYYMMDD。默认为结束日期'
+)
+@click.option(
+    '--end-date',
+    '-e',
+    help='同步到这一天，格式：YYYYMMDD。默认为今天'
+)
+@click.option(
+    '--state',
+    'state_path',
+    type=click.Path(dir_okay=False),
+    help='水位文件，默认为 <输出文件>.sync.json'
+)
+@click.option(
+    '--settle-days',
+    default=3,
+    type=int,
+    help='日期距今超过多少天且没有"等待回执"记录时视为已结算，只追加已结算的日期，默认为 3'
+)
+@click.option(
+    '--workers',
+    '-w',
+    default=10,
+    type=int,
+    help='最大并发请求数，默认为 10（1-50）'
+)
+@click.option(
+    '--qps',
+    default=50.0,
+    type=float,
+    help='每组访问密钥每秒最多请求数，默认为 50。遇到API限流时会自动降低，恢复后逐步提高（配置多组访问密钥时总速率随之增加）'
+)
+@click.option(
+    '--retries',
+    default=5,
+    type=int,
+    help='限流、服务端错误和超时的最大重试次数，默认为 5'
+)
+@click.option(
+    '--deadline',
+    callback=lambda ctx, param, value: _parse_duration(value),
+    help='整个命令的时间上限，同 query；到时已完成的日期照常追加，号码的水位停在未完成的日期之前，退出码为 3'
+)
+@click.option(
+    '--progress', 'progress_mode',
+    type=click.Choice(['auto'] + list(PROGRESS_MODES)),
+    default='auto',
+    show_default=True,
+    help='进度显示方式，同 query'
+)
+@click.option(
+    '--quiet', '-q',
+    is_flag=True,
+    help='安静模式，只输出错误信息'
+)
+def sync(phone, phones_file, output, start_date, end_date, state_path, settle_days, workers, qps, retries,
+         deadline, progress_mode, quiet):
+    """
+    增量同步短信记录
+    
+    为每个手机号保存水位（已写入的最后一个结算日期和下次开始查询的日期），
+    每次只查询水位之后的日期，把已结算日期的新记录以最终状态追加到同一个 CSV 文件。
+    
+    示例：
+    
+        python main.py sync -f phones.txt -o archive.csv -s 20231101
+        
+        python main.py sync -f phones.txt -o archive.csv
+        
+        python main.py sync -f phones.txt -o archive.csv.gz
+        
+        python main.py sync -f phones.txt -o archive.csv --deadline 10m
+    """
+    progress = create_progress('none' if quiet else progress_mode, _redirect_console(progress_mode, quiet))
+    cancel_token = _load('cancellation', 'CancelToken')(deadline)
+    try:
+        today = datetime.now().strftime('%Y%m%d')
+        end_date = end_date or today
+        phones, start_date, end_date = _resolve_query(phone, phones_file, start_date or end_date, end_date)
+        
+        if workers < 1 or workers > MAX_WORKERS['thread']:
+            click.echo(f"错误: 并发数必须在 1-{MAX_WORKERS['thread']} 之间", err=True)
+            sys.exit(1)
+        
+        if qps <= 0:
+            click.echo("错误: 每秒请求数必须大于 0", err=True)
+            sys.exit(1)
+        
+        if retries < 0:
+            click.echo("错误: 重试次数不能为负数", err=True)
+            sys.exit(1)
+        
+        if settle_days < 1:
+            click.echo("错误: 结算天数必须至少为 1", err=True)
+            sys.exit(1)
+        
+        # 输出文件以 .csv.gz / .csv.zst 结尾时压缩，每次同步追加一个新的 gzip 成员 / zstd 帧
+        split_compression = _load('compression', 'split_compression')
+        base, compress = split_compression(output)
+        if not base.endswith('.csv'):
+            output = f"{base}.csv{output[len(base):]}"
+        if compress:
+            try:
+                _load('compression', 'validate')(compress)
+            except RuntimeError as e:
+                click.echo(f"错误: {e}", err=True)
+                sys.exit(1)
+        sync_state_class = _load('sync_state', 'SyncState')
+        try:
+            state = sync_state_class.load(state_path or f"{output}.sync.json")
+        except ValueError as e:
+            click.echo(f"错误: {e}", err=True)
+            sys.exit(1)
+        if not state.exists and os.path.exists(output) and os.path.getsize(output):
+            click.echo(f"错误: {output} 已存在但没有水位文件 {state.path}，无法判断哪些记录已写入", err=True)
+            sys.exit(1)
+        
+        tasks = state.plan(phones, start_date, end_date)
+        
+        click.echo("=" * 60)
+        click.echo("阿里云短信增量同步")
+        click.echo("=" * 60)
+        click.echo(f"手机号码: 共 {len(phones)} 个号码（{sum(1 for p in phones if state.watermark(p))} 个已有水位）")
+        click.echo(f"同步截止: {_format_date_display(end_date)}")
+        click.echo(f"查询任务: {len(tasks)} 个 (手机号, 日期)")
+        if deadline:
+            click.echo(f"截止时间: {_format_deadline(deadline)}")
+        click.echo(f"输出文件: {output}")
+        click.echo(f"水位文件: {state.path}")
+        click.echo("=" * 60)
+        
+        if not tasks:
+            click.echo("\n所有号码都已同步到最新")
+            sys.exit(0)
+        
+        try:
+            config = get_config()
+        except ValueError as e:
+            click.echo(f"✗ 配置错误: {e}", err=True)
+            click.echo("\n提示: 请参考 env.example 文件创建 .env 配置文件", err=True)
+            sys.exit(1)
+        
+        client_class = _load(*ENGINES['thread'])
+        exporter = _load('csv_export', 'export_to_csv')
+        statistics = {'total': 0, 'success': 0, 'failed': 0}
+        
+        with client_class(
+            config,
+            max_workers=workers,
+            max_qps=qps,
+            max_retries=retries,
+            progress=progress,
+            cancel_token=cancel_token
+        ) as client:
+            click.echo("\n开始同步...")
+            click.echo("-" * 60)
+            _install_interrupt_handler(cancel_token)
+            days = client.iter_days(tasks, ordered=True)
+            try:
+                exporter(_tally_statistics(state.iter_new_records(days, settle_days), statistics), output, append=True)
+            finally:
+                # 中断时也保存已写入记录的水位，下次同步不会重复追加
+                state.save()
+            client.report_finish(len(phones), statistics['total'])
+            click.echo("-" * 60)
+            _display_rate_limit_summary(client)
+        
+        progress.close()
+        cancel_token.close()
+        
+        if client.failed_days:
+            click.echo(f"\n提示: {len(client.failed_days)} 个日期查询失败，这些号码的水位停在失败日期之前，下次同步会重新查询")
+        partial = _display_incomplete_days(client)
+        if partial:
+            click.echo("这些号码的水位停在未完成的日期之前，下次同步会继续查询")
+        
+        if statistics['total']:
+            _display_statistics(statistics)
+        else:
+            click.echo("\n没有新记录")
+        
+        if partial:
+            click.echo("\n⚠️  同步部分完成")
+            click.echo("=" * 60)
+            sys.exit(EXIT_PARTIAL)
+        click.echo("\n✓ 同步完成!")
+        click.echo("=" * 60)
+        
+    except KeyboardInterrupt:
+        progress.close()
+        click.echo("\n\n用户中断操作，已写入记录的水位已保存", err=True)
         sys.exit(1)
     except Exception as e:
+        progress.close()
         click.echo(f"\n错误: {str(e)}", err=True)
         import traceback
         traceback.print_exc()
         sys.exit(1)
 
 
+@main.command('merge', short_help='k 路归并多个分片的导出文件')
+@click.argument(
+    'inputs',
+    nargs=-1,
+    required=True,
+    type=click.Path(exists=True, dir_okay=False)
+)
+@click.option(
+    '--output',
+    '-o',
+    required=True,
+    help='合并后的输出文件（不添加时间戳），扩展名决定格式，也可用 --format 指定'
+)
+@click.option(
+    '--format',
+    'output_format',
+    type=click.Choice(list(EXPORT_FORMATS)),
+    help='输出格式，默认根据输出文件扩展名判断，无法判断时为 csv'
+)
+@click.option(
+    '--phones-file',
+    '-f',
+    type=click.Path(exists=True, dir_okay=False),
+    help='查询时使用的手机号文件，合并结果按其中的号码顺序排列；不指定时按号码从小到大排列'
+)
+def merge(inputs, output, output_format, phones_file):
+    """
+    合并分片结果
+    
+    输入文件可以是 CSV（可为 .csv.gz / .csv.zst）、Excel 或 Parquet（可混用），每个文件须按手机号、发送时间排序
+    （query 子命令的输出即是如此）。逐条归并，内存占用与输入文件数成正比，与记录数无关。
+    
+    示例：
+    
+        python main.py merge part1_*.csv part2_*.csv part3_*.csv -f phones.txt -o audit.csv
+        
+        python main.py merge shard*.parquet -o audit.xlsx
+        
+        python main.py merge part*.csv.gz -f phones.txt -o audit.csv.zst
+    """
+    # 输出文件以 .gz / .zst 结尾时压缩（只支持 CSV）
+    base, compress = _load('compression', 'split_compression')(output)
+    if output_format is None:
+        extension = os.path.splitext(base)[1].lower()
+        output_format = next(
+            (name for name, (ext, _, _) in EXPORT_FORMATS.items() if ext == extension),
+            'csv'
+        )
+    extension, export_module, export_function = EXPORT_FORMATS[output_format]
+    if compress and output_format != 'csv':
+        click.echo(f"错误: 只有 CSV 输出支持 {output[len(base):]} 压缩", err=True)
+        sys.exit(1)
+    if not base.endswith(extension):
+        output = f"{base}{extension}{output[len(base):]}"
+    
+    if os.path.abspath(output) in {os.path.abspath(path) for path in inputs}:
+        click.echo("错误: 输出文件不能是输入文件之一", err=True)
+        sys.exit(1)
+    
+    if output_format == 'parquet' and not _load('parquet_export', 'is_available')():
+        click.echo("错误: 导出 Parquet 格式需要安装 pyarrow（pip install pyarrow）", err=True)
+        sys.exit(1)
+    
+    phone_order = _load_phone_list(phones_file) if phones_file else None
+    
+    click.echo(f"正在合并 {len(inputs)} 个文件到 {output}...")
+    statistics = {'total': 0, 'success': 0, 'failed': 0}
+    try:
+        records = _load('merge_outputs', 'merge_records')(list(inputs), phone_order)
+        _load(export_module, export_function)(_tally_statistics(records, statistics), output)
+    except (ValueError, RuntimeError) as e:
+        click.echo(f"\n错误: {e}", err=True)
+        if os.path.exists(output):
+            os.remove(output)
+        sys.exit(1)
+    
+    if statistics['total']:
+        _display_statistics(statistics)
+
+
+def _load(module_name, attribute):
+    """
+    导入模块并返回其中的对象（用于延迟导入查询引擎和导出模块）
+    
+    Args:
+        module_name: 模块名
+        attribute: 对象名
+        
+    Returns:
+        模块中的对象
+    """
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def _redirect_console(progress_mode, quiet):
+    """
+    按输出模式调整标准输出，返回进度事件的输出流
+    
+    json 模式下标准输出只保留事件流，其他提示信息改写到标准错误；
+    安静模式下丢弃所有提示信息，错误信息仍输出到标准错误。
+    命令结束时（包括 sys.exit 和异常）恢复原来的标准输出。
+    
+    Args:
+        progress_mode: --progress 参数
+        quiet: 是否为安静模式
+        
+    Returns:
+        原来的标准输出
+    """
+    stdout = sys.stdout
+    if quiet:
+        redirected = open(os.devnull, 'w')
+    elif progress_mode == 'json':
+        redirected = sys.stderr
+    else:
+        return stdout
+    
+    def restore():
+        sys.stdout = stdout
+        if redirected is not sys.stderr:
+            redirected.close()
+    
+    sys.stdout = redirected
+    click.get_current_context().call_on_close(restore)
+    return stdout
+
+
+def _resolve_query(phone, phones_file, start_date, end_date):
+    """
+    验证命令行中的号码和日期参数
+    
+    Args:
+        phone: --phone 参数
+        phones_file: --phones-file 参数
+        start_date: --start-date 参数
+        end_date: --end-date 参数
+        
+    Returns:
+        (手机号列表, 开始日期, 结束日期)，参数无效时退出程序
+    """
+    # 验证和格式化日期
+    start_date = _validate_and_format_date(start_date, 'start_date')
+    
+    if end_date:
+        end_date = _validate_and_format_date(end_date, 'end_date')
+    else:
+        end_date = start_date
+    
+    # 验证日期范围
+    if start_date > end_date:
+        click.echo("错误: 开始日期不能晚于结束日期", err=True)
+        sys.exit(1)
+    
+    # 验证手机号来源
+    if bool(phone) == bool(phones_file):
+        click.echo("错误: 必须且只能指定 --phone 或 --phones-file 其中之一", err=True)
+        sys.exit(1)
+    
+    if phones_file:
+        phones = _load_phone_list(phones_file)
+        if not phones:
+            click.echo(f"错误: 手机号文件 {phones_file} 中没有号码", err=True)
+            sys.exit(1)
+    else:
+        phones = [phone]
+    
+    # 验证手机号格式
+    invalid_phones = [p for p in phones if not _validate_phone_number(p)]
+    if invalid_phones:
+        click.echo(f"错误: 手机号格式不正确: {', '.join(invalid_phones[:10])}", err=True)
+        sys.exit(1)
+    
+    return phones, start_date, end_date
+
+
+def _parse_shard(value):
+    """
+    解析 --shard 参数
+    
+    Args:
+        value: i/N 格式的字符串，如 2/4
+        
+    Returns:
+        (分片序号, 分片总数)，未指定时为 None
+    """
+    if not value:
+        return None
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise click.BadParameter("格式应为 i/N，如 2/4")
+    if count < 1 or not 1 <= index <= count:
+        raise click.BadParameter("分片序号必须在 1 到分片总数之间")
+    return index, count
+
+
+def _parse_duration(value):
+    """
+    解析 --deadline 参数
+    
+    Args:
+        value: 时长，如 90、90s、30m、1h30m、1.5h（纯数字为秒）
+        
+    Returns:
+        秒数，未指定时为 None
+    """
+    if not value:
+        return None
+    match = re.fullmatch(r'(?:([\d.]+)h)?(?:([\d.]+)m)?(?:([\d.]+)s?)?', value.strip().lower())
+    if not match or not any(match.groups()):
+        raise click.BadParameter("格式应为 90s、30m、1h30m 等")
+    try:
+        hours, minutes, seconds = (float(part) if part else 0.0 for part in match.groups())
+    except ValueError:
+        raise click.BadParameter("格式应为 90s、30m、1h30m 等")
+    total = hours * 3600 + minutes * 60 + seconds
+    if total <= 0:
+        raise click.BadParameter("时间上限必须大于 0")
+    return total
+
+
+def _format_deadline(seconds):
+    """截止时间显示为时长和到期的时刻"""
+    expires = datetime.now() + timedelta(seconds=seconds)
+    minutes, rest = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        duration = f"{hours} 小时 {minutes} 分钟"
+    elif minutes:
+        duration = f"{minutes} 分钟 {rest} 秒" if rest else f"{minutes} 分钟"
+    else:
+        duration = f"{seconds:g} 秒"
+    return f"{duration}（{expires.strftime('%H:%M:%S')} 停止查询）"
+
+
+def _install_interrupt_handler(cancel_token):
+    """
+    第一次 Ctrl-C 取消查询：停止调度，已完成的日期照常写出；之后恢复默认处理，再按一次立即中断
+    
+    Args:
+        cancel_token: 查询客户端使用的取消令牌
+    """
+    def handle(signum, frame):
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        cancel_token.cancel_soon()
+    
+    signal.signal(signal.SIGINT, handle)
+
+
+def _display_incomplete_days(client):
+    """
+    查询被取消时显示未完成的日期（按号码分组，连续日期合并为区间）
+    
+    Args:
+        client: 查询客户端
+        
+    Returns:
+        是否有未完成的日期
+    """
+    if not client.incomplete_days:
+        return False
+    
+    by_phone = {}
+    for phone, query_date in client.incomplete_days:
+        by_phone.setdefault(phone, []).append(query_date)
+    
+    reason = CANCEL_LABELS.get(client.cancel_token.reason, '查询已取消')
+    click.echo(f"\n{reason}，{len(client.incomplete_days)} 个日期未完成（{len(by_phone)} 个号码）:")
+    for phone, dates in list(by_phone.items())[:MAX_LISTED_PHONES]:
+        click.echo(f"  {phone}: {', '.join(_date_ranges(dates))}")
+    if len(by_phone) > MAX_LISTED_PHONES:
+        click.echo(f"  ……还有 {len(by_phone) - MAX_LISTED_PHONES} 个号码")
+    return True
+
+
+def _date_ranges(dates):
+    """把日期列表（YYYYMMDD）中连续的日期合并为 起始-结束 区间"""
+    ranges = []
+    for query_date in sorted(dates):
+        current = datetime.strptime(query_date, '%Y%m%d')
+        if ranges and current - ranges[-1][1] == timedelta(days=1):
+            ranges[-1][1] = current
+        else:
+            ranges.append([current, current])
+    return [
+        start.strftime('%Y%m%d') if start == end else f"{start:%Y%m%d}-{end:%Y%m%d}"
+        for start, end in ranges
+    ]
+
+
+def _display_resume_hint(journal):
+    """
+    中断或出错时关闭断点日志并提示续查命令
+    
+    Args:
+        journal: 断点日志，未启用时为 None
+    """
+    if journal is None:
+        return
+    journal.close()
+    click.echo(f"已完成 {journal.completed_count} 天，可使用以下命令继续查询:", err=True)
+    click.echo(f"  python main.py --resume {journal.path}", err=True)
+
+
 def _validate_and_format_date(date_str, field_name):
     """
     验证并格式化日期
@@ -186,6 +1307,26 @@ def _validate_and_format_date(date_str, field_name):
     return date_str
 
 
+def _load_phone_list(path):
+    """
+    读取手机号文件
+    
+    Args:
+        path: 文件路径，每行一个号码，空行和 # 开头的行会被忽略
+        
+    Returns:
+        去重后的手机号列表（保持文件中的顺序）
+    """
+    phones = []
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            phones.append(line)
+    return list(dict.fromkeys(phones))
+
+
 def _validate_phone_number(phone):
     """
     验证手机号格式
@@ -217,16 +1358,154 @@ def _format_date_display(date_str):
         return date_str
 
 
-def _display_statistics(records):
+def _display_rate_limit_summary(client):
+    """
+    显示限流和重试情况
+    
+    Args:
+        client: 查询客户端
+    """
+    pool = client.credential_pool
+    if len(pool) > 1:
+        click.echo("\n访问密钥:")
+        for member in pool.members:
+            limiter = member.rate_limiter
+            click.echo(
+                f"  {member.label}: {member.calls} 次调用，限流 {limiter.throttled_count} 次，"
+                f"失败 {member.failures} 次，最终速率 {limiter.rate:.1f} 次/秒"
+            )
+    
+    if not client.retry_count and not pool.throttled_count:
+        return
+    
+    click.echo("\n限流信息:")
+    click.echo(f"  触发限流: {pool.throttled_count} 次")
+    click.echo(f"  重试请求: {client.retry_count} 次")
+    # 每组密钥都可以用满全部并发，实际并发不超过线程池（信号量）大小
+    concurrency = min(pool.concurrency, client.max_workers + client.hedge_slots)
+    click.echo(f"  最终速率: {pool.rate:.1f} 次/秒，并发 {concurrency}")
+
+
+def _display_hedge_summary(hedging):
+    """
+    显示对冲请求情况
+    
+    Args:
+        hedging: 对冲策略，未启用时为 None
+    """
+    if hedging is None:
+        return
+    
+    click.echo("\n对冲信息:")
+    click.echo(f"  对冲请求: {hedging.hedges} 次（占 {hedging.requests} 个页请求的 {hedging.hedge_rate:.1%}）")
+    click.echo(f"  对冲胜出: {hedging.hedge_wins} 次（对冲请求先于原请求返回）")
+    delay = hedging.delay()
+    if delay is not None:
+        click.echo(f"  对冲等待: {delay * 1000:.0f} ms（p{hedging.percentile:g}）")
+
+
+def _display_schedule_summary(client):
+    """
+    显示预计和实际的总耗时
+    
+    Args:
+        client: 查询客户端
+    """
+    report = client.schedule_report
+    if report is None or report['actual_pages'] is None:
+        return
+    
+    click.echo("\n调度信息:")
+    click.echo(f"  调度策略: {report['policy']}（{SCHEDULE_LABELS[report['policy']]}）")
+    click.echo(
+        f"  预计耗时: {report['estimated_seconds']:.1f} 秒"
+        f"（约 {report['estimated_pages']} 个页请求，单页 {report['page_latency'] * 1000:.0f} ms）"
+    )
+    click.echo(f"  实际耗时: {report['actual_seconds']:.1f} 秒（{report['actual_pages']} 个页请求）")
+
+
+def _display_profile(profiler):
+    """
+    显示性能剖析结果
+    
+    Args:
+        profiler: 阶段剖析器，未启用时为 None
+    """
+    if profiler is None:
+        return
+    
+    click.echo("\n性能剖析:")
+    click.echo(profiler.format_text())
+
+
+def _display_cache_summary(cache):
+    """
+    显示缓存命中情况
+    
+    Args:
+        cache: 结果缓存，未启用时为 None
+    """
+    if cache is None:
+        return
+    
+    click.echo("\n缓存信息:")
+    click.echo(f"  缓存命中: {cache.hits} 天")
+    click.echo(f"  缓存未命中: {cache.misses} 天")
+
+
+def _display_metrics_summary(metrics):
+    """
+    显示接口调用耗时和排队时间
+    
+    Args:
+        metrics: 指标收集器，未启用时为 None
+    """
+    if metrics is None:
+        return
+    
+    stats = metrics.to_dict()
+    if not stats['calls']['total']:
+        return
+    
+    latency = stats['latency_seconds']
+    queue_wait = stats['queue_wait_seconds']
+    click.echo("\n调用信息:")
+    click.echo(f"  接口调用: {stats['calls']['total']} 次，{stats['throughput']['calls_per_second']} 次/秒")
+    click.echo(f"  调用耗时: p50 {latency['p50'] * 1000:.0f}ms，p99 {latency['p99'] * 1000:.0f}ms")
+    click.echo(f"  排队时间: p50 {queue_wait['p50'] * 1000:.0f}ms，p99 {queue_wait['p99'] * 1000:.0f}ms")
+    click.echo(f"  平均并发: {stats['throughput']['average_in_flight']}")
+
+
+def _tally_statistics(records, statistics):
+    """
+    边迭代边统计记录，不保存记录本身
+    
+    Args:
+        records: SMSRecord 记录迭代器
+        statistics: 统计结果字典，包含 total / success / failed 计数
+        
+    Yields:
+        原样产出的记录
+    """
+    for record in records:
+        statistics['total'] += 1
+        if record.status_code == STATUS_SUCCESS:
+            statistics['success'] += 1
+        elif record.status_code == STATUS_FAILED:
+            statistics['failed'] += 1
+        yield record
+
+
+def _display_statistics(statistics):
     """
     显示统计信息
     
     Args:
-        records: 记录列表
+        statistics: _tally_statistics 收集的统计结果
     """
-    total = len(records)
-    success = sum(1 for r in records if '成功' in r.get('status', ''))
-    failed = sum(1 for r in records if '失败' in r.get('status', ''))
+    total = statistics['total']
+    success = statistics['success']
+    failed = statistics['failed']
     waiting = total - success - failed
     
     click.echo("\n统计信息:")
@@ -236,6 +1515,21 @@ def _display_statistics(records):
     click.echo(f"  等待回执: {waiting}")
 
 
+def _display_breakdown(aggregator, output_format, stream=None):
+    """
+    显示汇总统计
+    
+    Args:
+        aggregator: 查询时收集统计的 RecordAggregator
+        output_format: table 或 json
+        stream: 输出流，默认为当前标准输出（安静模式下传入原来的标准输出，汇总统计仍然输出）
+    """
+    text = _load('analytics', 'format_breakdown')(aggregator.result(), output_format)
+    if stream is None:
+        click.echo("\n汇总统计:")
+    click.echo(text, file=stream, nl=False)
+
+
 if __name__ == '__main__':
     main()
 
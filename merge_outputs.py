@@ -0,0 +1,150 @@
+"""
+分片结果合并模块
+逐条读取多个已排序的导出文件（CSV / Excel / Parquet），k 路归并为一个有序的记录流，
+内存占用只与输入文件数有关，与记录数无关
+"""
+import csv
+import heapq
+import os
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from compression import open_text, split_compression
+from sms_record import SMSRecord, format_send_time
+
+
+# 读取 Parquet 文件时每批的记录数
+PARQUET_BATCH_SIZE = 10000
+
+
+def read_records(path: str) -> Iterator[SMSRecord]:
+    """
+    按扩展名逐条读取导出文件
+
+    Args:
+        path: .csv（可为 .csv.gz / .csv.zst）、.xlsx 或 .parquet 文件
+
+    Yields:
+        短信记录（CSV 和 Excel 没有模板编号列，template_code 为空）
+
+    Raises:
+        ValueError: 不支持的文件格式
+    """
+    base, compress = split_compression(path)
+    extension = os.path.splitext(base)[1].lower()
+    if compress and extension != '.csv':
+        raise ValueError(f"不支持的文件格式: {path}（只有 CSV 文件可以压缩）")
+    if extension == '.csv':
+        return _read_csv(path)
+    if extension == '.xlsx':
+        return _read_excel(path)
+    if extension == '.parquet':
+        return _read_parquet(path)
+    raise ValueError(f"不支持的文件格式: {path}（支持 .csv、.csv.gz、.csv.zst、.xlsx、.parquet）")
+
+
+def merge_records(paths: List[str], phone_order: Optional[List[str]] = None) -> Iterator[SMSRecord]:
+    """
+    k 路归并多个分片的导出文件
+
+    每个输入文件必须已按 (手机号, 发送时间) 排序，即 query 子命令的输出顺序：
+    手机号按号码列表的顺序，同一号码内按发送时间。每个输入只在内存中保留当前一条记录。
+
+    Args:
+        paths: 输入文件列表
+        phone_order: 号码列表（查询时的 --phones-file 顺序），为 None 时按号码字符串排序
+
+    Yields:
+        合并后按 (手机号, 发送时间) 排序的记录
+
+    Raises:
+        ValueError: 某个输入文件的顺序与排序规则不一致
+    """
+    sort_key = _sort_key(phone_order)
+    streams = [_check_order(read_records(path), path, sort_key) for path in paths]
+    return heapq.merge(*streams, key=sort_key)
+
+
+def _sort_key(phone_order: Optional[List[str]]) -> Callable[[SMSRecord], Tuple]:
+    """生成排序键：(号码序号, 发送时间)"""
+    if phone_order is None:
+        return lambda record: (record.phone_number, record.send_ts)
+    rank = {phone: i for i, phone in enumerate(phone_order)}
+    unknown = len(rank)
+    return lambda record: (rank.get(record.phone_number, unknown), record.phone_number, record.send_ts)
+
+
+def _check_order(records: Iterable[SMSRecord], path: str, sort_key) -> Iterator[SMSRecord]:
+    """逐条检查输入文件的顺序，乱序时无法正确归并"""
+    previous = None
+    for index, record in enumerate(records, 1):
+        key = sort_key(record)
+        if previous is not None and key < previous:
+            raise ValueError(
+                f"{path} 第 {index} 条记录（{record.phone_number} {record.send_time}）顺序与前一条不一致，"
+                f"请用 --phones-file 指定查询时的号码列表"
+            )
+        previous = key
+        yield record
+
+
+def _read_csv(path: str) -> Iterator[SMSRecord]:
+    """读取 export_to_csv 写出的文件（压缩文件按扩展名解压）"""
+    with open_text(path, 'utf-8-sig') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # 表头
+        for row in reader:
+            if row:
+                yield _from_row(row)
+
+
+def _read_excel(path: str) -> Iterator[SMSRecord]:
+    """读取 export_to_excel 写出的文件（只读模式，逐行读取）"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True)
+    try:
+        rows = workbook.active.iter_rows(min_row=2, values_only=True)
+        for row in rows:
+            if row and row[0] is not None:
+                yield _from_row(['' if value is None else str(value) for value in row])
+    finally:
+        workbook.close()
+
+
+def _read_parquet(path: str) -> Iterator[SMSRecord]:
+    """读取 export_to_parquet 写出的文件（按批读取）"""
+    from parquet_export import is_available, pq
+
+    if not is_available():
+        raise RuntimeError("读取 Parquet 文件需要安装 pyarrow: pip install pyarrow")
+
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=PARQUET_BATCH_SIZE):
+        for row in batch.to_pylist():
+            send_time = row['send_time']
+            yield SMSRecord.from_dict({
+                'phone_number': row['phone_number'] or '',
+                'send_time': _format_datetime(send_time),
+                'status': row['status'] or '',
+                'content': row['content'] or '',
+                'template_code': row['template_code'] or '',
+            })
+
+
+def _from_row(row: List[str]) -> SMSRecord:
+    """表格行（手机号、发送时间、发送状态、短信内容）转换为记录"""
+    row = row + [''] * (4 - len(row))
+    return SMSRecord.from_dict({
+        'phone_number': row[0],
+        'send_time': row[1],
+        'status': row[2],
+        'content': row[3],
+    })
+
+
+def _format_datetime(value: Optional[datetime]) -> str:
+    """Parquet 中带时区的发送时间转换为北京时间字符串"""
+    if value is None:
+        return ''
+    return format_send_time(int(value.timestamp()))
@@ -0,0 +1,362 @@
+"""
+查询指标模块
+记录每次接口调用的耗时、排队时间、页码、返回记录数和错误码，
+汇总后输出为 JSON 统计文件或 Prometheus 文本格式
+"""
+import bisect
+import heapq
+import json
+import math
+import random
+import sys
+import threading
+import time
+from array import array
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+
+# 调用结果
+OUTCOME_OK = 'ok'
+OUTCOME_THROTTLED = 'throttled'
+OUTCOME_ERROR = 'error'
+
+# 单天结果的来源
+SOURCE_API = 'api'
+SOURCE_CACHE = 'cache'
+SOURCE_JOURNAL = 'journal'
+
+# 接口耗时直方图的分桶上界（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 单天耗时直方图的分桶上界（秒）
+DAY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# 统计文件中保留的最慢日期数
+SLOWEST_DAYS = 10
+
+# 长时间运行（serve 子命令）时用于计算耗时分位数的样本数，超出后均匀抽样保留
+RESERVOIR_SIZE = 10000
+
+# Prometheus 指标名前缀
+METRIC_PREFIX = 'sms_query'
+
+
+class CallEvent(NamedTuple):
+    """一次 QuerySendDetails 调用（每次重试单独记录）"""
+    phone_number: str
+    query_date: str
+    page: int
+    attempt: int        # 第几次重试，从0开始
+    outcome: str        # OUTCOME_OK / OUTCOME_THROTTLED / OUTCOME_ERROR
+    error_code: str     # 成功时为空字符串
+    latency: float      # 接口调用耗时（秒）
+    queue_wait: float   # 从请求就绪到开始调用的等待时间（线程池排队 + 限流器），秒
+    records: int        # 本页返回的记录数
+
+
+class DayEvent(NamedTuple):
+    """一个 (手机号, 日期) 任务完成"""
+    phone_number: str
+    query_date: str
+    source: str         # SOURCE_API / SOURCE_CACHE / SOURCE_JOURNAL
+    failed: bool
+    pages: int          # 调用接口获取的页数（缓存和断点日志为0）
+    records: int
+    elapsed: float      # 从开始查询到全部页完成的时间（秒）
+
+
+class _Histogram:
+    """Prometheus 风格的累积直方图"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+    def prometheus_lines(self, name: str, labels: str = '') -> List[str]:
+        """生成 _bucket / _sum / _count 行"""
+        separator = ',' if labels else ''
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}{separator}le="{bound}"}} {cumulative}')
+        cumulative += self.counts[-1]
+        lines.append(f'{name}_bucket{{{labels}{separator}le="+Inf"}} {cumulative}')
+        suffix = f'{{{labels}}}' if labels else ''
+        lines.append(f'{name}_sum{suffix} {self.total:.6f}')
+        lines.append(f'{name}_count{suffix} {cumulative}')
+        return lines
+
+
+class _Samples:
+    """
+    耗时样本
+
+    limit 为 None 时保留全部样本，分位数是精确值；否则用蓄水池抽样保留最多 limit 个
+    均匀样本，内存和汇总耗时不随调用次数增长。平均值和最大值始终按全部样本计算。
+    """
+
+    def __init__(self, limit: Optional[int] = None):
+        self.limit = limit
+        self.values = array('d')
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        if self.limit is None or len(self.values) < self.limit:
+            self.values.append(value)
+            return
+        index = random.randrange(self.count)
+        if index < self.limit:
+            self.values[index] = value
+
+
+class QueryMetrics:
+    """
+    查询指标收集器
+
+    传给 SMSQueryClient（metrics 参数）后，两种查询引擎在每次接口调用和
+    每个日期完成时调用 record_call / record_day。所有方法都是线程安全的。
+
+    嵌入其他程序时可以通过 add_callback 注册回调，实时接收 CallEvent 和
+    DayEvent；回调在查询线程（或事件循环）中同步执行，应尽快返回。
+    """
+
+    def __init__(self, max_samples: Optional[int] = None):
+        """
+        初始化收集器，从此刻开始计时
+
+        Args:
+            max_samples: 计算耗时分位数时保留的样本数上限，为 None 时保留全部样本；
+                长时间运行的服务应设置（如 RESERVOIR_SIZE），避免内存随调用次数增长
+        """
+        self.started = time.perf_counter()
+        self.calls = {OUTCOME_OK: 0, OUTCOME_THROTTLED: 0, OUTCOME_ERROR: 0}
+        self.retries = 0
+        self.records = 0
+        self.error_codes = {}
+        self.days = {SOURCE_API: 0, SOURCE_CACHE: 0, SOURCE_JOURNAL: 0}
+        self.failed_days = 0
+        self.latency = _Histogram(LATENCY_BUCKETS)
+        self.queue_wait = _Histogram(LATENCY_BUCKETS)
+        self.day_duration = _Histogram(DAY_BUCKETS)
+        self._latencies = _Samples(max_samples)
+        self._queue_waits = _Samples(max_samples)
+        self._slowest = []   # (耗时, 序号, DayEvent) 小顶堆
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def add_callback(self, callback: Callable):
+        """
+        注册事件回调
+
+        Args:
+            callback: 接收一个 CallEvent 或 DayEvent 参数的函数
+        """
+        self._callbacks.append(callback)
+
+    def record_call(self, event: CallEvent):
+        """
+        记录一次接口调用
+
+        Args:
+            event: 调用事件
+        """
+        with self._lock:
+            self.calls[event.outcome] += 1
+            if event.attempt:
+                self.retries += 1
+            if event.outcome == OUTCOME_OK:
+                self.records += event.records
+            if event.error_code:
+                self.error_codes[event.error_code] = self.error_codes.get(event.error_code, 0) + 1
+            self.latency.observe(event.latency)
+            self.queue_wait.observe(event.queue_wait)
+            self._latencies.add(event.latency)
+            self._queue_waits.add(event.queue_wait)
+        self._notify(event)
+
+    def record_day(self, event: DayEvent):
+        """
+        记录一个完成的日期
+
+        Args:
+            event: 日期事件
+        """
+        with self._lock:
+            self.days[event.source] += 1
+            if event.failed:
+                self.failed_days += 1
+            if event.source == SOURCE_API:
+                self.day_duration.observe(event.elapsed)
+                item = (event.elapsed, self.days[SOURCE_API], event)
+                if len(self._slowest) < SLOWEST_DAYS:
+                    heapq.heappush(self._slowest, item)
+                elif item > self._slowest[0]:
+                    heapq.heapreplace(self._slowest, item)
+        self._notify(event)
+
+    def to_dict(self) -> Dict:
+        """
+        汇总当前的统计数据
+
+        Returns:
+            可直接序列化为 JSON 的字典
+        """
+        with self._lock:
+            elapsed = time.perf_counter() - self.started
+            total_calls = sum(self.calls.values())
+            busy = self.latency.total
+            return {
+                'elapsed_seconds': round(elapsed, 3),
+                'calls': dict(self.calls, total=total_calls),
+                'retries': self.retries,
+                'records': self.records,
+                'error_codes': dict(sorted(self.error_codes.items(), key=lambda item: -item[1])),
+                'latency_seconds': _summarize(self._latencies),
+                'queue_wait_seconds': _summarize(self._queue_waits),
+                'throughput': {
+                    'calls_per_second': round(total_calls / elapsed, 2) if elapsed else 0.0,
+                    'records_per_second': round(self.records / elapsed, 2) if elapsed else 0.0,
+                    # Little 定律：平均同时进行的请求数，可用于确定 --workers
+                    'average_in_flight': round(busy / elapsed, 2) if elapsed else 0.0,
+                },
+                'days': dict(self.days, failed=self.failed_days),
+                'slowest_days': [
+                    {
+                        'phone_number': event.phone_number,
+                        'query_date': event.query_date,
+                        'seconds': round(event.elapsed, 3),
+                        'pages': event.pages,
+                        'records': event.records,
+                        'failed': event.failed,
+                    }
+                    for _, _, event in sorted(self._slowest, reverse=True)
+                ],
+            }
+
+    def write_json(self, path: str):
+        """
+        把统计数据写入 JSON 文件
+
+        Args:
+            path: 输出文件路径
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    def to_prometheus(self) -> str:
+        """
+        生成 Prometheus 文本格式（text exposition format 0.0.4）
+
+        Returns:
+            指标文本，可写入 node_exporter 的 textfile 目录或推送到 Pushgateway
+        """
+        p = METRIC_PREFIX
+        with self._lock:
+            lines = [
+                f'# HELP {p}_api_calls_total QuerySendDetails 调用次数（含重试）',
+                f'# TYPE {p}_api_calls_total counter',
+            ]
+            lines += [f'{p}_api_calls_total{{outcome="{outcome}"}} {count}' for outcome, count in self.calls.items()]
+            lines += [
+                f'# HELP {p}_api_errors_total 按错误码统计的失败调用次数',
+                f'# TYPE {p}_api_errors_total counter',
+            ]
+            lines += [
+                f'{p}_api_errors_total{{code="{_escape_label(code)}"}} {count}'
+                for code, count in sorted(self.error_codes.items())
+            ]
+            lines += [
+                f'# HELP {p}_retries_total 重试次数',
+                f'# TYPE {p}_retries_total counter',
+                f'{p}_retries_total {self.retries}',
+                f'# HELP {p}_records_total 接口返回的记录数',
+                f'# TYPE {p}_records_total counter',
+                f'{p}_records_total {self.records}',
+                f'# HELP {p}_api_call_duration_seconds QuerySendDetails 调用耗时',
+                f'# TYPE {p}_api_call_duration_seconds histogram',
+            ]
+            lines += self.latency.prometheus_lines(f'{p}_api_call_duration_seconds')
+            lines += [
+                f'# HELP {p}_queue_wait_seconds 请求就绪到开始调用的等待时间（线程池排队和限流）',
+                f'# TYPE {p}_queue_wait_seconds histogram',
+            ]
+            lines += self.queue_wait.prometheus_lines(f'{p}_queue_wait_seconds')
+            lines += [
+                f'# HELP {p}_days_total 完成的 (手机号, 日期) 任务数',
+                f'# TYPE {p}_days_total counter',
+            ]
+            lines += [f'{p}_days_total{{source="{source}"}} {count}' for source, count in self.days.items()]
+            lines += [
+                f'# HELP {p}_failed_days_total 查询失败的日期数',
+                f'# TYPE {p}_failed_days_total counter',
+                f'{p}_failed_days_total {self.failed_days}',
+                f'# HELP {p}_day_duration_seconds 单天查询耗时（仅统计调用接口的日期）',
+                f'# TYPE {p}_day_duration_seconds histogram',
+            ]
+            lines += self.day_duration.prometheus_lines(f'{p}_day_duration_seconds')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str):
+        """
+        把指标写入 Prometheus 文本文件
+
+        Args:
+            path: 输出文件路径
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+
+    def _notify(self, event):
+        """调用已注册的回调，回调出错不影响查询（错误输出到标准错误）"""
+        for callback in self._callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"⚠️  指标回调出错: {e}", file=sys.stderr)
+
+    def __repr__(self):
+        return f"QueryMetrics(calls={sum(self.calls.values())}, records={self.records})"
+
+
+def _summarize(samples: _Samples) -> Dict[str, Optional[float]]:
+    """
+    计算耗时分布
+
+    Args:
+        samples: 耗时样本（秒）
+
+    Returns:
+        平均值、p50、p90、p99 和最大值，没有数据时为 None
+    """
+    if not samples.count:
+        return {'mean': None, 'p50': None, 'p90': None, 'p99': None, 'max': None}
+    ordered = sorted(samples.values)
+    count = len(ordered)
+
+    def percentile(q):
+        return round(ordered[min(count - 1, max(0, math.ceil(q * count) - 1))], 6)
+
+    return {
+        'mean': round(samples.total / samples.count, 6),
+        'p50': percentile(0.50),
+        'p90': percentile(0.90),
+        'p99': percentile(0.99),
+        'max': round(samples.max, 6),
+    }
+
+
+def _escape_label(value: str) -> str:
+    """转义 Prometheus 标签值"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
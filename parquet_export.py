@@ -0,0 +1,135 @@
+"""
+Parquet导出模块
+将短信查询结果导出为列式存储的 Parquet 文件，便于分析系统直接加载
+"""
+from typing import Iterable, Dict, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow 为可选依赖，仅导出 Parquet 时需要
+    pa = pq = None
+
+from sms_record import SMSRecord
+
+
+# 每个行组的记录数，写入时只在内存中保留一个行组
+ROW_GROUP_SIZE = 100000
+
+# 发送时间按北京时间保存
+TIMEZONE = 'Asia/Shanghai'
+
+
+def is_available() -> bool:
+    """是否已安装 pyarrow"""
+    return pa is not None
+
+
+def _schema():
+    """Parquet 文件的列定义"""
+    return pa.schema([
+        ('phone_number', pa.dictionary(pa.int32(), pa.string())),
+        ('send_time', pa.timestamp('s', tz=TIMEZONE)),
+        ('status', pa.dictionary(pa.int32(), pa.string())),
+        ('template_code', pa.dictionary(pa.int32(), pa.string())),
+        ('content', pa.string()),
+    ])
+
+
+def export_to_parquet(
+    data: Iterable[Dict],
+    output_file: str,
+    row_group_size: int = ROW_GROUP_SIZE,
+    compression: Optional[str] = None,
+    compression_level: Optional[int] = None
+) -> int:
+    """
+    导出数据到Parquet文件
+
+    列类型：发送时间为带时区的时间戳（无法解析时为空），手机号、发送状态和
+    模板编号使用字典编码，短信内容为字符串。记录按行组分批写入，
+    内存中最多保留 row_group_size 条记录。没有任何记录时不创建文件。
+
+    Parquet 文件按列块压缩，不再整体压缩；compression 指定列块的压缩编码。
+
+    Args:
+        data: 短信记录列表或迭代器（SMSRecord 或字典）
+        output_file: 输出文件路径
+        row_group_size: 每个行组的记录数
+        compression: 列块压缩编码 gzip 或 zstd，默认为 pyarrow 的默认编码（snappy）
+        compression_level: 压缩级别，默认为编码的默认级别
+
+    Returns:
+        导出的记录数
+
+    Raises:
+        RuntimeError: 未安装 pyarrow
+    """
+    if not is_available():
+        raise RuntimeError("导出 Parquet 格式需要安装 pyarrow: pip install pyarrow")
+
+    schema = _schema()
+    writer_options = {}
+    if compression is not None:
+        writer_options['compression'] = compression
+        writer_options['compression_level'] = compression_level
+    writer = None
+    columns = _empty_columns()
+    count = 0
+
+    try:
+        for record in data:
+            if not isinstance(record, SMSRecord):
+                record = SMSRecord.from_dict(record)
+
+            columns[0].append(record.phone_number)
+            columns[1].append(None if record.raw_send_time or not record.send_ts else record.send_ts)
+            columns[2].append(record.status)
+            columns[3].append(record.template_code)
+            columns[4].append(record.content)
+            count += 1
+
+            if len(columns[0]) >= row_group_size:
+                if writer is None:
+                    writer = pq.ParquetWriter(output_file, schema, **writer_options)
+                writer.write_table(_build_table(columns, schema))
+                columns = _empty_columns()
+
+        if columns[0]:
+            if writer is None:
+                writer = pq.ParquetWriter(output_file, schema, **writer_options)
+            writer.write_table(_build_table(columns, schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if count == 0:
+        print("没有数据可导出")
+        return 0
+
+    print(f"成功导出 {count} 条记录到文件: {output_file}")
+    return count
+
+
+def _empty_columns():
+    """新行组的列缓冲区：手机号、发送时间、状态、模板编号、内容"""
+    return [[], [], [], [], []]
+
+
+def _build_table(columns, schema):
+    """
+    把一个行组的列缓冲区转换为 Arrow 表
+
+    Args:
+        columns: 列缓冲区
+        schema: 表结构
+
+    Returns:
+        pyarrow.Table
+    """
+    arrays = [
+        pa.array(values, type=pa.string()).dictionary_encode()
+        if pa.types.is_dictionary(field.type) else pa.array(values, type=field.type)
+        for values, field in zip(columns, schema)
+    ]
+    return pa.Table.from_arrays(arrays, schema=schema)
@@ -0,0 +1,412 @@
+"""
+性能剖析模块
+按阶段（日期规划、接口调用、响应解析、排序、调度等待、统计、导出）记录墙钟时间和 CPU 时间，
+可选用 cProfile 记录每个阶段耗时最多的函数、用 tracemalloc 记录内存峰值和分配最多的代码行
+"""
+import json
+import os
+import sys
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+# 阶段
+STAGE_PLAN = 'plan'               # 生成 (手机号, 日期) 任务
+STAGE_API = 'api'                 # 接口调用（含限流等待、重试和 SDK 反序列化），在工作线程中
+STAGE_PARSE = 'parse'             # 解析响应为 SMSRecord（含发送时间解析）
+STAGE_SORT = 'sort'               # 合并单天各页并按发送时间排序
+STAGE_WAIT = 'wait'               # 调度循环：提交页请求、等待返回、重排缓冲
+STAGE_STATISTICS = 'statistics'   # 统计发送状态和汇总统计
+STAGE_EXPORT = 'export'           # 格式化并写出输出文件
+
+STAGE_LABELS = {
+    STAGE_PLAN: '日期规划',
+    STAGE_API: '接口调用',
+    STAGE_PARSE: '响应解析',
+    STAGE_SORT: '排序',
+    STAGE_WAIT: '调度等待',
+    STAGE_STATISTICS: '统计',
+    STAGE_EXPORT: '导出',
+}
+
+# 报告中每个阶段保留的函数数和内存分配最多的代码行数
+DEFAULT_TOP = 10
+
+# 内存比上次快照高出该比例时重新拍摄快照，快照次数随峰值按对数增长
+SNAPSHOT_GROWTH = 1.1
+
+
+class _Frame:
+    """线程中正在执行的一个阶段"""
+
+    __slots__ = ('name', 'wall', 'cpu', 'profile')
+
+    def __init__(self, name: str, profile):
+        self.name = name
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        self.profile = profile
+
+
+class StageProfiler:
+    """
+    阶段剖析器
+
+    - stage(名称) 记录代码块的耗时；iterate(名称, 可迭代对象) 记录每次取下一项的耗时，
+      用于流式处理中拉取上游生成器的阶段
+    - 阶段可以嵌套：同一线程中进入内层阶段时外层暂停计时，每个阶段只记录自身的时间，
+      各阶段之和不重复计算
+    - 工作线程中的阶段（接口调用、响应解析）按线程分别计时后累加，墙钟时间之和可能超过总耗时
+    - functions=True 时每个阶段在每个线程中使用单独的 cProfile，报告每个阶段自身耗时最多的函数。
+      Python 3.12 起 cProfile 在整个进程中同时只能启用一个，其他线程同时进入的阶段不记录函数
+    - memory=True 时启用 tracemalloc，记录每个阶段进出时的内存最高值，
+      并在内存创新高时拍摄快照，报告峰值时分配最多的代码行
+
+    多个线程可以同时使用同一个剖析器，所有方法都是线程安全的。
+    """
+
+    def __init__(self, functions: bool = False, memory: bool = False, top: int = DEFAULT_TOP):
+        """
+        初始化剖析器
+
+        Args:
+            functions: 是否用 cProfile 记录每个阶段的函数耗时
+            memory: 是否用 tracemalloc 记录内存
+            top: 报告中每个阶段保留的函数数和分配最多的代码行数
+        """
+        self.functions = functions
+        self.memory = memory
+        self.top = top
+
+        self.calls = {}             # 阶段 -> 次数
+        self.wall = {}              # 阶段 -> 墙钟时间（秒）
+        self.cpu = {}               # 阶段 -> 线程 CPU 时间（秒）
+        self.memory_peak = {}       # 阶段 -> 进出阶段时观测到的最高内存（字节）
+        self.profile_skipped = 0    # cProfile 无法启用而未记录函数的阶段次数
+
+        self._profiles = {}         # (阶段, 线程 ID) -> cProfile.Profile
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._started = None
+        self._cpu_started = None
+        self._elapsed = None
+        self._process_cpu = None
+        self._snapshot = None
+        self._snapshot_size = 0
+        self._peak = 0
+
+    def start(self):
+        """开始剖析（启用 tracemalloc 并记录起始时间）"""
+        if self.memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+        self._started = time.perf_counter()
+        self._cpu_started = time.process_time()
+
+    def stop(self):
+        """结束剖析（停止 tracemalloc，记录总耗时和进程 CPU 时间）"""
+        if self._started is None or self._elapsed is not None:
+            return
+        self._elapsed = time.perf_counter() - self._started
+        self._process_cpu = time.process_time() - self._cpu_started
+        if self.memory:
+            import tracemalloc
+            self._observe_memory()
+            self._peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        记录一个阶段的耗时
+
+        Args:
+            name: 阶段名，见 STAGE_*
+        """
+        self._enter(name)
+        try:
+            yield
+        finally:
+            self._exit()
+
+    def iterate(self, name: str, iterable: Iterable) -> Iterator:
+        """
+        逐项产出 iterable 的元素，取每一项的时间记入阶段 name
+
+        Args:
+            name: 阶段名
+            iterable: 上游可迭代对象（通常是生成器）
+
+        Yields:
+            iterable 的元素
+        """
+        iterator = iter(iterable)
+        while True:
+            self._enter(name)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._exit()
+            yield item
+
+    def _enter(self, name: str):
+        """进入阶段：暂停外层阶段，开始计时"""
+        stack = self._stack()
+        if stack:
+            self._pause(stack[-1])
+        frame = _Frame(name, self._profile(name))
+        stack.append(frame)
+        self._resume(frame)
+
+    def _exit(self):
+        """离开阶段：记录耗时，恢复外层阶段"""
+        stack = self._stack()
+        frame = stack.pop()
+        self._pause(frame, count=True)
+        if stack:
+            self._resume(stack[-1])
+
+    def _stack(self) -> List[_Frame]:
+        """当前线程的阶段栈"""
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _pause(self, frame: _Frame, count: bool = False):
+        """记录阶段从上次开始计时到现在的时间"""
+        if frame.profile is not None:
+            frame.profile.disable()
+        wall = time.perf_counter() - frame.wall
+        cpu = time.thread_time() - frame.cpu
+        if self.memory:
+            self._observe_memory(frame.name)
+        with self._lock:
+            self.wall[frame.name] = self.wall.get(frame.name, 0.0) + wall
+            self.cpu[frame.name] = self.cpu.get(frame.name, 0.0) + cpu
+            if count:
+                self.calls[frame.name] = self.calls.get(frame.name, 0) + 1
+
+    def _resume(self, frame: _Frame):
+        """阶段重新开始计时"""
+        frame.wall = time.perf_counter()
+        frame.cpu = time.thread_time()
+        if frame.profile is not None:
+            try:
+                frame.profile.enable()
+            except ValueError:
+                # 其他线程正在使用 cProfile（Python 3.12 起全进程只能启用一个）
+                frame.profile = None
+                with self._lock:
+                    self.profile_skipped += 1
+
+    def _profile(self, name: str):
+        """当前线程中阶段 name 的 cProfile（未启用时为 None）"""
+        if not self.functions:
+            return None
+        key = (name, threading.get_ident())
+        with self._lock:
+            profile = self._profiles.get(key)
+            if profile is None:
+                import cProfile
+                profile = self._profiles[key] = cProfile.Profile()
+        return profile
+
+    def _observe_memory(self, name: str = None):
+        """记录当前内存，创新高时拍摄快照"""
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        take_snapshot = False
+        with self._lock:
+            if name is not None and current > self.memory_peak.get(name, 0):
+                self.memory_peak[name] = current
+            if current > self._snapshot_size * SNAPSHOT_GROWTH:
+                self._snapshot_size = current
+                take_snapshot = True
+        if take_snapshot:
+            snapshot = tracemalloc.take_snapshot()
+            with self._lock:
+                self._snapshot = snapshot
+
+    def to_dict(self) -> Dict:
+        """剖析结果"""
+        with self._lock:
+            stages = []
+            for name in sorted(self.wall, key=lambda stage: -self.wall[stage]):
+                stage = {
+                    'stage': name,
+                    'calls': self.calls.get(name, 0),
+                    'wall_seconds': round(self.wall[name], 4),
+                    'cpu_seconds': round(self.cpu[name], 4),
+                }
+                if self.memory:
+                    stage['memory_peak_bytes'] = self.memory_peak.get(name, 0)
+                if self.functions:
+                    stage['top_functions'] = self._top_functions(name)
+                stages.append(stage)
+            result = {
+                'elapsed_seconds': round(self._elapsed, 4) if self._elapsed is not None else None,
+                'process_cpu_seconds': round(self._process_cpu, 4) if self._process_cpu is not None else None,
+                'stages': stages,
+            }
+            if self.functions:
+                result['profile_skipped'] = self.profile_skipped
+            if self.memory:
+                result['memory_peak_bytes'] = self._peak
+                result['top_allocations'] = self._top_allocations()
+        return result
+
+    def _top_functions(self, name: str) -> List[Dict]:
+        """阶段 name 自身耗时最多的函数（调用方需持有锁）"""
+        profiles = [profile for (stage, _), profile in self._profiles.items() if stage == name]
+        if not profiles:
+            return []
+        import pstats
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        # 不列出剖析器自身的计时代码
+        rows = sorted(
+            (item for item in stats.stats.items() if item[0][0] != _THIS_FILE),
+            key=lambda item: -item[1][2]
+        )[:self.top]
+        return [
+            {
+                'function': _format_function(function),
+                'calls': calls,
+                'self_seconds': round(total_time, 4),
+                'cumulative_seconds': round(cumulative_time, 4),
+            }
+            for function, (_, calls, total_time, cumulative_time, _) in rows
+        ]
+
+    def _top_allocations(self) -> List[Dict]:
+        """内存最高时分配最多的代码行（调用方需持有锁）"""
+        if self._snapshot is None:
+            return []
+        return [
+            {
+                'location': f"{_short_path(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                'bytes': stat.size,
+                'blocks': stat.count,
+            }
+            for stat in self._snapshot.statistics('lineno')[:self.top]
+        ]
+
+    def write_json(self, path: str):
+        """
+        把剖析结果写入 JSON 文件
+
+        Args:
+            path: 输出文件路径
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    def format_text(self, functions_per_stage: int = 5) -> str:
+        """
+        生成文本报告
+
+        Args:
+            functions_per_stage: 每个阶段显示的函数数
+
+        Returns:
+            多行文本
+        """
+        result = self.to_dict()
+        lines = []
+        if result['elapsed_seconds'] is not None:
+            lines.append(
+                f"  总耗时 {result['elapsed_seconds']:.2f}s，进程 CPU {result['process_cpu_seconds']:.2f}s"
+                "（工作线程的阶段按线程累加，可能超过总耗时）"
+            )
+        columns = ['阶段', '次数', '墙钟时间', 'CPU 时间'] + (['内存最高'] if self.memory else [])
+        rows = []
+        for stage in result['stages']:
+            row = [
+                STAGE_LABELS.get(stage['stage'], stage['stage']),
+                str(stage['calls']),
+                f"{stage['wall_seconds']:.3f}s",
+                f"{stage['cpu_seconds']:.3f}s",
+            ]
+            if self.memory:
+                row.append(_format_bytes(stage['memory_peak_bytes']))
+            rows.append(row)
+        widths = [max(_display_width(row[index]) for row in [columns] + rows) for index in range(len(columns))]
+        for row in [columns] + rows:
+            cells = [_pad(row[0], widths[0])] + [
+                _pad(cell, width, right=True) for cell, width in zip(row[1:], widths[1:])
+            ]
+            lines.append('  ' + '  '.join(cells))
+
+        if self.functions:
+            for stage in result['stages']:
+                if not stage['top_functions']:
+                    continue
+                label = STAGE_LABELS.get(stage['stage'], stage['stage'])
+                lines.append(f"\n  {label} 自身耗时最多的函数:")
+                for row in stage['top_functions'][:functions_per_stage]:
+                    lines.append(
+                        f"    {row['self_seconds']:>8.3f}s {row['calls']:>9} 次  {row['function']}"
+                    )
+            if result['profile_skipped']:
+                lines.append(f"\n  有 {result['profile_skipped']} 次阶段因 cProfile 已在其他线程启用而未记录函数")
+
+        if self.memory:
+            lines.append(f"\n  内存峰值: {_format_bytes(result['memory_peak_bytes'])}（tracemalloc 跟踪的分配）")
+            if result['top_allocations']:
+                lines.append("  内存最高时分配最多的代码行:")
+                for row in result['top_allocations'][:functions_per_stage]:
+                    lines.append(f"    {_format_bytes(row['bytes']):>10} {row['blocks']:>9} 块  {row['location']}")
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return f"StageProfiler(stages={len(self.wall)}, functions={self.functions}, memory={self.memory})"
+
+
+_THIS_FILE = os.path.abspath(__file__)
+
+
+def _display_width(text: str) -> int:
+    """文本在终端中的显示宽度（中文等全角字符占两列）"""
+    return sum(2 if unicodedata.east_asian_width(char) in 'WF' else 1 for char in text)
+
+
+def _pad(text: str, width: int, right: bool = False) -> str:
+    """按显示宽度补齐空格，right=True 时右对齐"""
+    padding = ' ' * max(0, width - _display_width(text))
+    return padding + text if right else text + padding
+
+
+def _format_function(function) -> str:
+    """把 pstats 的 (文件, 行号, 函数名) 格式化为 文件:行号(函数名)"""
+    filename, lineno, name = function
+    if filename == '~':
+        return name     # 内置函数，如 <method 'sort' of 'list' objects>
+    return f"{_short_path(filename)}:{lineno}({name})"
+
+
+def _short_path(filename: str) -> str:
+    """去掉 sys.path 中的目录前缀，缩短报告中的文件路径"""
+    best = filename
+    for prefix in sys.path:
+        if prefix and filename.startswith(prefix) and len(filename) - len(prefix) < len(best):
+            best = filename[len(prefix):].lstrip('/\\')
+    return best
+
+
+def _format_bytes(size: Optional[int]) -> str:
+    """把字节数格式化为 KB / MB"""
+    if size is None:
+        return '-'
+    if size >= 1024 * 1024:
+        return f"{size / 1024 / 1024:.1f} MB"
+    return f"{size / 1024:.1f} KB"
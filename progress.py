@@ -0,0 +1,346 @@
+"""
+进度显示模块
+查询线程只把进度事件放入队列，由单独的渲染线程输出，查询线程不会因终端输出而阻塞
+"""
+import json
+import queue
+import sys
+import threading
+import time
+from typing import Dict
+
+from metrics import SOURCE_CACHE, SOURCE_JOURNAL
+
+# 进度事件类型
+EVENT_PLAN = 'plan'        # 查询计划：phones, days, tasks, start_date, end_date, workers, shard
+EVENT_PAGES = 'pages'      # 某天需要分页：phone_number, query_date, total_count, remaining_pages
+EVENT_DAY = 'day'          # 某天完成：completed, total, phone_number, query_date, records, source, error
+EVENT_FINISH = 'finish'    # 查询结束：phones, records, failed_days, incomplete_days, cancelled
+
+# 进度信息中的结果来源（调用接口的日期不显示）
+SOURCE_LABELS = {
+    SOURCE_JOURNAL: '断点',
+    SOURCE_CACHE: '缓存',
+}
+
+# 查询取消的原因（与 cancellation.REASON_* 一致，cancellation 在需要时才导入）
+CANCEL_LABELS = {
+    'deadline': '已到达截止时间',
+    'interrupt': '用户中断',
+}
+
+# 进度条的最短刷新间隔（秒）
+BAR_REFRESH_INTERVAL = 0.1
+
+# 进度条宽度（字符）
+BAR_WIDTH = 30
+
+_STOP = object()
+
+
+class ProgressReporter:
+    """
+    进度显示基类
+
+    emit() 只把事件放入无界队列，立即返回；渲染线程在第一次 emit 时启动，
+    按顺序调用 render() 输出。flush() 等待已放入的事件全部输出，
+    在打印其他信息之前调用可避免输出交错。
+    """
+
+    def __init__(self, stream=None):
+        """
+        初始化进度显示
+
+        Args:
+            stream: 输出流，默认为 sys.stdout
+        """
+        self.stream = stream if stream is not None else sys.stdout
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def emit(self, kind: str, **fields):
+        """
+        提交一个进度事件（不阻塞）
+
+        Args:
+            kind: 事件类型，EVENT_*
+            **fields: 事件字段
+        """
+        if self._thread is None:
+            self._start()
+        self._queue.put((time.time(), kind, fields))
+
+    def flush(self):
+        """等待已提交的事件全部输出"""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self):
+        """输出剩余事件并停止渲染线程"""
+        with self._thread_lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def render(self, timestamp: float, kind: str, fields: Dict):
+        """
+        输出一个事件（在渲染线程中调用，子类实现）
+
+        Args:
+            timestamp: 事件提交的时间（time.time）
+            kind: 事件类型
+            fields: 事件字段
+        """
+        raise NotImplementedError
+
+    def render_flush(self):
+        """flush() 时在渲染线程中调用，子类可在此输出缓冲的内容"""
+        self.stream.flush()
+
+    def _start(self):
+        """启动渲染线程"""
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='sms-progress', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        """渲染线程主循环"""
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self.render_flush()
+                return
+            if isinstance(item, threading.Event):
+                self.render_flush()
+                item.set()
+                continue
+            try:
+                self.render(*item)
+            except Exception as e:
+                # 输出失败（如管道已关闭）不影响查询
+                print(f"⚠️  进度输出出错: {e}", file=sys.stderr)
+
+
+class LineProgress(ProgressReporter):
+    """逐行输出每个日期的查询结果（默认）"""
+
+    def __init__(self, stream=None):
+        super().__init__(stream)
+        self._show_phone = False
+
+    def render(self, timestamp, kind, fields):
+        write = self.stream.write
+        if kind == EVENT_PLAN:
+            self._show_phone = fields['phones'] > 1
+            write(_plan_text(fields))
+        elif kind == EVENT_PAGES:
+            label = self._label(fields)
+            write(f"    {label} 共 {fields['total_count']} 条记录，并发获取剩余 {fields['remaining_pages']} 页...\n")
+        elif kind == EVENT_DAY:
+            write(_day_text(fields, self._label(fields)) + '\n')
+        elif kind == EVENT_FINISH:
+            write(_finish_text(fields))
+
+    def _label(self, fields) -> str:
+        """进度信息中的日期标签"""
+        if self._show_phone:
+            return f"{fields['phone_number']} {fields['query_date']}"
+        return fields['query_date']
+
+
+class BarProgress(ProgressReporter):
+    """
+    单行进度条
+
+    最多每 BAR_REFRESH_INTERVAL 秒重绘一次，查询失败的日期单独输出一行，
+    其余日期只更新进度条。
+    """
+
+    def __init__(self, stream=None, refresh_interval: float = BAR_REFRESH_INTERVAL):
+        super().__init__(stream)
+        self.refresh_interval = refresh_interval
+        self._reset()
+
+    def render(self, timestamp, kind, fields):
+        if kind == EVENT_PLAN:
+            self._reset()
+            self.stream.write(_plan_text(fields))
+            self._total = fields['tasks']
+            self._started = timestamp
+        elif kind == EVENT_DAY:
+            self._completed = fields['completed']
+            self._total = fields['total']
+            self._records += fields['records']
+            if fields['error'] is not None:
+                self._failed += 1
+                label = f"{fields['phone_number']} {fields['query_date']}"
+                self._clear()
+                self.stream.write(_day_text(fields, label) + '\n')
+                self._draw()
+            elif timestamp - self._drawn_at >= self.refresh_interval:
+                self._draw()
+                self._drawn_at = timestamp
+        elif kind == EVENT_FINISH:
+            self._draw()
+            self.stream.write('\n')
+            self._line_width = 0
+            self.stream.write(_finish_text(fields))
+
+    def render_flush(self):
+        if self._line_width:
+            self._draw()
+        super().render_flush()
+
+    def _reset(self):
+        """开始新的查询"""
+        self._completed = 0
+        self._total = 0
+        self._records = 0
+        self._failed = 0
+        self._started = time.time()
+        self._drawn_at = 0.0
+        self._line_width = 0
+
+    def _draw(self):
+        """重绘进度条"""
+        total = max(self._total, 1)
+        ratio = min(1.0, self._completed / total)
+        filled = int(BAR_WIDTH * ratio)
+        elapsed = time.time() - self._started
+        if self._completed and self._completed < self._total:
+            eta = _format_seconds(elapsed / self._completed * (self._total - self._completed))
+        else:
+            eta = '--:--:--'
+        line = (
+            f"[{'█' * filled}{'-' * (BAR_WIDTH - filled)}] "
+            f"{self._completed}/{self._total} 天 {ratio * 100:5.1f}%  "
+            f"{self._records} 条记录  失败 {self._failed}  "
+            f"用时 {_format_seconds(elapsed)}  剩余 {eta}"
+        )
+        self._clear()
+        self.stream.write(line)
+        self.stream.flush()
+        self._line_width = len(line)
+
+    def _clear(self):
+        """清除当前的进度条"""
+        if self._line_width:
+            self.stream.write('\r' + ' ' * (self._line_width * 2) + '\r')
+            self._line_width = 0
+
+
+class JsonProgress(ProgressReporter):
+    """
+    JSON Lines 事件流，供任务调度系统解析
+
+    每个事件一行：{"event": 类型, "time": 时间戳, ...事件字段}
+    """
+
+    def render(self, timestamp, kind, fields):
+        event = {'event': kind, 'time': round(timestamp, 3)}
+        event.update(fields)
+        self.stream.write(json.dumps(event, ensure_ascii=False) + '\n')
+
+    def render_flush(self):
+        self.stream.flush()
+
+
+class QuietProgress(ProgressReporter):
+    """不输出任何进度信息"""
+
+    def emit(self, kind, **fields):
+        pass
+
+    def render(self, timestamp, kind, fields):
+        pass
+
+
+# --progress 可选的显示方式
+PROGRESS_MODES = {
+    'lines': LineProgress,
+    'bar': BarProgress,
+    'json': JsonProgress,
+    'none': QuietProgress,
+}
+
+
+def create_progress(mode: str = 'lines', stream=None) -> ProgressReporter:
+    """
+    按名称创建进度显示
+
+    Args:
+        mode: lines / bar / json / none，auto 表示终端中使用进度条、否则逐行输出
+        stream: 输出流，默认为 sys.stdout
+
+    Returns:
+        进度显示对象
+    """
+    if mode == 'auto':
+        target = stream if stream is not None else sys.stdout
+        mode = 'bar' if target.isatty() else 'lines'
+    return PROGRESS_MODES[mode](stream)
+
+
+def _plan_text(fields) -> str:
+    """查询计划的文本"""
+    start_date, end_date = fields['start_date'], fields['end_date']
+    if fields['phones'] == 1:
+        lines = [
+            f"正在查询手机号 {fields['phone_number']} 从 {start_date} 到 {end_date} 的短信记录...",
+            f"共需查询 {fields['days']} 天的数据",
+        ]
+    else:
+        lines = [
+            f"正在批量查询 {fields['phones']} 个手机号从 {start_date} 到 {end_date} 的短信记录...",
+            f"共需查询 {fields['phones']} 个手机号 × {fields['days']} 天 = {fields['phones'] * fields['days']} 个任务",
+        ]
+    if fields.get('shard'):
+        lines.append(f"分片 {fields['shard']}：本机查询其中 {fields['tasks']} 个任务")
+    lines.append(f"使用 {fields['workers']} 个并发线程加速查询...\n")
+    return '\n'.join(lines) + '\n'
+
+
+def _day_text(fields, label: str) -> str:
+    """单个日期结果的文本"""
+    prefix = f"[{fields['completed']}/{fields['total']}]"
+    if fields['error'] is not None:
+        return f"{prefix} ✗ {label} 查询失败: {fields['error']}"
+    source = SOURCE_LABELS.get(fields['source'])
+    suffix = f"（{source}）" if source else ''
+    if fields['records']:
+        return f"{prefix} ✓ {label} 找到 {fields['records']} 条记录{suffix}"
+    return f"{prefix} - {label} 无记录{suffix}"
+
+
+def _finish_text(fields) -> str:
+    """查询结束的文本"""
+    text = ''
+    if fields['failed_days']:
+        text += f"\n⚠️  {fields['failed_days']} 个日期查询失败，结果不完整\n"
+    if fields.get('incomplete_days'):
+        label = CANCEL_LABELS.get(fields.get('cancelled'), '查询已取消')
+        text += f"\n⚠️  {label}，{fields['incomplete_days']} 个日期未完成，结果不完整\n"
+    if fields['phones'] > 1:
+        text += f"\n查询完成，{fields['phones']} 个手机号共获取 {fields['records']} 条记录\n"
+    else:
+        text += f"\n查询完成，共获取 {fields['records']} 条记录\n"
+    return text
+
+
+def _format_seconds(seconds: float) -> str:
+    """格式化为 HH:MM:SS"""
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
@@ -0,0 +1,190 @@
+"""
+自适应限流模块
+令牌桶限制请求速率，并按 AIMD（加性增、乘性减）策略动态调整速率和并发数
+"""
+import random
+import threading
+import time
+
+
+# 阿里云返回的限流错误码
+THROTTLING_CODES = frozenset({
+    'Throttling',
+    'Throttling.User',
+    'Throttling.Api',
+    'Throttling.Concurrency',
+    'isv.BUSINESS_LIMIT_CONTROL',
+    'ServiceUnavailable',
+})
+
+# release() 的调用结果
+SUCCESS = 'success'
+THROTTLED = 'throttled'
+ERROR = 'error'
+CANCELLED = 'cancelled'   # 查询已取消，槽位未使用或调用被放弃，不调整速率
+
+# try_acquire() 没有空闲并发槽位时建议的轮询间隔（秒）
+SLOT_POLL_INTERVAL = 0.01
+
+
+def is_throttling_code(code) -> bool:
+    """
+    判断错误码是否表示限流
+
+    Args:
+        code: 接口返回的错误码
+
+    Returns:
+        是否为限流错误
+    """
+    if not code:
+        return False
+    code = str(code)
+    return code in THROTTLING_CODES or code.startswith('Throttling')
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 10.0) -> float:
+    """
+    计算带随机抖动的指数退避时间（full jitter）
+
+    Args:
+        attempt: 第几次重试，从0开始
+        base: 基础等待秒数
+        cap: 最长等待秒数
+
+    Returns:
+        本次需要等待的秒数
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class AdaptiveRateLimiter:
+    """
+    自适应限流器
+
+    每次调用接口前 acquire()，调用结束后 release(结果)：
+    - 令牌桶限制每秒请求数，并发槽位限制同时进行的请求数
+    - 调用成功时缓慢提高速率和并发数（加性增）
+    - 遇到限流时将速率和并发数减半（乘性减），冷却期内只减一次
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 10,
+        max_rate: float = 50.0,
+        min_rate: float = 1.0,
+        increase_step: float = 1.0,
+        decrease_factor: float = 0.5,
+        cooldown: float = 1.0
+    ):
+        """
+        初始化限流器
+
+        Args:
+            max_concurrency: 并发数上限
+            max_rate: 每秒请求数上限，同时也是令牌桶容量
+            min_rate: 每秒请求数下限
+            increase_step: 每轮成功调用后速率的增量（请求/秒）
+            decrease_factor: 限流时速率和并发数的缩减系数
+            cooldown: 两次缩减之间的最短间隔（秒）
+        """
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_rate = float(max_rate)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+
+        self._concurrency = float(self.max_concurrency)
+        self._rate = self.max_rate
+        self._tokens = self.max_rate
+        self._in_use = 0
+        self._last_refill = time.monotonic()
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+        self.throttled_count = 0
+
+    @property
+    def rate(self) -> float:
+        """当前每秒请求数"""
+        return self._rate
+
+    @property
+    def concurrency(self) -> int:
+        """当前允许的并发数"""
+        return int(self._concurrency)
+
+    def acquire(self):
+        """获取一个令牌和一个并发槽位，必要时阻塞等待"""
+        with self._cond:
+            while True:
+                delay = self._try_acquire()
+                if delay == 0:
+                    return
+                self._cond.wait(delay)
+
+    def try_acquire(self) -> float:
+        """
+        尝试获取一个令牌和一个并发槽位，不阻塞（供 asyncio 引擎使用）
+
+        Returns:
+            0 表示已获取；否则为建议等待的秒数，等待后再重试
+        """
+        with self._cond:
+            delay = self._try_acquire()
+        return SLOT_POLL_INTERVAL if delay is None else delay
+
+    def _try_acquire(self):
+        """
+        尝试获取令牌和并发槽位（调用方需持有锁）
+
+        Returns:
+            0 表示已获取；没有空闲槽位时返回 None；
+            否则返回令牌补充所需的秒数
+        """
+        self._refill()
+        if self._in_use >= int(self._concurrency):
+            return None
+        if self._tokens >= 1:
+            self._tokens -= 1
+            self._in_use += 1
+            return 0
+        return (1 - self._tokens) / self._rate
+
+    def release(self, outcome: str = SUCCESS):
+        """
+        归还并发槽位，并根据调用结果调整速率和并发数
+
+        Args:
+            outcome: SUCCESS / THROTTLED / ERROR / CANCELLED
+        """
+        with self._cond:
+            self._in_use -= 1
+
+            if outcome == SUCCESS:
+                window = max(1.0, self._concurrency)
+                self._concurrency = min(self.max_concurrency, self._concurrency + 1.0 / window)
+                self._rate = min(self.max_rate, self._rate + self.increase_step / window)
+            elif outcome == THROTTLED:
+                self.throttled_count += 1
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self._last_decrease = now
+                    self._concurrency = max(1.0, self._concurrency * self.decrease_factor)
+                    self._rate = max(self.min_rate, self._rate * self.decrease_factor)
+
+            self._cond.notify_all()
+
+    def _refill(self):
+        """按当前速率补充令牌（调用方需持有锁）"""
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._tokens = min(self._rate, self._tokens + elapsed * self._rate)
+
+    def __repr__(self):
+        return (
+            f"AdaptiveRateLimiter(rate={self._rate:.1f}/s, "
+            f"concurrency={int(self._concurrency)}/{self.max_concurrency})"
+        )
@@ -0,0 +1,141 @@
+"""
+查询结果缓存模块
+以 (手机号, 日期) 为键，把已结算日期的查询结果保存在本地 SQLite 数据库中
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sms_record import SMSRecord, STATUS_WAITING
+
+
+class ResultCache:
+    """
+    单天查询结果缓存
+
+    只有同时满足以下条件的日期才会写入和读取缓存：
+    - 距今天已超过 min_age_days 天（今天和最近几天总是重新查询）
+    - 当天所有记录都已有最终状态（没有"等待回执"，之后仍可能变化）
+
+    记录以字段列表的形式保存为 JSON。
+    """
+
+    DB_NAME = 'sms_cache.sqlite3'
+
+    def __init__(self, cache_dir: str, min_age_days: int = 3):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存目录，不存在时自动创建
+            min_age_days: 日期距今至少多少天才视为已结算，默认3天
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, self.DB_NAME)
+        self.min_age_days = min_age_days
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS day_results ('
+            ' phone_number TEXT NOT NULL,'
+            ' send_date TEXT NOT NULL,'
+            ' records TEXT NOT NULL,'
+            ' fetched_at TEXT NOT NULL,'
+            ' PRIMARY KEY (phone_number, send_date))'
+        )
+        self._conn.commit()
+
+    def is_settled_date(self, query_date: str) -> bool:
+        """
+        判断日期是否已足够久远，可以使用缓存
+
+        Args:
+            query_date: 日期 YYYYMMDD
+
+        Returns:
+            是否已超过最小天数
+        """
+        cutoff = (datetime.now() - timedelta(days=self.min_age_days)).strftime('%Y%m%d')
+        return query_date <= cutoff
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        """(手机号, 日期) 是否可以从缓存读取（不计入命中统计）"""
+        phone_number, query_date = key
+        if not self.is_settled_date(query_date):
+            return False
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT 1 FROM day_results WHERE phone_number = ? AND send_date = ?',
+                (phone_number, query_date)
+            ).fetchone()
+        return row is not None
+
+    def get(self, phone_number: str, query_date: str) -> Optional[List[SMSRecord]]:
+        """
+        读取缓存的单天记录
+
+        Args:
+            phone_number: 手机号码
+            query_date: 日期 YYYYMMDD
+
+        Returns:
+            缓存的记录列表；日期未结算或没有缓存时返回 None
+        """
+        row = None
+        if self.is_settled_date(query_date):
+            with self._lock:
+                row = self._conn.execute(
+                    'SELECT records FROM day_results WHERE phone_number = ? AND send_date = ?',
+                    (phone_number, query_date)
+                ).fetchone()
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return [SMSRecord(*item) for item in json.loads(row[0])]
+
+    def put(self, phone_number: str, query_date: str, records: List[SMSRecord]) -> bool:
+        """
+        写入单天记录（仅当日期已结算时）
+
+        Args:
+            phone_number: 手机号码
+            query_date: 日期 YYYYMMDD
+            records: 当天完整的记录列表
+
+        Returns:
+            是否写入了缓存
+        """
+        if not self.is_settled_date(query_date):
+            return False
+        if any(record.status_code == STATUS_WAITING for record in records):
+            return False
+
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO day_results VALUES (?, ?, ?, ?)',
+                (
+                    phone_number,
+                    query_date,
+                    json.dumps(records, ensure_ascii=False, separators=(',', ':')),
+                    datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                )
+            )
+            self._conn.commit()
+        return True
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def __repr__(self):
+        return f"ResultCache(path={self.path}, hits={self.hits}, misses={self.misses})"
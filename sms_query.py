@@ -2,49 +2,736 @@
 阿里云短信查询模块
 调用阿里云短信API查询发送明细
 """
+from collections import deque
+from contextlib import nullcontext
 from datetime import datetime, timedelta
-from typing import List, Dict
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import heapq
+import math
+import time
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import threading
-from alibabacloud_dysmsapi20170525.client import Client as Dysmsapi20170525Client
-from alibabacloud_tea_openapi import models as open_api_models
-from alibabacloud_dysmsapi20170525 import models as dysmsapi_20170525_models
-from alibabacloud_tea_util import models as util_models
+import zlib
 
-from config import Config
+# 阿里云 SDK（及其依赖的 aiohttp、requests 等）导入需要数百毫秒，
+# 在创建客户端和构造请求时才导入，--help 和参数校验不受影响
+from config import Config, Credential
+from credential_pool import CredentialPool, PooledCredential
+from result_cache import ResultCache
+from checkpoint import CheckpointJournal
+from progress import ProgressReporter, LineProgress, EVENT_PLAN, EVENT_PAGES, EVENT_DAY, EVENT_FINISH
+from metrics import (
+    QueryMetrics,
+    CallEvent,
+    DayEvent,
+    OUTCOME_OK,
+    OUTCOME_THROTTLED,
+    OUTCOME_ERROR,
+    SOURCE_API,
+    SOURCE_CACHE,
+    SOURCE_JOURNAL,
+)
+from sms_record import SMSRecord, parse_send_time
+from hedging import HedgePolicy
+from cancellation import CancelToken, QueryCancelled
+from profiling import StageProfiler, STAGE_PLAN, STAGE_API, STAGE_PARSE, STAGE_SORT, STAGE_WAIT
+from cost_model import (
+    PageHistory,
+    SCHEDULE_CALENDAR,
+    SCHEDULE_RECENT,
+    SCHEDULE_POLICIES,
+    task_priorities,
+    estimate_makespan,
+)
+from rate_limiter import (
+    backoff_delay,
+    is_throttling_code,
+    SUCCESS,
+    THROTTLED,
+    ERROR,
+    CANCELLED,
+)
+
+
+# 未启用阶段剖析时使用的空上下文
+_NO_STAGE = nullcontext()
+
+
+def in_shard(phone_number: str, query_date: str, index: int, count: int) -> bool:
+    """
+    判断 (手机号, 日期) 是否属于某个分片
+    
+    按 CRC32 哈希分配，与号码顺序、日期范围和运行的机器无关，
+    同样的参数在任何机器上都得到同样的划分；N 个分片恰好覆盖全部任务且互不重叠。
+    
+    Args:
+        phone_number: 手机号码
+        query_date: 日期 YYYYMMDD
+        index: 分片序号，从1开始
+        count: 分片总数
+        
+    Returns:
+        是否属于该分片
+    """
+    return zlib.crc32(f'{phone_number}:{query_date}'.encode('utf-8')) % count == index - 1
+
+
+class SMSQueryError(Exception):
+    """短信查询失败（不可重试的错误，或重试次数已用尽）"""
+
+
+class _DayTask:
+    """单天查询任务的分页状态（仅在调度线程中访问）"""
+    
+    def __init__(self, phone_number: str, query_date: str, index: int = 0):
+        self.phone_number = phone_number
+        self.query_date = query_date
+        self.index = index       # 在任务列表中的序号
+        self.pages = {}          # 页码 -> 当页记录
+        self.scheduled = 1       # 已调度的最大页码
+        self.outstanding = 1     # 尚未完成的页请求数
+        self.error = None
+        self.started = time.perf_counter()
+    
+    def schedule_after(
+        self,
+        page: int,
+        record_count: int,
+        total_count: Optional[int],
+        page_size: int
+    ) -> List[int]:
+        """
+        根据某一页的结果确定需要继续调度的页码
+        
+        第1页返回 TotalCount 时一次性调度剩余所有页；
+        最后一个已调度页仍是满页且总数未知或大于已调度范围（当天仍有新记录）时，
+        继续调度下一页。
+        
+        Returns:
+            新调度的页码列表
+        """
+        next_pages = []
+        if page == 1 and total_count is not None:
+            last_page = max(1, -(-total_count // page_size))
+            next_pages = list(range(2, last_page + 1))
+            self.scheduled = last_page
+        
+        if (page == self.scheduled and record_count >= page_size
+                and (total_count is None or page * page_size < total_count)):
+            next_pages.append(page + 1)
+            self.scheduled = page + 1
+        
+        self.outstanding += len(next_pages)
+        return next_pages
+    
+    def records(self) -> List[SMSRecord]:
+        """按页码顺序合并当天的记录"""
+        day_records = []
+        for page in sorted(self.pages):
+            day_records.extend(self.pages[page])
+        return day_records
+
+
+class _DayScheduler:
+    """
+    (手机号, 日期) 任务的调度状态，线程池引擎和 asyncio 引擎共用
+    
+    调度的最小单位是"页"：每天先查询第1页，再根据返回的 TotalCount
+    一次性调度剩余页并发获取；未返回 TotalCount 时逐页向后查询。
+    同一时刻最多有 max_workers 个页请求在执行，已开始的日期优先。
+    指定 priorities 时按优先级（越小越先）开始新的日期，否则按 tasks 的顺序，见 cost_model。
+    启用缓存时，已结算日期直接从缓存读取，查询完成的日期写回缓存；
+    启用断点日志时，日志中已有的日期直接读取，每完成一天立即追加到日志。
+    
+    include_failed 为 True 时查询失败的日期也会产出，记录列表为 None。
+    
+    ordered 为 True 时按 tasks 的顺序产出：先完成的日期暂存在重排缓冲区中，
+    且只有与最早未产出日期相距不足 reorder_window 个任务的日期才会开始查询，
+    因此缓冲区最多保存 reorder_window 天的记录。
+    
+    查询被取消时调用 abandon()：未开始和未查询完的日期记为未完成（incomplete_days），
+    重排缓冲区中已完成的日期照常产出，调用方得到除未完成日期以外的全部结果。
+    
+    只负责调度决策，不执行请求；仅在调度线程（或事件循环）中访问。
+    """
+    
+    def __init__(
+        self,
+        client: 'SMSQueryClient',
+        tasks: List[Tuple[str, str]],
+        page_size: int,
+        max_workers: int,
+        ordered: bool = False,
+        reorder_window: int = None,
+        include_failed: bool = False,
+        priorities: List = None
+    ):
+        self.client = client
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.include_failed = include_failed
+        self.ordered = ordered
+        self.reorder_window = max_workers * 4 if reorder_window is None else reorder_window
+        self.priorities = priorities
+        self.waiting = deque(enumerate(tasks))   # 尚未开始的日期（按任务顺序）
+        self.ready = []                          # 指定优先级时：可以开始的日期（堆）
+        self.pending = deque()                   # 待提交的页请求
+        self.in_flight = 0                       # 执行中的页请求数
+        self.reorder_buffer = {}                 # 任务序号 -> 当天记录（失败为 None）
+        self.active = {}                         # 任务序号 -> 已开始但未完成的日期
+        self.next_index = 0                      # 下一个要产出的任务序号
+        self.completed_count = 0
+        self.total_count = len(tasks)
+        self.failed_days = []
+        self.incomplete_days = []
+        self.api_pages = 0                       # 从接口获取的页数
+        self.started = time.perf_counter()
+        self.elapsed = None
+    
+    def has_work(self) -> bool:
+        """是否还有未完成的任务"""
+        return bool(self.waiting or self.ready or self.pending or self.in_flight)
+    
+    def start_days(self) -> List[Tuple[str, str, List[SMSRecord]]]:
+        """
+        开始新的日期（有序模式下受重排窗口限制），缓存命中的日期直接完成
+        
+        Returns:
+            可以立即产出的日期列表
+        """
+        ready = []
+        while len(self.pending) + self.in_flight < self.max_workers:
+            item = self._take_waiting()
+            if item is None:
+                break
+            index, (phone_number, query_date) = item
+            
+            source, cached_records = self._lookup(phone_number, query_date)
+            if cached_records is None:
+                day = self.active[index] = _DayTask(phone_number, query_date, index)
+                self.pending.append((day, 1))
+                continue
+            
+            self.completed_count += 1
+            self._report_day(phone_number, query_date, len(cached_records), source)
+            if self.client.metrics:
+                self.client.metrics.record_day(DayEvent(
+                    phone_number, query_date, source, False, 0, len(cached_records), 0.0
+                ))
+            ready.extend(self._finish_day(index, phone_number, query_date, cached_records))
+        return ready
+    
+    def take_requests(self) -> List[Tuple[_DayTask, int]]:
+        """
+        取出可以立即提交的页请求，保持不超过并发上限
+        
+        Returns:
+            (日期任务, 页码) 列表，调用方提交后须对每一项调用 complete()
+        """
+        requests = []
+        while self.pending and self.in_flight < self.max_workers:
+            requests.append(self.pending.popleft())
+            self.in_flight += 1
+        return requests
+    
+    def complete(
+        self,
+        day: _DayTask,
+        page: int,
+        result: Optional[Tuple[List[SMSRecord], Optional[int]]],
+        error: Exception = None
+    ) -> List[Tuple[str, str, List[SMSRecord]]]:
+        """
+        处理一个完成的页请求
+        
+        Args:
+            day: 日期任务
+            page: 页码
+            result: _fetch_page 的返回值，出错时为 None
+            error: 请求抛出的异常
+            
+        Returns:
+            可以立即产出的日期列表
+        """
+        self.in_flight -= 1
+        self.api_pages += 1
+        day.outstanding -= 1
+        
+        if error is not None:
+            day.error = error
+            records, reported_total = [], None
+        else:
+            records, reported_total = result
+        
+        day.pages[page] = records
+        
+        if day.error is None:
+            next_pages = day.schedule_after(page, len(records), reported_total, self.page_size)
+            if len(next_pages) > 1:
+                self.client.progress.emit(
+                    EVENT_PAGES,
+                    phone_number=day.phone_number,
+                    query_date=day.query_date,
+                    total_count=reported_total,
+                    remaining_pages=len(next_pages)
+                )
+            # 已开始的日期优先，尽快完成
+            for next_page in reversed(next_pages):
+                self.pending.appendleft((day, next_page))
+        
+        if day.outstanding > 0:
+            return []
+        
+        del self.active[day.index]
+        self.completed_count += 1
+        with self.client._stage(STAGE_SORT):
+            day_records = day.records()
+            day_records.sort(key=lambda x: x.send_ts)
+        
+        if day.error is not None:
+            self.failed_days.append((day.phone_number, day.query_date))
+            self._report_day(day.phone_number, day.query_date, 0, SOURCE_API, str(day.error))
+            day_records = None
+        else:
+            if self.client.journal:
+                self.client.journal.put(day.phone_number, day.query_date, day_records)
+            if self.client.cache:
+                self.client.cache.put(day.phone_number, day.query_date, day_records)
+            if self.client.page_history is not None:
+                self.client.page_history.observe(day.phone_number, day.query_date, len(day.pages))
+            self._report_day(day.phone_number, day.query_date, len(day_records), SOURCE_API)
+        
+        if self.client.metrics:
+            self.client.metrics.record_day(DayEvent(
+                day.phone_number,
+                day.query_date,
+                SOURCE_API,
+                day.error is not None,
+                len(day.pages),
+                0 if day_records is None else len(day_records),
+                time.perf_counter() - day.started
+            ))
+        
+        return self._finish_day(day.index, day.phone_number, day.query_date, day_records)
+    
+    def abandon(self) -> List[Tuple[str, str, Optional[List[SMSRecord]]]]:
+        """
+        查询被取消时停止调度
+        
+        未开始的日期和已开始但未查询完的日期记为未完成，已提交的页请求由调用方取消或丢弃。
+        
+        Returns:
+            仍可产出的日期列表：有序模式下为重排缓冲区中已完成的日期（按任务顺序）；
+            include_failed 为 True 时未完成的日期也以 None 代替记录列表产出，
+            调用方（如增量同步）不会越过未完成的日期
+        """
+        incomplete = [(index, task) for index, task in self.waiting]
+        incomplete += [(index, task) for _, index, task in self.ready]
+        incomplete += [(index, (day.phone_number, day.query_date)) for index, day in self.active.items()]
+        incomplete.sort()
+        self.incomplete_days = [task for _, task in incomplete]
+        self.waiting.clear()
+        self.ready = []
+        self.pending.clear()
+        self.active.clear()
+        self.in_flight = 0
+        
+        remaining = [(index, (phone_number, query_date, None)) for index, (phone_number, query_date) in incomplete]
+        if self.ordered:
+            remaining += self.reorder_buffer.items()
+            self.reorder_buffer = {}
+            remaining.sort(key=lambda item: item[0])
+        return [item for _, item in remaining if item[2] is not None or self.include_failed]
+    
+    def finish(self):
+        """全部任务结束（或取消）后记录失败和未完成的日期，以及实际耗时"""
+        self.elapsed = time.perf_counter() - self.started
+        self.client.failed_days = self.failed_days
+        self.client.incomplete_days = self.incomplete_days
+        report = self.client.schedule_report
+        if report is not None:
+            report['actual_pages'] = self.api_pages
+            report['actual_seconds'] = round(self.elapsed, 3)
+    
+    def _take_waiting(self) -> Optional[Tuple[int, Tuple[str, str]]]:
+        """
+        取出下一个可以开始的日期（有序模式下只在重排窗口内选择）
+        
+        Returns:
+            (任务序号, (手机号, 日期))，没有可以开始的日期时为 None
+        """
+        limit = self.next_index + self.reorder_window if self.ordered else None
+        if self.priorities is None:
+            if not self.waiting or (limit is not None and self.waiting[0][0] >= limit):
+                return None
+            return self.waiting.popleft()
+        
+        while self.waiting and (limit is None or self.waiting[0][0] < limit):
+            index, task = self.waiting.popleft()
+            heapq.heappush(self.ready, (self.priorities[index], index, task))
+        if not self.ready:
+            return None
+        _, index, task = heapq.heappop(self.ready)
+        return index, task
+    
+    def _lookup(self, phone_number: str, query_date: str):
+        """
+        从断点日志或缓存中查找已有的单天结果
+        
+        缓存命中的日期同时写入断点日志，续查时不再依赖缓存。
+        
+        Returns:
+            (SOURCE_JOURNAL 或 SOURCE_CACHE, 记录列表)，都没有时记录列表为 None
+        """
+        journal = self.client.journal
+        if journal:
+            records = journal.get(phone_number, query_date)
+            if records is not None:
+                return SOURCE_JOURNAL, records
+        
+        cache = self.client.cache
+        records = cache.get(phone_number, query_date) if cache else None
+        if records is not None and journal:
+            journal.put(phone_number, query_date, records)
+        return SOURCE_CACHE, records
+    
+    def _finish_day(self, index, phone_number, query_date, day_records):
+        """记录一天的结果，返回可以立即产出的日期列表"""
+        if not self.ordered:
+            if day_records is None and not self.include_failed:
+                return []
+            return [(phone_number, query_date, day_records)]
+        
+        self.reorder_buffer[index] = (phone_number, query_date, day_records)
+        ready = []
+        while self.next_index in self.reorder_buffer:
+            item = self.reorder_buffer.pop(self.next_index)
+            self.next_index += 1
+            if item[2] is not None or self.include_failed:
+                ready.append(item)
+        return ready
+    
+    def _report_day(self, phone_number, query_date, record_count, source, error=None):
+        """提交单个日期完成的进度事件"""
+        self.client.progress.emit(
+            EVENT_DAY,
+            completed=self.completed_count,
+            total=self.total_count,
+            phone_number=phone_number,
+            query_date=query_date,
+            records=record_count,
+            source=source,
+            error=error
+        )
+
+
+class _PageRequest:
+    """一个页请求（原始请求及其对冲副本）的状态（仅在调度线程中访问）"""
+    
+    def __init__(self, day: _DayTask, page: int):
+        self.day = day
+        self.page = page
+        self.submitted = time.perf_counter()
+        self.futures = []        # 执行中的副本
+        self.hedged = False
+        self.settled = False     # 已把结果交给调度器
+        self.error = None
+
+
+class _PageCalls:
+    """
+    执行中的页请求，线程池引擎和 asyncio 引擎共用
+    
+    未启用对冲时每个页请求只有一个副本，完成后直接交给调度器。
+    启用对冲时，执行时间超过 HedgePolicy.delay() 的页请求在预算和额外并发槽位允许时
+    再提交一个副本，先成功返回的副本交给调度器，另一个副本被取消
+    （线程池中已开始执行的请求无法中断，返回后结果被丢弃）；
+    一个副本失败时等待另一个副本，两个都失败才算失败。
+    限流器正在从限流中恢复时不对冲，避免加重限流。
+    
+    仅在调度线程（或事件循环）中访问。
+    """
+    
+    def __init__(self, client: 'SMSQueryClient'):
+        self.client = client
+        self.hedging = client.hedging
+        self.extra_slots = client.hedge_slots
+        self.futures = {}        # future / task -> (页请求, 提交时间, 是否为对冲副本)
+        self.open_requests = 0   # 尚未交给调度器的页请求数
+        self._watch = {}         # 尚未对冲的页请求（按提交时间排序）
+    
+    def __bool__(self) -> bool:
+        return bool(self.futures)
+    
+    def new_request(self, day: _DayTask, page: int) -> _PageRequest:
+        """创建一个原始页请求"""
+        request = _PageRequest(day, page)
+        self.open_requests += 1
+        if self.hedging is not None:
+            self.hedging.on_request()
+            self._watch[request] = None
+        return request
+    
+    def add(self, future, request: _PageRequest, hedge: bool = False):
+        """登记一个已提交的副本"""
+        request.futures.append(future)
+        self.futures[future] = (request, time.perf_counter(), hedge)
+    
+    def timeout(self) -> Optional[float]:
+        """
+        距离下一个页请求需要对冲还有多少秒
+        
+        Returns:
+            秒数，没有需要对冲的页请求时为 None（一直等到有请求完成）
+        """
+        delay = self.hedging.delay() if self.hedging is not None else None
+        if delay is None or not self._watch:
+            return None
+        oldest = next(iter(self._watch))
+        return max(0.0, oldest.submitted + delay - time.perf_counter())
+    
+    def take_hedges(self) -> List[_PageRequest]:
+        """
+        取出执行时间已超过对冲等待时间的页请求
+        
+        超时的页请求只判断一次：预算、额外槽位不足或正在限流时不再对冲。
+        
+        Returns:
+            需要提交对冲副本的页请求，调用方提交后须对每一项调用 add(..., hedge=True)
+        """
+        delay = self.hedging.delay() if self.hedging is not None else None
+        if delay is None:
+            return []
+        pool = self.client.credential_pool
+        throttled = pool.rate < pool.max_rate
+        deadline = time.perf_counter() - delay
+        extra = len(self.futures) - self.open_requests
+        hedges = []
+        while self._watch:
+            request = next(iter(self._watch))
+            if request.submitted > deadline:
+                break
+            del self._watch[request]
+            if throttled or extra + len(hedges) >= self.extra_slots or not self.hedging.try_hedge():
+                continue
+            request.hedged = True
+            hedges.append(request)
+        return hedges
+    
+    def complete(self, future) -> Optional[Tuple[_DayTask, int, object, Optional[Exception]]]:
+        """
+        处理一个完成的副本
+        
+        Returns:
+            需要交给调度器的 (日期任务, 页码, 结果, 异常)，
+            副本被丢弃或还在等待另一个副本时为 None
+        """
+        request, submitted, hedge = self.futures.pop(future)
+        request.futures.remove(future)
+        if future.cancelled():
+            return None
+        try:
+            result, error = future.result(), None
+        except Exception as e:
+            result, error = None, e
+        
+        if error is None:
+            latency = time.perf_counter() - submitted
+            if self.hedging is not None:
+                self.hedging.observe(latency)
+            if self.client.page_history is not None:
+                self.client.page_history.observe_latency(latency)
+        if request.settled:
+            return None
+        if error is not None and request.futures:
+            # 另一个副本还在执行，等它的结果
+            request.error = error
+            return None
+        
+        request.settled = True
+        self.open_requests -= 1
+        self._watch.pop(request, None)
+        if error is None and hedge:
+            self.hedging.on_hedge_win()
+        for other in request.futures:
+            other.cancel()
+        return request.day, request.page, result, error
+    
+    def cancel_all(self):
+        """取消所有副本（调用方提前停止迭代时）"""
+        for future in self.futures:
+            future.cancel()
 
 
 class SMSQueryClient:
     """短信查询客户端"""
     
-    def __init__(self, config: Config):
+    def __init__(
+        self,
+        config: Config,
+        max_workers: int = 10,
+        max_qps: float = 50.0,
+        max_retries: int = 5,
+        cache: ResultCache = None,
+        journal: CheckpointJournal = None,
+        metrics: QueryMetrics = None,
+        progress: ProgressReporter = None,
+        hedging: HedgePolicy = None,
+        cancel_token: CancelToken = None,
+        schedule: str = SCHEDULE_CALENDAR,
+        page_history: PageHistory = None,
+        profiler: StageProfiler = None
+    ):
         """
         初始化客户端
         
         Args:
             config: 配置对象
+            max_workers: 全局并发上限，即共享线程池的大小，默认10（启用对冲时另加对冲请求的槽位）
+            max_qps: 每组访问密钥每秒请求数上限，遇到限流时自动降低，默认50
+                （配置了多组访问密钥时总速率随密钥数增加，见 CredentialPool）
+            max_retries: 限流、5xx、超时等临时错误的最大重试次数，默认5
+            cache: 单天查询结果缓存，为 None 时不使用缓存
+            journal: 断点日志，已记录的日期直接读取，新完成的日期追加写入
+            metrics: 指标收集器，记录每次接口调用和每个日期的耗时，为 None 时不记录
+            progress: 进度显示，默认逐行输出到标准输出（LineProgress）
+            hedging: 对冲策略，页请求耗时过长时再发一个相同的请求，为 None 时不对冲
+            cancel_token: 取消令牌（可带截止时间），取消后不再开始新的日期和页请求，
+                已完成的日期照常产出，其余日期记入 incomplete_days；为 None 时不限时
+            schedule: 日期的开始顺序：calendar 按号码、日期顺序，cost 预计页数多的先开始，
+                recent 最近的日期先开始，见 cost_model
+            page_history: 页数历史，用于估计每天的页数和总耗时，查询时随之更新；
+                为 None 时 cost 策略只使用默认估计，也不估算总耗时
+            profiler: 阶段剖析器，记录日期规划、接口调用、响应解析、排序和调度等待的耗时，
+                为 None 时不记录
+            
+        Raises:
+            ValueError: 不支持的调度策略
         """
+        if schedule not in SCHEDULE_POLICIES:
+            raise ValueError(f"不支持的调度策略: {schedule}（支持 {'、'.join(SCHEDULE_POLICIES)}）")
         self.config = config
-        self.client = self._create_client()
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.cache = cache
+        self.journal = journal
+        self.metrics = metrics
+        self._owns_progress = progress is None
+        self.progress = LineProgress() if progress is None else progress
+        self.hedging = hedging
+        self.hedge_slots = hedging.slots(max_workers) if hedging is not None else 0
+        self.cancel_token = CancelToken() if cancel_token is None else cancel_token
+        self.schedule = schedule
+        self.page_history = page_history
+        self.profiler = profiler
+        self.schedule_report = None
+        # 每组访问密钥一个客户端和一个限流器，每组都可以用满全部并发（某组被限流时其他组补上）
+        self.credential_pool = CredentialPool(
+            config.credentials,
+            self._create_client,
+            max_concurrency=max_workers + self.hedge_slots,
+            max_rate=max_qps
+        )
+        self.runtime = self._create_runtime_options()
+        self._session_ready = False
+        self._session_lock = threading.Lock()
+        self.retry_count = 0
+        self.failed_days = []
+        self.incomplete_days = []
+        self._stats_lock = threading.Lock()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            # 异常（如 Ctrl-C）退出时不再等待执行中的页请求
+            self.cancel_token.cancel()
+        self.close()
     
-    def _create_client(self) -> Dysmsapi20170525Client:
-        """创建阿里云短信客户端"""
+    def close(self):
+        """
+        关闭共享线程池（以及客户端自己创建的进度显示）
+        
+        查询已取消时不等待执行中的页请求：它们在当前调用返回后放弃，不再重试。
+        """
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=not self.cancel_token.cancelled)
+                self._executor = None
+        if self._owns_progress:
+            self.progress.close()
+    
+    def _create_client(self, credential: Credential):
+        """
+        创建使用某组访问密钥的阿里云短信客户端
+        
+        未配置 ALIYUN_SMS_ENDPOINT 时由 SDK 按 ALIYUN_REGION 选择服务地址。
+        
+        Args:
+            credential: 访问密钥
+        """
+        from alibabacloud_dysmsapi20170525.client import Client as Dysmsapi20170525Client
+        from alibabacloud_tea_openapi import models as open_api_models
+        
         config = open_api_models.Config(
-            access_key_id=self.config.access_key_id,
-            access_key_secret=self.config.access_key_secret
+            access_key_id=credential.access_key_id,
+            access_key_secret=credential.access_key_secret,
+            region_id=self.config.region
         )
-        # 短信服务的endpoint
-        config.endpoint = f'dysmsapi.aliyuncs.com'
+        # 短信服务的endpoint，带协议前缀时同时指定协议
+        endpoint = self.config.endpoint
+        if endpoint:
+            if '://' in endpoint:
+                config.protocol, endpoint = endpoint.split('://', 1)
+            config.endpoint = endpoint.rstrip('/')
         return Dysmsapi20170525Client(config)
     
+    def _create_runtime_options(self, max_timeout: int = None):
+        """
+        创建所有请求共用的运行时参数
+        
+        SDK 按 (地址, 连接池大小) 在进程内共享一个 HTTP 会话，连接池默认只保留 40 个连接，
+        并发数更大时多出的连接用完即关闭，下次请求要重新握手。这里把连接池大小设为并发数
+        （或 ALIYUN_SMS_POOL_SIZE），让每个工作线程都能复用已建立的长连接。
+        
+        Args:
+            max_timeout: 连接和读取超时的上限（毫秒），为 None 时使用配置的超时
+        """
+        from alibabacloud_tea_util import models as util_models
+        
+        connect_timeout = self.config.connect_timeout
+        read_timeout = self.config.read_timeout
+        if max_timeout is not None:
+            connect_timeout = min(connect_timeout, max_timeout)
+            read_timeout = min(read_timeout, max_timeout)
+        return util_models.RuntimeOptions(
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            max_idle_conns=self.config.pool_size or self.max_workers,
+            keep_alive=True
+        )
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """获取共享线程池（首次使用时创建，之后所有查询复用）"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers + self.hedge_slots,
+                    thread_name_prefix='sms-query'
+                )
+            return self._executor
+    
     def query_send_details(
         self,
         phone_number: str,
         start_date: str,
         end_date: str = None,
         page_size: int = 50,
-        max_workers: int = 10
-    ) -> List[Dict]:
+        max_workers: int = None
+    ) -> List[SMSRecord]:
         """
         查询短信发送明细（并行版本）
         
@@ -53,63 +740,393 @@ class SMSQueryClient:
             start_date: 开始日期，格式：YYYYMMDD
             end_date: 结束日期，格式：YYYYMMDD，默认为开始日期
             page_size: 每页记录数，最大50
-            max_workers: 最大并发线程数，默认10
+            max_workers: 本次查询的最大并发数，默认使用客户端的全局并发上限
             
         Returns:
             短信发送记录列表
         """
-        if end_date is None:
-            end_date = start_date
+        max_workers = self._effective_workers(max_workers)
+        tasks = self._plan_tasks([phone_number], start_date, end_date, max_workers)
+        all_records = self._run_tasks(tasks, page_size, max_workers)[phone_number]
+        
+        self.report_finish(1, len(all_records))
+        return all_records
+    
+    def query_batch(
+        self,
+        phone_numbers: Iterable[str],
+        start_date: str,
+        end_date: str = None,
+        page_size: int = 50,
+        max_workers: int = None
+    ) -> Dict[str, List[SMSRecord]]:
+        """
+        批量查询多个手机号的短信发送明细
+        
+        所有 (手机号, 日期) 任务共用一个线程池，并发数受全局上限约束。
+        
+        Args:
+            phone_numbers: 手机号码列表（重复的号码只查询一次）
+            start_date: 开始日期，格式：YYYYMMDD
+            end_date: 结束日期，格式：YYYYMMDD，默认为开始日期
+            page_size: 每页记录数，最大50
+            max_workers: 本次查询的最大并发数，默认使用客户端的全局并发上限
+            
+        Returns:
+            按手机号分组的记录字典，键的顺序与输入顺序一致，每组按时间排序
+        """
+        max_workers = self._effective_workers(max_workers)
+        phone_numbers = list(dict.fromkeys(phone_numbers))
+        tasks = self._plan_tasks(phone_numbers, start_date, end_date, max_workers)
+        results = self._run_tasks(tasks, page_size, max_workers)
+        
+        total = sum(len(records) for records in results.values())
+        self.report_finish(len(phone_numbers), total)
+        return results
+    
+    def iter_send_details(
+        self,
+        phone_numbers,
+        start_date: str,
+        end_date: str = None,
+        page_size: int = 50,
+        max_workers: int = None,
+        reorder_window: int = None,
+        shard: Tuple[int, int] = None
+    ) -> Iterator[SMSRecord]:
+        """
+        流式查询短信发送明细，每查询完一天就产出当天的记录
+        
+        记录按手机号（输入顺序）、日期、发送时间的顺序产出，与 query_send_details /
+        query_batch 的结果顺序一致。排序通过按日期的有界重排缓冲区完成，
+        内存占用与重排窗口内的天数成正比，而不是与全部记录数成正比。
+        
+        Args:
+            phone_numbers: 手机号码，或手机号码列表（重复的号码只查询一次）
+            start_date: 开始日期，格式：YYYYMMDD
+            end_date: 结束日期，格式：YYYYMMDD，默认为开始日期
+            page_size: 每页记录数，最大50
+            max_workers: 本次查询的最大并发数，默认使用客户端的全局并发上限
+            reorder_window: 重排窗口（天数），默认为并发数的4倍
+            shard: (分片序号, 分片总数)，分片序号从1开始，只查询属于该分片的 (手机号, 日期)，
+                见 in_shard
+            
+        Yields:
+            短信发送记录
+        """
+        if isinstance(phone_numbers, str):
+            phone_numbers = [phone_numbers]
+        phone_numbers = list(dict.fromkeys(phone_numbers))
+        max_workers = self._effective_workers(max_workers)
+        tasks = self._plan_tasks(phone_numbers, start_date, end_date, max_workers, shard)
+        
+        days = self._iter_days(
+            tasks,
+            page_size,
+            max_workers,
+            ordered=True,
+            reorder_window=reorder_window
+        )
+        if self.profiler is not None:
+            days = self.profiler.iterate(STAGE_WAIT, days)
         
-        all_records = []
-        lock = threading.Lock()  # 用于线程安全地更新记录列表
+        total = 0
+        for _, _, day_records in days:
+            total += len(day_records)
+            yield from day_records
+        
+        self.report_finish(len(phone_numbers), total)
+    
+    def iter_days(
+        self,
+        tasks: Iterable[Tuple[str, str]],
+        page_size: int = 50,
+        max_workers: int = None,
+        ordered: bool = False
+    ) -> Iterator[Tuple[str, str, Optional[List[SMSRecord]]]]:
+        """
+        按给定的 (手机号, 日期) 任务流式查询，每完成一天产出一次结果，查询失败的日期也会产出
         
-        # 生成日期列表（阿里云API只支持单天查询）
-        date_list = self._generate_date_list(start_date, end_date)
+        供需要自行规划日期、按天处理失败的调用方使用（如增量同步和查询服务）。
+        不显示查询计划；需要完成信息时由调用方调用 report_finish。
         
-        print(f"正在查询手机号 {phone_number} 从 {start_date} 到 {end_date} 的短信记录...")
-        print(f"共需查询 {len(date_list)} 天的数据")
-        print(f"使用 {max_workers} 个并发线程加速查询...\n")
+        Args:
+            tasks: (手机号, 日期) 任务，日期格式 YYYYMMDD
+            page_size: 每页记录数，最大50
+            max_workers: 本次查询的最大并发数，默认使用客户端的全局并发上限
+            ordered: 是否按任务顺序产出，否则按完成顺序产出
         
-        completed_count = 0
-        total_count = len(date_list)
+        Yields:
+            (手机号, 日期, 当天按时间排序的记录列表)，查询失败的日期记录列表为 None；
+            取消令牌触发后未完成的日期同样以 None 产出，并记入 incomplete_days
+        """
+        days = self._iter_days(
+            list(tasks),
+            page_size,
+            self._effective_workers(max_workers),
+            ordered=ordered,
+            include_failed=True
+        )
+        if self.profiler is not None:
+            days = self.profiler.iterate(STAGE_WAIT, days)
+        yield from days
+    
+    def _plan_tasks(
+        self,
+        phone_numbers: List[str],
+        start_date: str,
+        end_date: str,
+        max_workers: int,
+        shard: Tuple[int, int] = None
+    ) -> List[Tuple[str, str]]:
+        """
+        生成 (手机号, 日期) 任务列表并显示查询计划
         
-        # 使用线程池并行查询
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 提交所有任务
-            future_to_date = {
-                executor.submit(
-                    self._query_single_day,
-                    phone_number,
-                    query_date,
-                    page_size
-                ): query_date
+        Args:
+            phone_numbers: 手机号码列表
+            start_date: 开始日期 YYYYMMDD
+            end_date: 结束日期 YYYYMMDD，为 None 时等于开始日期
+            max_workers: 最大并发数
+            shard: (分片序号, 分片总数)，为 None 时不分片
+            
+        Returns:
+            按手机号、日期排列的任务列表
+        """
+        with self._stage(STAGE_PLAN):
+            if end_date is None:
+                end_date = start_date
+            
+            # 生成日期列表（阿里云API只支持单天查询）
+            date_list = self._generate_date_list(start_date, end_date)
+            
+            tasks = [
+                (phone_number, query_date)
+                for phone_number in phone_numbers
                 for query_date in date_list
-            }
+            ]
+            if shard is not None:
+                tasks = [task for task in tasks if in_shard(*task, *shard)]
             
-            # 处理完成的任务
-            for future in as_completed(future_to_date):
-                query_date = future_to_date[future]
-                completed_count += 1
-                
-                try:
-                    day_records = future.result()
-                    
-                    if day_records:
-                        with lock:
-                            all_records.extend(day_records)
-                        print(f"[{completed_count}/{total_count}] ✓ {query_date} 找到 {len(day_records)} 条记录")
-                    else:
-                        print(f"[{completed_count}/{total_count}] - {query_date} 无记录")
-                        
-                except Exception as e:
-                    print(f"[{completed_count}/{total_count}] ✗ {query_date} 查询失败: {str(e)}")
+            self.progress.emit(
+                EVENT_PLAN,
+                phones=len(phone_numbers),
+                phone_number=phone_numbers[0] if len(phone_numbers) == 1 else None,
+                days=len(date_list),
+                tasks=len(tasks),
+                start_date=start_date,
+                end_date=end_date,
+                workers=max_workers,
+                shard=f'{shard[0]}/{shard[1]}' if shard else None
+            )
+            
+            return tasks
+    
+    def _stage(self, name: str):
+        """
+        阶段剖析的上下文管理器（未启用剖析时不做任何事）
+        
+        Args:
+            name: 阶段名，见 profiling.STAGE_*
+        """
+        if self.profiler is None:
+            return _NO_STAGE
+        return self.profiler.stage(name)
+    
+    def report_finish(self, phone_count: int, record_count: int):
+        """
+        提交查询结束的进度事件，并等待进度信息全部输出
+        
+        query_send_details / query_batch / iter_send_details 结束时自动调用；
+        使用 iter_days 的调用方在处理完全部日期后调用。
+        
+        Args:
+            phone_count: 手机号数量
+            record_count: 获取的记录总数
+        """
+        self.progress.emit(
+            EVENT_FINISH,
+            phones=phone_count,
+            records=record_count,
+            failed_days=len(self.failed_days),
+            incomplete_days=len(self.incomplete_days),
+            cancelled=self.cancel_token.reason
+        )
+        self.progress.flush()
+    
+    def _effective_workers(self, max_workers: int = None) -> int:
+        """计算本次查询的并发数，不超过共享线程池的大小"""
+        if max_workers is None:
+            return self.max_workers
+        return max(1, min(max_workers, self.max_workers))
+    
+    def _run_tasks(
+        self,
+        tasks: List[Tuple[str, str]],
+        page_size: int,
+        max_workers: int
+    ) -> Dict[str, List[SMSRecord]]:
+        """
+        执行 (手机号, 日期) 任务并收集全部结果
+        
+        Args:
+            tasks: (手机号, 日期) 任务列表
+            page_size: 每页记录数
+            max_workers: 最大并发数
+            
+        Returns:
+            按手机号分组并按时间排序的记录字典
+        """
+        results = {}
+        for phone_number, _ in tasks:
+            results.setdefault(phone_number, [])
+        
+        for phone_number, _, day_records in self._iter_days(tasks, page_size, max_workers):
+            results[phone_number].extend(day_records)
         
         # 按时间排序
-        all_records.sort(key=lambda x: x['send_time'])
+        with self._stage(STAGE_SORT):
+            for records in results.values():
+                records.sort(key=lambda x: x.send_ts)
         
-        print(f"\n查询完成，共获取 {len(all_records)} 条记录")
-        return all_records
+        return results
+    
+    def _iter_days(
+        self,
+        tasks: List[Tuple[str, str]],
+        page_size: int,
+        max_workers: int,
+        ordered: bool = False,
+        reorder_window: int = None,
+        include_failed: bool = False
+    ) -> Iterator[Tuple[str, str, List[SMSRecord]]]:
+        """
+        在共享线程池中执行 (手机号, 日期) 任务，每完成一天产出一次结果
+        
+        调度规则见 _DayScheduler。
+        
+        Args:
+            tasks: (手机号, 日期) 任务列表
+            page_size: 每页记录数
+            max_workers: 最大并发数
+            ordered: 是否按任务顺序产出
+            reorder_window: 有序模式下的重排窗口（天数），默认为 max_workers 的4倍
+            include_failed: 是否产出查询失败的日期
+            
+        Yields:
+            (手机号, 日期, 当天按时间排序的记录列表)，查询失败的日期默认不产出，
+            include_failed 为 True 时以 None 代替记录列表产出；
+            取消令牌触发后立即停止调度，只产出已完成的日期，未完成的日期记入 incomplete_days
+        """
+        priorities, reorder_window = self._plan_schedule(tasks, max_workers, ordered, reorder_window)
+        scheduler = _DayScheduler(
+            self, tasks, page_size, max_workers, ordered, reorder_window, include_failed, priorities
+        )
+        cancel_token = self.cancel_token
+        executor = self._get_executor()
+        calls = _PageCalls(self)
+        
+        def submit(request, hedge=False):
+            future = executor.submit(
+                self._fetch_page,
+                request.day.phone_number,
+                request.day.query_date,
+                request.page,
+                page_size,
+                time.perf_counter()
+            )
+            calls.add(future, request, hedge)
+        
+        try:
+            while scheduler.has_work() and not cancel_token.cancelled:
+                # 开始新的日期，缓存命中的日期直接完成
+                yield from scheduler.start_days()
+                
+                # 补充页请求，保持不超过并发上限
+                for day, page in scheduler.take_requests():
+                    submit(calls.new_request(day, page))
+                
+                if not calls:
+                    continue
+                
+                # 启用对冲时最多等到下一个页请求需要对冲；取消时立即醒来
+                done, _ = wait(
+                    [*calls.futures, cancel_token.future],
+                    timeout=calls.timeout(),
+                    return_when=FIRST_COMPLETED
+                )
+                if cancel_token.cancelled:
+                    break
+                
+                # 处理完成的页请求
+                for future in done:
+                    completed = calls.complete(future)
+                    if completed is not None:
+                        yield from scheduler.complete(*completed)
+                
+                # 对执行时间过长的页请求提交对冲副本
+                for request in calls.take_hedges():
+                    submit(request, hedge=True)
+            
+            if cancel_token.cancelled:
+                yield from scheduler.abandon()
+        finally:
+            # 调用方提前停止迭代或查询被取消时，取消尚未开始执行的页请求
+            calls.cancel_all()
+        
+        scheduler.finish()
+    
+    def _plan_schedule(
+        self,
+        tasks: List[Tuple[str, str]],
+        max_workers: int,
+        ordered: bool,
+        reorder_window: Optional[int]
+    ) -> Tuple[Optional[List], Optional[int]]:
+        """
+        按调度策略计算日期的开始优先级，并估算总耗时（记入 schedule_report）
+        
+        断点日志或结果缓存中已有的日期不调用接口，预计页数为 0。
+        
+        Args:
+            tasks: (手机号, 日期) 任务列表
+            max_workers: 最大并发数
+            ordered: 是否按任务顺序产出
+            reorder_window: 有序模式下的重排窗口
+            
+        Returns:
+            (优先级列表，按任务顺序时为 None; 重排窗口)
+        """
+        self.schedule_report = None
+        history = self.page_history
+        if history is None:
+            if self.schedule == SCHEDULE_CALENDAR:
+                return None, reorder_window
+            history = PageHistory()
+        
+        costs = history.estimate(tasks)
+        for store in (self.journal, self.cache):
+            if store is not None:
+                costs = [0.0 if cost and task in store else cost for task, cost in zip(tasks, costs)]
+        priorities = task_priorities(tasks, self.schedule, costs)
+        order = range(len(tasks)) if priorities is None else sorted(range(len(tasks)), key=priorities.__getitem__)
+        self.schedule_report = {
+            'policy': self.schedule,
+            'page_latency': round(history.page_latency, 3),
+            'estimated_pages': round(sum(costs)),
+            'estimated_seconds': round(estimate_makespan(
+                [costs[index] for index in order],
+                max_workers,
+                history.page_latency,
+                self.credential_pool.max_rate
+            ), 3),
+            'actual_pages': None,
+            'actual_seconds': None,
+        }
+        
+        if self.schedule == SCHEDULE_RECENT and ordered:
+            # 最近的日期先开始时，按任务顺序产出要等最早的日期完成，不限制重排窗口
+            reorder_window = max(1, len(tasks))
+        return priorities, reorder_window
     
     def _generate_date_list(self, start_date: str, end_date: str) -> List[str]:
         """
@@ -134,121 +1151,315 @@ class SMSQueryClient:
         
         return date_list
     
-    def _query_single_day(
+    def _fetch_page(
         self,
         phone_number: str,
         query_date: str,
-        page_size: int = 50
-    ) -> List[Dict]:
+        current_page: int,
+        page_size: int = 50,
+        ready_at: float = None
+    ) -> Tuple[List[SMSRecord], Optional[int]]:
         """
-        查询单天的短信记录
+        查询单天的某一页短信记录
         
         Args:
             phone_number: 手机号码
             query_date: 查询日期 YYYYMMDD
+            current_page: 页码，从1开始
             page_size: 每页记录数
+            ready_at: 请求提交的时间（time.perf_counter），用于统计排队时间
             
         Returns:
-            当天的记录列表
+            (当页记录列表, 接口返回的当天总记录数)，总数未知时为 None
+            
+        Raises:
+            SMSQueryError: 接口返回错误或重试次数用尽
         """
-        day_records = []
-        current_page = 1
+        request = self._build_request(phone_number, query_date, current_page, page_size)
+        with self._stage(STAGE_API):
+            response = self._call_api(request, ready_at)
+        with self._stage(STAGE_PARSE):
+            return self._parse_page(response.body)
+    
+    def _build_request(
+        self,
+        phone_number: str,
+        query_date: str,
+        current_page: int,
+        page_size: int
+    ):
+        """构造 QuerySendDetails 请求对象"""
+        from alibabacloud_dysmsapi20170525 import models as dysmsapi_20170525_models
         
-        while True:
-            request = dysmsapi_20170525_models.QuerySendDetailsRequest(
-                phone_number=phone_number,
-                send_date=query_date,
-                page_size=page_size,
-                current_page=current_page
-            )
+        return dysmsapi_20170525_models.QuerySendDetailsRequest(
+            phone_number=phone_number,
+            send_date=query_date,
+            page_size=page_size,
+            current_page=current_page
+        )
+    
+    def _parse_page(self, body) -> Tuple[List[SMSRecord], Optional[int]]:
+        """
+        解析 QuerySendDetails 响应体
+        
+        Args:
+            body: 接口响应的 body
             
-            runtime = util_models.RuntimeOptions()
+        Returns:
+            (当页记录列表, 接口返回的当天总记录数)，总数未知时为 None
             
-            try:
-                response = self.client.query_send_details_with_options(
-                    request, 
-                    runtime
-                )
-                
-                if response.status_code != 200:
-                    print(f"  ✗ API调用失败，状态码: {response.status_code}")
-                    break
-                
-                body = response.body
-                
-                if body.code != 'OK':
-                    # 如果是没有记录，不打印错误
-                    if body.code != 'isv.MOBILE_NUMBER_ILLEGAL' and 'no result' not in str(body.message).lower():
-                        print(f"  ✗ 查询失败: {body.message}")
-                    break
+        Raises:
+            SMSQueryError: 接口返回错误
+        """
+        page_records = []
+        
+        if body.code != 'OK':
+            # 没有记录不算失败
+            if body.code == 'isv.MOBILE_NUMBER_ILLEGAL' or 'no result' in str(body.message).lower():
+                return page_records, 0
+            raise SMSQueryError(f"查询失败: {body.code} {body.message}")
+        
+        # 解析发送记录
+        if body.sms_send_detail_dtos and body.sms_send_detail_dtos.sms_send_detail_dto:
+            for record in body.sms_send_detail_dtos.sms_send_detail_dto:
+                # 发送时间保存为时间戳，导出时再格式化
+                send_ts, raw_send_time = parse_send_time(record.send_date)
                 
-                # 解析发送记录
-                if body.sms_send_detail_dtos and body.sms_send_detail_dtos.sms_send_detail_dto:
-                    records = body.sms_send_detail_dtos.sms_send_detail_dto
-                    
-                    for record in records:
-                        # 解析发送时间
-                        send_time = self._parse_send_time(record.send_date)
-                        
-                        day_records.append({
-                            'phone_number': record.phone_num,
-                            'send_time': send_time,
-                            'status': self._parse_status(record.send_status),
-                            'content': record.content or '',
-                            'template_code': record.template_code or ''
-                        })
-                    
-                    # 检查是否还有更多页
-                    if len(records) < page_size:
-                        break
-                    
-                    current_page += 1
-                    print(f"    获取第 {current_page-1} 页...")
-                else:
-                    # 没有更多记录
-                    break
-                    
-            except Exception as e:
-                print(f"  ✗ 查询出错: {str(e)}")
-                break
+                page_records.append(SMSRecord(
+                    record.phone_num,
+                    send_ts,
+                    record.send_status,
+                    record.content or '',
+                    record.template_code or '',
+                    raw_send_time
+                ))
         
-        return day_records
+        return page_records, self._parse_total_count(body.total_count)
     
-    def _parse_send_time(self, send_date: str) -> str:
+    def _call_api(self, request, ready_at: float = None):
         """
-        解析发送时间
+        经过密钥池的限流器调用 QuerySendDetails 接口
+        
+        每次调用（包括重试）从密钥池分配一组有空闲令牌的访问密钥。
+        限流、5xx、超时和连接错误会按带抖动的指数退避重试，
+        其余错误或重试次数用尽时抛出 SMSQueryError。
+        查询取消后不再发出新的调用，退避等待也立即结束。
         
         Args:
-            send_date: 发送日期时间字符串
+            request: QuerySendDetailsRequest 请求对象
+            ready_at: 请求就绪的时间（time.perf_counter），默认为调用时刻
             
         Returns:
-            格式化的时间字符串
+            接口响应（状态码为200且 body.code 不是限流错误码）
+            
+        Raises:
+            QueryCancelled: 查询已取消
+        """
+        attempt = 0
+        if ready_at is None:
+            ready_at = time.perf_counter()
+        
+        while True:
+            credential = self.credential_pool.acquire()
+            self._check_cancelled(credential)
+            started = time.perf_counter()
+            try:
+                response = self._send(request, credential.client)
+            except Exception as e:
+                # 截止时间缩短了超时，到期引起的超时不计为失败和重试
+                self._check_cancelled(credential)
+                self._record_call(request, attempt, ready_at, started, error=e)
+                delay = self._on_call_error(e, attempt, credential)
+            else:
+                self._record_call(request, attempt, ready_at, started, response=response)
+                delay = self._on_call_response(response, attempt, credential)
+                if delay is None:
+                    return response
+            
+            self.cancel_token.sleep(delay)
+            attempt += 1
+            ready_at = time.perf_counter()
+    
+    def _check_cancelled(self, credential: PooledCredential):
         """
-        if not send_date:
-            return ''
+        查询已取消时归还访问密钥的槽位（不计入调用统计）并抛出异常
         
+        Raises:
+            QueryCancelled: 查询已取消
+        """
         try:
-            # 阿里云返回的时间格式通常为：2023-11-03 15:30:00
-            dt = datetime.strptime(send_date, '%Y-%m-%d %H:%M:%S')
-            return dt.strftime('%Y-%m-%d %H:%M:%S')
-        except:
-            return send_date
+            self.cancel_token.check()
+        except QueryCancelled:
+            credential.release(CANCELLED)
+            raise
     
-    def _parse_status(self, status: int) -> str:
+    def _send(self, request, client):
         """
-        解析发送状态
+        调用一次 QuerySendDetails 接口
+        
+        SDK 在第一次请求时创建进程内共享的 HTTP 会话，创建过程没有加锁：多个线程同时发出
+        第一批请求时各自创建会话和连接池，其中的连接随后被丢弃。第一次调用在锁内完成，
+        之后的请求都复用同一个会话中的长连接。
+        
+        设置了截止时间时，超时不超过剩余时间（向上取整到毫秒，超时时截止时间已到），
+        执行中的请求不会拖过截止时间。
         
         Args:
-            status: 状态码
+            request: QuerySendDetailsRequest 请求对象
+            client: 分配到的访问密钥的 SDK 客户端
             
         Returns:
-            状态描述
+            接口响应
         """
-        status_map = {
-            1: '等待回执',
-            2: '发送失败',
-            3: '发送成功'
-        }
-        return status_map.get(status, f'未知状态({status})')
+        runtime = self.runtime
+        remaining = self.cancel_token.remaining()
+        if remaining is not None and remaining * 1000 < max(self.config.connect_timeout, self.config.read_timeout):
+            runtime = self._create_runtime_options(max(1, math.ceil(remaining * 1000)))
+        if self._session_ready:
+            return client.query_send_details_with_options(request, runtime)
+        with self._session_lock:
+            response = client.query_send_details_with_options(request, runtime)
+            self._session_ready = True
+            return response
     
-
+    def _on_call_error(self, error: Exception, attempt: int, credential: PooledCredential) -> float:
+        """
+        处理接口调用抛出的异常，归还访问密钥的限流器槽位
+        
+        Args:
+            error: 调用接口时抛出的异常
+            attempt: 当前是第几次重试，从0开始
+            credential: 本次调用使用的访问密钥
+            
+        Returns:
+            重试前需要等待的秒数
+            
+        Raises:
+            SMSQueryError: 不可重试的错误，或重试次数已用尽
+        """
+        throttled = is_throttling_code(getattr(error, 'code', None))
+        credential.release(THROTTLED if throttled else ERROR)
+        if attempt >= self.max_retries or not (throttled or self._is_transient_error(error)):
+            raise SMSQueryError(f"查询出错: {str(error)}") from error
+        
+        self._count_retry()
+        retry_after = getattr(error, 'retry_after', None)
+        return retry_after if retry_after else backoff_delay(attempt)
+    
+    def _on_call_response(self, response, attempt: int, credential: PooledCredential) -> Optional[float]:
+        """
+        处理接口响应，归还访问密钥的限流器槽位
+        
+        Args:
+            response: 接口响应
+            attempt: 当前是第几次重试，从0开始
+            credential: 本次调用使用的访问密钥
+            
+        Returns:
+            调用成功时返回 None，否则返回重试前需要等待的秒数
+            
+        Raises:
+            SMSQueryError: 不可重试的错误，或重试次数已用尽
+        """
+        status_code = response.status_code
+        throttled = is_throttling_code(getattr(response.body, 'code', None))
+        if status_code == 200 and not throttled:
+            credential.release(SUCCESS)
+            return None
+        
+        credential.release(THROTTLED if throttled else ERROR)
+        if attempt >= self.max_retries or not (throttled or status_code >= 500):
+            raise SMSQueryError(f"API调用失败，状态码: {status_code}")
+        
+        self._count_retry()
+        return backoff_delay(attempt)
+    
+    def _record_call(self, request, attempt: int, ready_at: float, started: float, response=None, error=None):
+        """
+        向指标收集器记录一次接口调用（未启用指标时不做任何事）
+        
+        Args:
+            request: QuerySendDetailsRequest 请求对象
+            attempt: 当前是第几次重试，从0开始
+            ready_at: 请求就绪的时间（time.perf_counter）
+            started: 开始调用接口的时间（time.perf_counter）
+            response: 接口响应，调用抛出异常时为 None
+            error: 调用接口时抛出的异常
+        """
+        if self.metrics is None:
+            return
+        latency = time.perf_counter() - started
+        
+        records = 0
+        if error is not None:
+            code = getattr(error, 'code', None) or type(error).__name__
+            outcome = OUTCOME_THROTTLED if is_throttling_code(code) else OUTCOME_ERROR
+        else:
+            body = response.body
+            code = getattr(body, 'code', None)
+            if is_throttling_code(code):
+                outcome = OUTCOME_THROTTLED
+            elif response.status_code != 200:
+                outcome = OUTCOME_ERROR
+                code = code or f'HTTP{response.status_code}'
+            else:
+                outcome = OUTCOME_OK
+                dtos = getattr(body, 'sms_send_detail_dtos', None)
+                if dtos and dtos.sms_send_detail_dto:
+                    records = len(dtos.sms_send_detail_dto)
+        
+        self.metrics.record_call(CallEvent(
+            request.phone_number,
+            request.send_date,
+            request.current_page,
+            attempt,
+            outcome,
+            '' if code in (None, 'OK') else str(code),
+            latency,
+            started - ready_at,
+            records
+        ))
+    
+    def _count_retry(self):
+        """累加重试次数"""
+        with self._stats_lock:
+            self.retry_count += 1
+    
+    def _is_transient_error(self, error: Exception) -> bool:
+        """
+        判断异常是否为可重试的临时错误（5xx、超时、连接失败）
+        
+        Args:
+            error: 调用接口时抛出的异常
+            
+        Returns:
+            是否可以重试
+        """
+        status_code = getattr(error, 'status_code', None)
+        if status_code is None and isinstance(getattr(error, 'data', None), dict):
+            status_code = error.data.get('statusCode')
+        if status_code is not None:
+            try:
+                return int(status_code) >= 500
+            except (TypeError, ValueError):
+                pass
+        
+        if isinstance(error, (TimeoutError, ConnectionError)):
+            return True
+        message = str(error).lower()
+        return any(keyword in message for keyword in ('timed out', 'timeout', 'connection'))
+    
+    def _parse_total_count(self, total_count) -> Optional[int]:
+        """
+        解析接口返回的总记录数
+        
+        Args:
+            total_count: TotalCount 字段（字符串或数字）
+            
+        Returns:
+            总记录数，无法解析时返回 None
+        """
+        try:
+            return int(total_count)
+        except (TypeError, ValueError):
+            return None
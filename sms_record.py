@@ -0,0 +1,171 @@
+"""
+短信记录模块
+紧凑的短信记录类型：发送时间保存为时间戳，发送状态保存为状态码，导出时才格式化
+"""
+import calendar
+import time
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional
+
+
+# 阿里云返回的发送状态
+STATUS_WAITING = 1
+STATUS_FAILED = 2
+STATUS_SUCCESS = 3
+
+STATUS_TEXT = {
+    STATUS_WAITING: '等待回执',
+    STATUS_FAILED: '发送失败',
+    STATUS_SUCCESS: '发送成功',
+}
+STATUS_CODES = {text: code for code, text in STATUS_TEXT.items()}
+
+# 阿里云返回的时间格式，如 2023-11-03 15:30:00（北京时间）
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+SOURCE_UTC_OFFSET = 8 * 3600
+
+
+class SMSRecord(NamedTuple):
+    """
+    一条短信发送记录
+
+    为兼容原来的字典记录，send_time / status 以属性形式按需格式化，
+    并提供 get() 方法，因此 record.get('status') 等写法仍然可用。
+    """
+
+    phone_number: str
+    send_ts: int                # 发送时间（Unix 时间戳，秒），无法解析时为 0
+    status_code: Optional[int]  # 发送状态码，见 STATUS_TEXT
+    content: str
+    template_code: str
+    raw_send_time: str = ''     # 发送时间无法解析时保留原始字符串
+
+    @property
+    def send_time(self) -> str:
+        """格式化的发送时间 YYYY-MM-DD HH:MM:SS"""
+        if self.raw_send_time or not self.send_ts:
+            return self.raw_send_time
+        return format_send_time(self.send_ts)
+
+    @property
+    def status(self) -> str:
+        """发送状态描述"""
+        return status_text(self.status_code)
+
+    def get(self, key: str, default=None):
+        """按字段名读取（兼容字典记录的写法）"""
+        return getattr(self, key, default)
+
+    def to_dict(self) -> Dict:
+        """转换为字典记录"""
+        return {
+            'phone_number': self.phone_number,
+            'send_time': self.send_time,
+            'status': self.status,
+            'content': self.content,
+            'template_code': self.template_code,
+        }
+
+    @classmethod
+    def from_dict(cls, record: Dict) -> 'SMSRecord':
+        """
+        从字典记录创建
+
+        Args:
+            record: 包含 phone_number / send_time / status / content / template_code 的字典
+
+        Returns:
+            短信记录
+        """
+        send_ts, raw_send_time = parse_send_time(record.get('send_time', ''))
+        status = record.get('status', '')
+        return cls(
+            record.get('phone_number', ''),
+            send_ts,
+            STATUS_CODES.get(status, _parse_unknown_status(status)),
+            record.get('content', ''),
+            record.get('template_code', ''),
+            raw_send_time
+        )
+
+
+def parse_send_time(send_date: str):
+    """
+    解析阿里云返回的发送时间
+
+    按固定位置切片解析，同一天的日期部分只计算一次，避免逐条 strptime。
+    格式和各字段范围的检查与 strptime(TIME_FORMAT) 一致，不符合时按无法解析处理。
+
+    Args:
+        send_date: 发送时间字符串，如 2023-11-03 15:30:00
+
+    Returns:
+        (时间戳, 原始字符串)，解析成功时原始字符串为空，失败时时间戳为 0
+    """
+    if not send_date:
+        return 0, ''
+
+    try:
+        if (len(send_date) != 19 or send_date[4] != '-' or send_date[7] != '-' or send_date[10] != ' '
+                or send_date[13] != ':' or send_date[16] != ':'):
+            raise ValueError(send_date)
+        hour, minute, second = _digits(send_date[11:13]), _digits(send_date[14:16]), _digits(send_date[17:19])
+        # strptime 的 %S 允许 60、61（闰秒）
+        if hour > 23 or minute > 59 or second > 61:
+            raise ValueError(send_date)
+        return _day_start(send_date[:10]) + hour * 3600 + minute * 60 + second, ''
+    except ValueError:
+        return 0, send_date
+
+
+def format_send_time(send_ts: int) -> str:
+    """
+    格式化发送时间
+
+    Args:
+        send_ts: Unix 时间戳（秒）
+
+    Returns:
+        北京时间 YYYY-MM-DD HH:MM:SS
+    """
+    return time.strftime(TIME_FORMAT, time.gmtime(send_ts + SOURCE_UTC_OFFSET))
+
+
+def status_text(status_code) -> str:
+    """
+    发送状态码转换为描述
+
+    Args:
+        status_code: 状态码
+
+    Returns:
+        状态描述
+    """
+    text = STATUS_TEXT.get(status_code)
+    return text if text is not None else f'未知状态({status_code})'
+
+
+@lru_cache(maxsize=4096)
+def _day_start(day: str) -> int:
+    """北京时间某一天 00:00:00 的时间戳，day 格式为 YYYY-MM-DD"""
+    year, month, mday = _digits(day[:4]), _digits(day[5:7]), _digits(day[8:10])
+    if not (1 <= month <= 12 and 1 <= mday <= calendar.monthrange(year, month)[1]):
+        raise ValueError(day)
+    return calendar.timegm((year, month, mday, 0, 0, 0)) - SOURCE_UTC_OFFSET
+
+
+def _digits(text: str) -> int:
+    """把只含 ASCII 数字的字符串转换为整数（int() 还接受空格、正负号和下划线）"""
+    if not (text.isascii() and text.isdigit()):
+        raise ValueError(text)
+    return int(text)
+
+
+def _parse_unknown_status(status: str) -> Optional[int]:
+    """从"未知状态(n)"中取回状态码"""
+    if status.startswith('未知状态(') and status.endswith(')'):
+        try:
+            return int(status[5:-1])
+        except ValueError:
+            pass
+    return None
@@ -0,0 +1,389 @@
+"""
+本地查询服务
+常驻进程保持一个已初始化的 SMSQueryClient 和共享线程池，通过 HTTP/JSON 提供查询。
+多个请求中相同的 (手机号, 日期) 在查询期间只调用一次接口，结果以 NDJSON 流式返回。
+"""
+import json
+import threading
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import List, Tuple
+from urllib.parse import urlparse, parse_qs
+
+from metrics import METRIC_PREFIX
+from sms_query import SMSQueryClient, SMSQueryError
+
+
+# 默认监听端口
+DEFAULT_PORT = 8765
+
+# 单个请求最多查询的天数
+MAX_DAYS = 366
+
+# 单个请求最多查询的手机号数
+MAX_PHONES = 1000
+
+# POST 请求体的最大字节数
+MAX_BODY_SIZE = 1024 * 1024
+
+
+class RequestError(ValueError):
+    """请求参数无效（返回 HTTP 400）"""
+
+
+class DayCoalescer:
+    """
+    合并进行中的相同 (手机号, 日期) 查询
+
+    每个 (手机号, 日期) 在查询期间对应一个 Future，之后的请求直接等待同一个
+    Future，不再调用接口。查询完成后立即移除，下一次请求重新查询
+    （已结算的日期由客户端的结果缓存负责复用）。
+
+    新的日期在后台线程中通过客户端的共享线程池查询，与发起请求的连接无关：
+    即使调用方中途断开，其他等待同一日期的请求仍能拿到结果。
+    """
+
+    def __init__(self, client: SMSQueryClient, page_size: int = 50):
+        """
+        初始化
+
+        Args:
+            client: 查询客户端（线程池引擎）
+            page_size: 每页记录数
+        """
+        self.client = client
+        self.page_size = page_size
+        self.requested = 0   # 请求的日期数
+        self.coalesced = 0   # 合并到进行中查询的日期数
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        """正在查询的日期数"""
+        return len(self._in_flight)
+
+    def submit(self, tasks: List[Tuple[str, str]]) -> List[Future]:
+        """
+        提交一组 (手机号, 日期)，返回与之一一对应的 Future
+
+        Args:
+            tasks: (手机号, 日期) 列表
+
+        Returns:
+            Future 列表，结果为当天按时间排序的记录列表，查询失败时抛出 SMSQueryError
+        """
+        futures = []
+        owned = {}
+        with self._lock:
+            for key in tasks:
+                self.requested += 1
+                future = self._in_flight.get(key) or owned.get(key)
+                if future is None:
+                    future = Future()
+                    self._in_flight[key] = future
+                    owned[key] = future
+                else:
+                    self.coalesced += 1
+                futures.append(future)
+
+        if owned:
+            threading.Thread(
+                target=self._fetch,
+                args=(owned,),
+                name='sms-serve-fetch',
+                daemon=True
+            ).start()
+        return futures
+
+    def _fetch(self, owned):
+        """在后台线程中查询新的日期，完成一天就设置对应的 Future"""
+        error = None
+        try:
+            for phone_number, query_date, records in self.client.iter_days(list(owned), self.page_size):
+                future = self._release((phone_number, query_date), owned)
+                if records is None:
+                    future.set_exception(SMSQueryError(f"{phone_number} {query_date} 查询失败"))
+                else:
+                    future.set_result(records)
+        except Exception as e:
+            error = e
+        finally:
+            # 异常中断时，让所有等待者都能结束
+            for key in list(owned):
+                self._release(key, owned).set_exception(error or SMSQueryError("查询中断"))
+
+    def _release(self, key, owned) -> Future:
+        """结束一个日期的查询，返回它的 Future"""
+        with self._lock:
+            self._in_flight.pop(key, None)
+        return owned.pop(key)
+
+
+class SMSQueryServer:
+    """
+    HTTP/JSON 查询服务
+
+    接口：
+    - GET  /query?phone=...&start_date=YYYYMMDD&end_date=YYYYMMDD（phone 可重复）
+    - POST /query  {"phones": [...], "start_date": "...", "end_date": "..."}
+      返回 application/x-ndjson：每行一条记录（字段同 SMSRecord.to_dict），
+      查询失败的日期输出 {"phone_number", "query_date", "error"}，
+      最后一行为 {"done": true, "records": 记录数, "failed_days": 失败天数}
+    - GET  /health   服务状态和合并统计
+    - GET  /metrics  Prometheus 指标（客户端的 QueryMetrics 和服务自身的合并统计）
+    """
+
+    def __init__(
+        self,
+        client: SMSQueryClient,
+        host: str = '127.0.0.1',
+        port: int = DEFAULT_PORT,
+        max_days: int = MAX_DAYS
+    ):
+        """
+        初始化服务
+
+        Args:
+            client: 常驻的查询客户端（线程池引擎）
+            host: 监听地址
+            port: 监听端口，0 表示自动分配
+            max_days: 单个请求最多查询的天数
+        """
+        self.client = client
+        self.max_days = max_days
+        self.coalescer = DayCoalescer(client)
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def endpoint(self) -> str:
+        """服务地址"""
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'SMSQueryServer':
+        """在后台线程中启动服务"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """在当前线程中运行服务，直到 Ctrl-C"""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        """停止服务"""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def parse_query(self, params) -> List[Tuple[str, str]]:
+        """
+        解析并验证查询参数
+
+        Args:
+            params: 包含 phones、start_date、end_date 的字典
+
+        Returns:
+            按手机号、日期排列的 (手机号, 日期) 列表
+
+        Raises:
+            RequestError: 参数无效
+        """
+        phones = params.get('phones') or []
+        if isinstance(phones, str):
+            phones = [phones]
+        phones = list(dict.fromkeys(phones))
+        if not phones:
+            raise RequestError("缺少手机号参数 phone")
+        if len(phones) > MAX_PHONES:
+            raise RequestError(f"一次最多查询 {MAX_PHONES} 个手机号")
+        invalid = [phone for phone in phones if not (isinstance(phone, str) and phone.isdigit() and len(phone) == 11)]
+        if invalid:
+            raise RequestError(f"手机号格式不正确: {', '.join(map(str, invalid[:10]))}")
+
+        start_date = _parse_date(params.get('start_date'), 'start_date')
+        end_date = _parse_date(params.get('end_date'), 'end_date') if params.get('end_date') else start_date
+        if start_date > end_date:
+            raise RequestError("开始日期不能晚于结束日期")
+        days = (end_date - start_date).days + 1
+        if days > self.max_days:
+            raise RequestError(f"一次最多查询 {self.max_days} 天")
+
+        dates = [(start_date + timedelta(days=offset)).strftime('%Y%m%d') for offset in range(days)]
+        return [(phone, query_date) for phone in phones for query_date in dates]
+
+    def health(self):
+        """服务状态"""
+        coalescer = self.coalescer
+        return {
+            'status': 'ok',
+            'requests': self.request_count,
+            'days_requested': coalescer.requested,
+            'days_coalesced': coalescer.coalesced,
+            'days_in_flight': coalescer.in_flight,
+        }
+
+    def prometheus_lines(self) -> str:
+        """服务自身的 Prometheus 指标"""
+        p = METRIC_PREFIX
+        coalescer = self.coalescer
+        lines = [
+            f'# HELP {p}_serve_requests_total 收到的查询请求数',
+            f'# TYPE {p}_serve_requests_total counter',
+            f'{p}_serve_requests_total {self.request_count}',
+            f'# HELP {p}_serve_days_requested_total 请求的 (手机号, 日期) 数',
+            f'# TYPE {p}_serve_days_requested_total counter',
+            f'{p}_serve_days_requested_total {coalescer.requested}',
+            f'# HELP {p}_serve_days_coalesced_total 合并到进行中查询的 (手机号, 日期) 数',
+            f'# TYPE {p}_serve_days_coalesced_total counter',
+            f'{p}_serve_days_coalesced_total {coalescer.coalesced}',
+            f'# HELP {p}_serve_days_in_flight 正在查询的 (手机号, 日期) 数',
+            f'# TYPE {p}_serve_days_in_flight gauge',
+            f'{p}_serve_days_in_flight {coalescer.in_flight}',
+        ]
+        return '\n'.join(lines) + '\n'
+
+    def stream_query(self, tasks, write):
+        """
+        查询并按任务顺序逐天输出 NDJSON
+
+        Args:
+            tasks: (手机号, 日期) 列表
+            write: 输出一段字节的函数
+        """
+        with self._lock:
+            self.request_count += 1
+
+        record_count = 0
+        failed_days = 0
+        for (phone_number, query_date), future in zip(tasks, self.coalescer.submit(tasks)):
+            try:
+                records = future.result()
+            except Exception as e:
+                failed_days += 1
+                line = {'phone_number': phone_number, 'query_date': query_date, 'error': str(e)}
+                write((json.dumps(line, ensure_ascii=False) + '\n').encode('utf-8'))
+                continue
+            if records:
+                record_count += len(records)
+                write(''.join(
+                    json.dumps(record.to_dict(), ensure_ascii=False) + '\n' for record in records
+                ).encode('utf-8'))
+
+        summary = {'done': True, 'records': record_count, 'failed_days': failed_days}
+        write((json.dumps(summary) + '\n').encode('utf-8'))
+
+    def _make_handler(self):
+        """创建请求处理类"""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            server_version = 'query-sms'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == '/query':
+                    query = parse_qs(url.query)
+                    self._query({
+                        'phones': query.get('phone', []),
+                        'start_date': query.get('start_date', [None])[0],
+                        'end_date': query.get('end_date', [None])[0],
+                    })
+                elif url.path == '/health':
+                    self._send_json(200, server.health())
+                elif url.path == '/metrics':
+                    self._send_metrics()
+                else:
+                    self._send_json(404, {'error': f'未知路径: {url.path}'})
+
+            def do_POST(self):
+                if urlparse(self.path).path != '/query':
+                    self._send_json(404, {'error': f'未知路径: {self.path}'})
+                    return
+                length = int(self.headers.get('Content-Length') or 0)
+                if length > MAX_BODY_SIZE:
+                    self._send_json(413, {'error': '请求体过大'})
+                    return
+                try:
+                    params = json.loads(self.rfile.read(length) or b'{}')
+                    if not isinstance(params, dict):
+                        raise ValueError
+                except ValueError:
+                    self._send_json(400, {'error': '请求体必须是 JSON 对象'})
+                    return
+                self._query(params)
+
+            def _query(self, params):
+                try:
+                    tasks = server.parse_query(params)
+                except RequestError as e:
+                    self._send_json(400, {'error': str(e)})
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                try:
+                    server.stream_query(tasks, self._write_chunk)
+                    self.wfile.write(b'0\r\n\r\n')
+                except (BrokenPipeError, ConnectionResetError):
+                    # 调用方已断开；进行中的查询继续完成，供其他请求使用
+                    self.close_connection = True
+
+            def _write_chunk(self, data):
+                self.wfile.write(f'{len(data):X}\r\n'.encode('ascii') + data + b'\r\n')
+                self.wfile.flush()
+
+            def _send_metrics(self):
+                metrics = server.client.metrics
+                text = metrics.to_prometheus() if metrics is not None else ''
+                text += server.prometheus_lines()
+                self._send(200, 'text/plain; version=0.0.4; charset=utf-8', text.encode('utf-8'))
+
+            def _send_json(self, status, body):
+                self._send(status, 'application/json; charset=utf-8', json.dumps(body, ensure_ascii=False).encode('utf-8'))
+
+            def _send(self, status, content_type, payload):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+
+def _parse_date(value, field_name):
+    """
+    解析 YYYYMMDD 日期
+
+    Raises:
+        RequestError: 格式不正确
+    """
+    if not value:
+        raise RequestError(f"缺少参数 {field_name}")
+    try:
+        if len(value) != 8:
+            raise ValueError
+        return datetime.strptime(value, '%Y%m%d')
+    except (TypeError, ValueError):
+        raise RequestError(f"{field_name} 格式不正确，应为 YYYYMMDD 格式（如：20231103）")
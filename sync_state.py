@@ -0,0 +1,202 @@
+"""
+增量同步模块
+为每个手机号保存水位（下次同步开始查询的日期和见过的最新发送时间），
+每次同步只查询水位之后的日期，并只产出之前没有写入过的记录
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sms_record import SMSRecord, STATUS_WAITING
+
+
+STATE_VERSION = 1
+
+# 日期距今超过这么多天仍有"等待回执"的记录时不再等待，按当前状态写入（运营商回执通常在 72 小时内返回）
+RECEIPT_TIMEOUT_DAYS = 7
+
+
+class SyncState:
+    """
+    增量同步水位（JSON 文件）
+
+    每个手机号保存：
+    - settled_through: 最后一个已结算并写入的日期（YYYYMMDD），这一天及之前的记录不会再变化
+    - resume_from: 上次同步中第一个未结算或查询失败（未完成）的日期（YYYYMMDD），
+      下次同步从这一天开始查询；查询过的日期都已结算时为 None，从 settled_through 的后一天开始
+    - last_send_ts: 已写入的最新一条记录的发送时间（Unix 时间戳）
+    - last_keys: 发送时间等于 last_send_ts 的记录指纹，用于同一秒内多条记录的去重
+
+    只有已结算的日期才会写入：未结算的日期（及其后的日期）本次不产出，下次同步重新查询，
+    结算后以最终状态一次写入，迟到的记录和"等待回执"之后的状态变化都不会丢失。
+    已结算的日期按顺序写入，last_send_ts / last_keys 只用于中断后跳过已写入的记录。
+
+    某个号码有日期查询失败时，该号码之后的日期本次同样不再产出，下次同步重新查询，
+    保证水位之前不会漏掉记录。
+    """
+
+    def __init__(self, path: str, phones: Dict = None):
+        """
+        初始化水位（请使用 load 创建）
+
+        Args:
+            path: 水位文件路径
+            phones: 手机号 -> 水位字典
+        """
+        self.path = path
+        self.phones = phones or {}
+
+    @classmethod
+    def load(cls, path: str) -> 'SyncState':
+        """
+        读取水位文件，不存在时返回空水位
+
+        Args:
+            path: 水位文件路径
+
+        Returns:
+            同步水位
+
+        Raises:
+            ValueError: 文件不是有效的水位文件
+        """
+        if not os.path.exists(path):
+            return cls(path)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except ValueError:
+            raise ValueError(f"{path} 不是有效的同步水位文件")
+        if not isinstance(data, dict) or data.get('version') != STATE_VERSION:
+            raise ValueError(f"{path} 不是有效的同步水位文件")
+        return cls(path, data.get('phones', {}))
+
+    @property
+    def exists(self) -> bool:
+        """水位文件是否已存在"""
+        return os.path.exists(self.path)
+
+    def save(self):
+        """写入水位文件（先写临时文件再替换，中断时不会留下不完整的文件）"""
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': STATE_VERSION, 'phones': self.phones}, f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, self.path)
+
+    def watermark(self, phone_number: str) -> Optional[Dict]:
+        """
+        某个号码的水位
+
+        Returns:
+            水位字典，没有同步过时为 None
+        """
+        return self.phones.get(phone_number)
+
+    def plan(self, phone_numbers: List[str], start_date: str, end_date: str) -> List[Tuple[str, str]]:
+        """
+        生成需要查询的 (手机号, 日期) 任务
+
+        Args:
+            phone_numbers: 手机号码列表
+            start_date: 没有水位的号码从这一天开始查询，YYYYMMDD（有水位的号码从水位继续）
+            end_date: 查询到这一天，YYYYMMDD
+
+        Returns:
+            按手机号、日期排列的任务列表
+        """
+        end = datetime.strptime(end_date, '%Y%m%d')
+        tasks = []
+        for phone_number in phone_numbers:
+            state = self.phones.get(phone_number) or {}
+            if state.get('resume_from'):
+                current = datetime.strptime(state['resume_from'], '%Y%m%d')
+            elif state.get('settled_through'):
+                current = datetime.strptime(state['settled_through'], '%Y%m%d') + timedelta(days=1)
+            else:
+                current = datetime.strptime(start_date, '%Y%m%d')
+            while current <= end:
+                tasks.append((phone_number, current.strftime('%Y%m%d')))
+                current += timedelta(days=1)
+        return tasks
+
+    def iter_new_records(
+        self,
+        days: Iterator[Tuple[str, str, Optional[List[SMSRecord]]]],
+        settle_days: int
+    ) -> Iterator[SMSRecord]:
+        """
+        过滤查询结果，只产出已结算日期中水位之后的记录，并随之推进水位
+
+        每个号码遇到第一个未结算或查询失败的日期时停止产出该号码的记录，
+        水位停在这一天（resume_from），下次同步从这一天重新查询。
+        每条记录在调用方取走下一条之后才计入水位，中断时已产出但未写入的记录
+        下次同步会重新产出。
+
+        Args:
+            days: 按手机号、日期顺序产出的 (手机号, 日期, 记录列表)，查询失败时记录列表为 None
+            settle_days: 日期距今超过多少天且没有"等待回执"记录时视为已结算
+                （超过 RECEIPT_TIMEOUT_DAYS 天时不论是否有"等待回执"都视为已结算）
+
+        Yields:
+            新的短信记录
+        """
+        now = datetime.now()
+        cutoff = (now - timedelta(days=settle_days)).strftime('%Y%m%d')
+        receipt_cutoff = (now - timedelta(days=max(settle_days, RECEIPT_TIMEOUT_DAYS))).strftime('%Y%m%d')
+        stopped = set()     # 已遇到未结算或查询失败日期的号码，之后的日期本次都不产出
+
+        for phone_number, query_date, day_records in days:
+            if phone_number in stopped:
+                continue
+
+            state = self.phones.setdefault(
+                phone_number,
+                {'settled_through': None, 'resume_from': None, 'last_send_ts': None, 'last_keys': []}
+            )
+            settled = day_records is not None and query_date <= cutoff and (
+                query_date <= receipt_cutoff
+                or not any(record.status_code == STATUS_WAITING for record in day_records)
+            )
+            if not settled:
+                # 查询失败、未完成或未结算（包括没有记录的日期，迟到的记录仍可能出现在这一天），
+                # 下次同步从这一天重新查询
+                state['resume_from'] = query_date
+                stopped.add(phone_number)
+                continue
+
+            for record in day_records:
+                if not self._is_new(state, record):
+                    continue
+                yield record
+                self._advance(state, record)
+            state['settled_through'] = query_date
+            state['resume_from'] = None
+
+    @staticmethod
+    def _is_new(state: Dict, record: SMSRecord) -> bool:
+        """记录是否晚于水位（同一秒内按指纹判断）"""
+        last_send_ts = state['last_send_ts']
+        if last_send_ts is None or record.send_ts > last_send_ts:
+            return True
+        if record.send_ts < last_send_ts:
+            return False
+        return _fingerprint(record) not in state['last_keys']
+
+    @staticmethod
+    def _advance(state: Dict, record: SMSRecord):
+        """把已写入的记录计入水位"""
+        if record.send_ts != state['last_send_ts']:
+            state['last_send_ts'] = record.send_ts
+            state['last_keys'] = []
+        state['last_keys'].append(_fingerprint(record))
+
+    def __repr__(self):
+        return f"SyncState(path={self.path}, phones={len(self.phones)})"
+
+
+def _fingerprint(record: SMSRecord) -> str:
+    """记录指纹（不含发送状态，状态变化后仍视为同一条记录）"""
+    key = f'{record.phone_number}|{record.send_ts}|{record.template_code}|{record.content}'
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
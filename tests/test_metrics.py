@@ -0,0 +1,29 @@
+"""
+查询指标测试
+"""
+from metrics import CallEvent, OUTCOME_OK, QueryMetrics
+
+
+def _call(latency: float) -> CallEvent:
+    return CallEvent('13800138000', '20231101', 1, 0, OUTCOME_OK, '', latency, 0.0, 10)
+
+
+def test_bounded_samples_keep_exact_mean_and_max():
+    metrics = QueryMetrics(max_samples=100)
+    for i in range(1, 10001):
+        metrics.record_call(_call(i / 1000))
+
+    assert len(metrics._latencies.values) == 100
+    latency = metrics.to_dict()['latency_seconds']
+    assert latency['mean'] == 5.0005
+    assert latency['max'] == 10.0
+    assert 3.0 < latency['p50'] < 7.0
+
+
+def test_unbounded_samples_give_exact_percentiles():
+    metrics = QueryMetrics()
+    for i in range(1, 101):
+        metrics.record_call(_call(i / 100))
+
+    latency = metrics.to_dict()['latency_seconds']
+    assert (latency['p50'], latency['p90'], latency['p99']) == (0.5, 0.9, 0.99)
@@ -0,0 +1,38 @@
+"""
+短信记录测试
+"""
+import calendar
+import time
+
+import pytest
+
+from sms_record import SOURCE_UTC_OFFSET, TIME_FORMAT, format_send_time, parse_send_time
+
+
+@pytest.mark.parametrize('send_date', [
+    '2023-11-03 15:30:00',
+    '2024-02-29 00:00:00',
+    '2023-12-31 23:59:59',
+])
+def test_parse_send_time_matches_strptime(send_date):
+    expected = calendar.timegm(time.strptime(send_date, TIME_FORMAT)) - SOURCE_UTC_OFFSET
+    assert parse_send_time(send_date) == (expected, '')
+    assert format_send_time(expected) == send_date
+
+
+@pytest.mark.parametrize('send_date', [
+    '2023-11-03 24:00:00',
+    '2023-11-03 15:60:00',
+    '2023-11-03 15:30:62',
+    '2023-13-03 15:30:00',
+    '2023-02-29 15:30:00',
+    '2023-11-03T15:30:00',
+    '2023-11-03 15:30-00',
+    '2023-11-03 +5:30:00',
+    '2023-11-03 1_:30:00',
+    '2023-11-03 15:30',
+])
+def test_parse_send_time_keeps_invalid_times_raw(send_date):
+    with pytest.raises(ValueError):
+        time.strptime(send_date, TIME_FORMAT)
+    assert parse_send_time(send_date) == (0, send_date)
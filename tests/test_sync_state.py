@@ -0,0 +1,104 @@
+"""
+增量同步水位测试
+"""
+from datetime import datetime, timedelta
+
+from sms_record import SMSRecord, STATUS_SUCCESS, STATUS_WAITING
+from sync_state import SyncState, RECEIPT_TIMEOUT_DAYS
+
+
+PHONE = '13800138000'
+
+
+def _day(offset: int) -> str:
+    """距今 offset 天的日期 YYYYMMDD"""
+    return (datetime.now() - timedelta(days=offset)).strftime('%Y%m%d')
+
+
+def _sync(state, tasks, results, settle_days=3):
+    """按 tasks 产出 results 中的结果（缺省为空列表），返回新记录"""
+    days = ((phone, date, results.get(date, [])) for phone, date in tasks)
+    return list(state.iter_new_records(days, settle_days))
+
+
+def _record(date: str, hour: int, status: int) -> SMSRecord:
+    """date 当天 hour 点发送的一条记录"""
+    send_ts = int(datetime.strptime(date, '%Y%m%d').timestamp()) + hour * 3600
+    return SMSRecord(PHONE, send_ts, status, f'验证码 {hour:04d}', 'SMS_1')
+
+
+def test_phone_without_records_resumes_from_unsettled_day(tmp_path):
+    path = str(tmp_path / 'state.json')
+    yesterday, today = _day(1), _day(0)
+
+    state = SyncState.load(path)
+    tasks = state.plan([PHONE], yesterday, today)
+    assert tasks == [(PHONE, yesterday), (PHONE, today)]
+    assert _sync(state, tasks, {}) == []
+    state.save()
+
+    # 两天都未结算，下次同步仍从第一个未结算的日期开始，即使 start_date 是今天
+    state = SyncState.load(path)
+    assert state.plan([PHONE], today, today) == [(PHONE, yesterday), (PHONE, today)]
+
+    # 日期结算后，迟到的记录仍会产出
+    late = _record(yesterday, 1, STATUS_SUCCESS)
+    assert _sync(state, state.plan([PHONE], today, today), {yesterday: [late]}, settle_days=1) == [late]
+    assert state.watermark(PHONE)['resume_from'] == today
+
+
+def test_failed_first_day_resumes_from_failed_day(tmp_path):
+    path = str(tmp_path / 'state.json')
+    first, second = _day(10), _day(9)
+
+    state = SyncState.load(path)
+    tasks = state.plan([PHONE], first, second)
+    assert _sync(state, tasks, {first: None}) == []
+    state.save()
+
+    state = SyncState.load(path)
+    assert state.plan([PHONE], second, second) == [(PHONE, first), (PHONE, second)]
+
+
+def test_settled_days_advance_past_resume_point(tmp_path):
+    path = str(tmp_path / 'state.json')
+    first, second, today = _day(10), _day(9), _day(0)
+
+    state = SyncState.load(path)
+    _sync(state, state.plan([PHONE], first, today), {})
+    assert state.watermark(PHONE)['settled_through'] == _day(3)
+    assert state.plan([PHONE], today, today)[0] == (PHONE, _day(2))
+    assert (PHONE, second) not in state.plan([PHONE], today, today)
+
+
+def test_waiting_record_is_written_with_final_status_after_it_settles(tmp_path):
+    path = str(tmp_path / 'state.json')
+    day, today = _day(5), _day(0)
+
+    # 第一次同步时记录还在等待回执，这一天不写入
+    state = SyncState.load(path)
+    waiting = _record(day, 10, STATUS_WAITING)
+    assert _sync(state, state.plan([PHONE], day, day), {day: [waiting]}) == []
+    assert state.watermark(PHONE)['resume_from'] == day
+    state.save()
+
+    # 下次同步时回执已返回，还多了一条发送时间更早的迟到记录，两条都以最终状态写入
+    state = SyncState.load(path)
+    tasks = state.plan([PHONE], today, today)
+    assert tasks[0] == (PHONE, day)
+    delivered = [_record(day, 9, STATUS_SUCCESS), waiting._replace(status_code=STATUS_SUCCESS)]
+    assert _sync(state, tasks, {day: delivered}) == delivered
+    assert state.watermark(PHONE)['settled_through'] == _day(3)
+
+    # 已写入的日期不会再次产出
+    state.watermark(PHONE)['settled_through'] = None
+    state.watermark(PHONE)['resume_from'] = day
+    assert _sync(state, state.plan([PHONE], today, today), {day: delivered}) == []
+
+
+def test_waiting_record_is_written_after_receipt_timeout(tmp_path):
+    day = _day(RECEIPT_TIMEOUT_DAYS + 1)
+    state = SyncState.load(str(tmp_path / 'state.json'))
+    waiting = _record(day, 10, STATUS_WAITING)
+    assert _sync(state, state.plan([PHONE], day, day), {day: [waiting]}) == [waiting]
+    assert state.watermark(PHONE)['settled_through'] == day